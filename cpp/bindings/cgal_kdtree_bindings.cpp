@@ -1,53 +1,127 @@
 #include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
 #include <pybind11/stl.h>
-#include <CGAL/Simple_cartesian.h>
-#include <CGAL/Search_traits_2.h>
-#include <CGAL/Kd_tree.h>
-#include <CGAL/Orthogonal_k_neighbor_search.h>
+#include "KDTree2D_CGAL.hpp"
+#include <memory>
+#include <stdexcept>
+#include <string>
 #include <vector>
-#include <algorithm>
-#include <cmath>
 
 namespace py = pybind11;
 
-typedef CGAL::Simple_cartesian<double> Kernel;
-typedef Kernel::Point_2 Point_2;
-typedef CGAL::Search_traits_2<Kernel> Traits;
-typedef CGAL::Kd_tree<Traits> Tree;
-typedef CGAL::Orthogonal_k_neighbor_search<Traits> K_neighbor_search;
+// C-contiguous float64 array; pybind11 only copies when the input is not already in this layout
+using PointsArray = py::array_t<double, py::array::c_style | py::array::forcecast>;
 
-class CGALKDTree2D
+// Validate that `points` is an (N, 2) array and return it unchanged
+static PointsArray check_points(PointsArray points, const char *name = "points")
 {
-public:
-    CGALKDTree2D(const std::vector<std::pair<double, double>> &points)
+    if (points.ndim() != 2 || points.shape(1) != 2)
+        throw std::invalid_argument(std::string(name) + " must be an (N, 2) array");
+    return points;
+}
+
+// Hand a std::vector to NumPy without copying; the array owns the moved-from buffer
+template <typename T>
+static py::array_t<T> as_array(std::vector<T> &&values)
+{
+    auto *owned = new std::vector<T>(std::move(values));
+    py::capsule free_when_done(owned, [](void *p)
+                               { delete static_cast<std::vector<T> *>(p); });
+    return py::array_t<T>(static_cast<py::ssize_t>(owned->size()), owned->data(), free_when_done);
+}
+
+// Batch k-nearest-neighbour query returning row-major (M, k) index and distance arrays
+static py::tuple query_knn(const CGALKDTree2D &tree, PointsArray queries, size_t k, unsigned n_threads)
+{
+    if (k == 0)
+        throw std::invalid_argument("k must be at least 1");
+    queries = check_points(std::move(queries), "queries");
+    const auto m = queries.shape(0);
+    py::array_t<int64_t> indices({m, static_cast<py::ssize_t>(k)});
+    py::array_t<double> distances({m, static_cast<py::ssize_t>(k)});
+    const double *q = queries.data();
+    int64_t *idx = indices.mutable_data();
+    double *dist = distances.mutable_data();
     {
-        for (const auto &p : points)
-        {
-            pts_.emplace_back(p.first, p.second);
-        }
-        tree_ = std::make_unique<Tree>(pts_.begin(), pts_.end());
+        py::gil_scoped_release release;
+        tree.query_knn(q, static_cast<size_t>(m), k, idx, dist, n_threads);
     }
+    return py::make_tuple(indices, distances);
+}
 
-    std::pair<size_t, double> query(double x, double y) const
+// query_knn plus per-query work counters: (indices[M, k], distances[M, k], nodes_visited[M], distance_computations[M])
+static py::tuple query_knn_profiled(const CGALKDTree2D &tree, PointsArray queries, size_t k, unsigned n_threads)
+{
+    if (k == 0)
+        throw std::invalid_argument("k must be at least 1");
+    queries = check_points(std::move(queries), "queries");
+    const auto m = queries.shape(0);
+    py::array_t<int64_t> indices({m, static_cast<py::ssize_t>(k)});
+    py::array_t<double> distances({m, static_cast<py::ssize_t>(k)});
+    py::array_t<int64_t> nodes_visited(m);
+    py::array_t<int64_t> distance_computations(m);
+    const double *q = queries.data();
+    int64_t *idx = indices.mutable_data();
+    double *dist = distances.mutable_data();
+    int64_t *nodes = nodes_visited.mutable_data();
+    int64_t *computed = distance_computations.mutable_data();
     {
-        Point_2 query_pt(x, y);
-        K_neighbor_search search(*tree_, query_pt, 1);
-        auto it = search.begin();
-        const Point_2 &nn = it->first;
-        // Find index in original vector
-        auto idx = std::distance(pts_.begin(), std::find(pts_.begin(), pts_.end(), nn));
-        double dist_val = std::sqrt(it->second);
-        return {idx, dist_val};
+        py::gil_scoped_release release;
+        tree.query_knn_profiled(q, static_cast<size_t>(m), k, idx, dist, nodes, computed, n_threads);
     }
+    return py::make_tuple(indices, distances, nodes_visited, distance_computations);
+}
+
+// Batch nearest-neighbour query returning (indices[M], distances[M]) with the GIL released
+static py::tuple query_batch(const CGALKDTree2D &tree, PointsArray queries, unsigned n_threads)
+{
+    py::tuple knn = query_knn(tree, std::move(queries), 1, n_threads);
+    return py::make_tuple(knn[0].attr("reshape")(-1), knn[1].attr("reshape")(-1));
+}
 
-private:
-    std::vector<Point_2> pts_;
-    std::unique_ptr<Tree> tree_;
-};
+// Batch radius query returning CSR-style (offsets[M + 1], indices[nnz], distances[nnz])
+static py::tuple query_radius(const CGALKDTree2D &tree, PointsArray queries, double radius, unsigned n_threads)
+{
+    if (!(radius >= 0.0))
+        throw std::invalid_argument("radius must be non-negative");
+    queries = check_points(std::move(queries), "queries");
+    std::vector<int64_t> offsets, indices;
+    std::vector<double> distances;
+    const double *q = queries.data();
+    const auto m = static_cast<size_t>(queries.shape(0));
+    {
+        py::gil_scoped_release release;
+        tree.query_radius(q, m, radius, offsets, indices, distances, n_threads);
+    }
+    return py::make_tuple(as_array(std::move(offsets)), as_array(std::move(indices)), as_array(std::move(distances)));
+}
 
 PYBIND11_MODULE(cgal_kdtree_cpp, m)
 {
     py::class_<CGALKDTree2D>(m, "CGALKDTree2D")
+        .def(py::init([](PointsArray points)
+                      {
+                          points = check_points(std::move(points));
+                          const double *xy = points.data();
+                          const auto n = static_cast<size_t>(points.shape(0));
+                          py::gil_scoped_release release;
+                          return std::make_unique<CGALKDTree2D>(xy, n); }),
+             py::arg("points"),
+             "Build the tree from an (N, 2) float64 array; each entry keeps its row index")
         .def(py::init<const std::vector<std::pair<double, double>> &>())
-        .def("query", &CGALKDTree2D::query);
+        .def("__len__", &CGALKDTree2D::size)
+        .def("memory_usage", &CGALKDTree2D::memory_usage,
+             "Bytes of the tree's entries, entry pointers and nodes")
+        .def("query", &CGALKDTree2D::query)
+        .def("query_batch", &query_batch, py::arg("queries"), py::arg("n_threads") = 0,
+             "Nearest neighbour of each row of an (M, 2) array as (indices[M], distances[M]); "
+             "releases the GIL and splits the batch across n_threads (0 = all cores)")
+        .def("query_knn", &query_knn, py::arg("queries"), py::arg("k"), py::arg("n_threads") = 0,
+             "k nearest neighbours of each row of an (M, 2) array as (indices[M, k], distances[M, k]), "
+             "nearest first; rows are padded with -1 / NaN when the tree holds fewer than k points")
+        .def("query_knn_profiled", &query_knn_profiled, py::arg("queries"), py::arg("k"), py::arg("n_threads") = 0,
+             "query_knn plus per-query counters: (indices, distances, nodes_visited[M], distance_computations[M])")
+        .def("query_radius", &query_radius, py::arg("queries"), py::arg("radius"), py::arg("n_threads") = 0,
+             "Neighbours within radius of each row of an (M, 2) array as CSR (offsets[M + 1], indices, distances); "
+             "neighbours of query i are indices[offsets[i]:offsets[i + 1]], sorted by distance");
 }
@@ -6,81 +6,261 @@
  * This module exposes a function to Python (`compute_convex_hull`) that computes the convex hull
  * of a set of 2D points. The convex hull is the smallest convex polygon that contains all the points.
  * The implementation leverages Boost.Geometry's efficient convex hull algorithm.
+ * `compute_grouped_convex_hulls` computes one hull per label of a labelled point set in a single
+ * call, spreading the groups across native threads and returning all hulls in CSR layout.
  *
  * ## Algorithm
  * The convex hull is computed using Boost.Geometry's `convex_hull` function, which implements
- * a variant of the Graham scan or Andrew's monotone chain algorithm under the hood (depending on the version).
- * The input points are first converted into Boost's `multi_point` structure, and the resulting hull
- * is returned as a sequence of points forming the polygon's outer boundary.
+ * Andrew's monotone chain algorithm (O(N log N)). The input is read in place from a flat
+ * `(x0, y0, x1, y1, ...)` buffer (e.g. a NumPy array) through a lazy view, so no per-point objects
+ * are built; each view element carries its row index, so the hull comes back as indices into the input.
  *
  * ## Data Structures
- * - **Point**: Alias for `bg::model::d2::point_xy<double>`, representing a 2D point (x, y).
- * - **Polygon**: Alias for `bg::model::polygon<Point>`, representing a polygon as a sequence of points.
- * - **bg::model::multi_point<Point>**: A collection of 2D points.
- * - **std::vector<std::vector<double>>**: Used for interoperability with Python (list of [x, y] pairs).
+ * - **IndexedPoint**: A 2D point (x, y) plus its row index in the input buffer, registered as a
+ *   Boost.Geometry point.
+ * - **PointView**: Random-access range of IndexedPoint computed on the fly from the input buffer
+ *   (every row, or a subset of rows for one group), registered as a Boost.Geometry multi-point.
+ * - **Ring**: Alias for `bg::model::ring<IndexedPoint>`, the clockwise, closed hull boundary.
  *
  * ## Usage (from Python)
  * ```
  * import convex_hull_ext
- * points = [, [1, [0.5, 0.5]]
- * hull = convex_hull_ext.compute_convex_hull(points)
+ * points = np.array([[0, 0], [1, 0], [0, 1], [0.2, 0.2]])
+ * hull = convex_hull_ext.compute_convex_hull(points)                      # (H, 2) coordinates
+ * idx = convex_hull_ext.compute_convex_hull(points, return_indices=True)  # (H,) row indices
+ * groups, offsets, hulls = convex_hull_ext.compute_grouped_convex_hulls(points, labels)
+ * # hull of groups[g] is hulls[offsets[g]:offsets[g + 1]]
  * ```
  */
 
 #include <pybind11/pybind11.h>
-#include <pybind11/stl.h>
+#include <pybind11/numpy.h>
+#include "parallel.hpp"
 #include <boost/geometry.hpp>
-#include <boost/geometry/geometries/point_xy.hpp>
-#include <boost/geometry/geometries/polygon.hpp>
-#include <boost/geometry/geometries/multi_point.hpp>
+#include <boost/geometry/geometries/register/point.hpp>
+#include <boost/geometry/geometries/register/multi_point.hpp>
+#include <boost/geometry/geometries/ring.hpp>
+#include <boost/iterator/counting_iterator.hpp>
+#include <boost/iterator/transform_iterator.hpp>
+#include <boost/range/iterator_range.hpp>
+#include <algorithm>
+#include <cstddef>
+#include <cstdint>
+#include <numeric>
+#include <stdexcept>
 #include <vector>
 
 namespace py = pybind11;
 namespace bg = boost::geometry;
 
-// Type alias for a 2D point with double precision
-using Point = bg::model::d2::point_xy<double>;
+// A 2D point together with its row in the input buffer
+struct IndexedPoint
+{
+    double x = 0.0, y = 0.0;
+    int64_t index = -1;
+};
+
+BOOST_GEOMETRY_REGISTER_POINT_2D(IndexedPoint, double, bg::cs::cartesian, x, y)
+
+// Builds the IndexedPoint for element j of a view over a flat (x, y) buffer
+struct RowToPoint
+{
+    const double *xy;
+    const int64_t *rows = nullptr; // rows in the view; nullptr views every row in order
+
+    IndexedPoint operator()(int64_t j) const
+    {
+        const int64_t i = rows != nullptr ? rows[j] : j;
+        return {xy[2 * i], xy[2 * i + 1], i};
+    }
+};
+
+using PointView = boost::iterator_range<
+    boost::transform_iterator<RowToPoint, boost::counting_iterator<int64_t>, IndexedPoint>>;
+
+BOOST_GEOMETRY_REGISTER_MULTI_POINT(PointView)
+
+// Type alias for the hull boundary: clockwise and closed (the first point is repeated at the end)
+using Ring = bg::model::ring<IndexedPoint>;
+
+/**
+ * @brief Computes the convex hull of `n` 2D points stored as a flat (x, y) buffer.
+ *
+ * @param xy Row-major coordinates; read in place, not copied.
+ * @param n Number of points.
+ * @param closed Repeat the first hull vertex at the end (closed polygon).
+ * @param rows If given, the hull covers only these `n` rows of `xy`; otherwise rows `[0, n)`.
+ * @return Row indices of the hull vertices in clockwise order; empty for empty input.
+ */
+std::vector<int64_t> convex_hull_indices(const double *xy, size_t n, bool closed = true,
+                                         const int64_t *rows = nullptr)
+{
+    if (n == 0)
+        return {};
+    const RowToPoint to_point{xy, rows};
+    const PointView view(
+        boost::make_transform_iterator(boost::counting_iterator<int64_t>(0), to_point),
+        boost::make_transform_iterator(boost::counting_iterator<int64_t>(static_cast<int64_t>(n)), to_point));
 
-// Type alias for a polygon composed of 2D points
-using Polygon = bg::model::polygon<Point>;
+    Ring hull;
+    bg::convex_hull(view, hull);
+
+    std::vector<int64_t> indices;
+    indices.reserve(hull.size());
+    for (const auto &pt : hull)
+        indices.push_back(pt.index);
+    if (!closed && indices.size() > 1 && indices.front() == indices.back())
+        indices.pop_back();
+    return indices;
+}
 
 /**
- * @brief Computes the convex hull of a set of 2D points.
+ * @brief Convex hull of each group of a labelled point set, in CSR layout.
  *
- * @param points A vector of points, where each point is a vector of two doubles: [x, y].
- * @return A vector of points representing the convex hull in counter-clockwise order.
+ * @param xy Row-major (n, 2) coordinates; read in place, not copied.
+ * @param labels Group label of each of the `n` rows (any int64 values).
+ * @param groups Output: the distinct labels, ascending.
+ * @param offsets Output: `groups.size() + 1` offsets; the hull of `groups[g]` is
+ *   `indices[offsets[g], offsets[g + 1])`.
+ * @param indices Output: row indices of every hull's vertices, clockwise per hull.
+ *
+ * Groups are handed to `n_threads` threads (0 = all cores) largest first, so a few large groups
+ * among many small ones still spread evenly.
+ */
+void grouped_convex_hull_indices(const double *xy, const int64_t *labels, size_t n, bool closed,
+                                 unsigned n_threads, std::vector<int64_t> &groups,
+                                 std::vector<int64_t> &offsets, std::vector<int64_t> &indices)
+{
+    // Rows ordered by label (then row), so each group is a contiguous run
+    std::vector<int64_t> order(n);
+    std::iota(order.begin(), order.end(), int64_t(0));
+    std::sort(order.begin(), order.end(), [labels](int64_t a, int64_t b)
+              { return labels[a] < labels[b] || (labels[a] == labels[b] && a < b); });
+    std::vector<size_t> starts;
+    groups.clear();
+    for (size_t j = 0; j < n; ++j)
+        if (j == 0 || labels[order[j]] != labels[order[j - 1]])
+        {
+            starts.push_back(j);
+            groups.push_back(labels[order[j]]);
+        }
+    starts.push_back(n);
+    const size_t g = groups.size();
+
+    std::vector<size_t> by_size(g);
+    std::iota(by_size.begin(), by_size.end(), size_t(0));
+    std::sort(by_size.begin(), by_size.end(), [&starts](size_t a, size_t b)
+              { return starts[a + 1] - starts[a] > starts[b + 1] - starts[b]; });
+    std::vector<std::vector<int64_t>> hulls(g);
+    parallel_for_each_dynamic(g, n_threads, [&](size_t i)
+                              {
+        const size_t group = by_size[i];
+        hulls[group] = convex_hull_indices(xy, starts[group + 1] - starts[group], closed,
+                                           order.data() + starts[group]); });
+
+    offsets.assign(g + 1, 0);
+    for (size_t i = 0; i < g; ++i)
+        offsets[i + 1] = offsets[i] + static_cast<int64_t>(hulls[i].size());
+    indices.resize(static_cast<size_t>(offsets[g]));
+    for (size_t i = 0; i < g; ++i)
+        std::copy(hulls[i].begin(), hulls[i].end(), indices.begin() + offsets[i]);
+}
+
+// C-contiguous float64 array; pybind11 only copies when the input is not already in this layout
+using PointsArray = py::array_t<double, py::array::c_style | py::array::forcecast>;
+using LabelsArray = py::array_t<int64_t, py::array::c_style | py::array::forcecast>;
+
+// Validate that `points` is an (N, 2) array and return N; an empty sequence (shape (0,)) is zero points
+static size_t check_points(const PointsArray &points)
+{
+    if (points.size() != 0 && (points.ndim() != 2 || points.shape(1) != 2))
+        throw std::invalid_argument("points must be an (N, 2) array");
+    return static_cast<size_t>(points.size() / 2);
+}
+
+// Hand a std::vector to NumPy without copying; the array owns the moved-from buffer
+template <typename T>
+static py::array_t<T> as_array(std::vector<T> &&values)
+{
+    auto *owned = new std::vector<T>(std::move(values));
+    py::capsule free_when_done(owned, [](void *p)
+                               { delete static_cast<std::vector<T> *>(p); });
+    return py::array_t<T>(static_cast<py::ssize_t>(owned->size()), owned->data(), free_when_done);
+}
+
+// Hull vertices as row indices, or gathered from the input into an (H, 2) array
+static py::array hull_output(const double *xy, std::vector<int64_t> &&indices, bool return_indices)
+{
+    if (return_indices)
+        return as_array(std::move(indices));
+    const auto h = static_cast<py::ssize_t>(indices.size());
+    py::array_t<double> out({h, static_cast<py::ssize_t>(2)});
+    double *dst = out.mutable_data();
+    for (py::ssize_t i = 0; i < h; ++i)
+    {
+        dst[2 * i] = xy[2 * indices[i]];
+        dst[2 * i + 1] = xy[2 * indices[i] + 1];
+    }
+    return std::move(out);
+}
+
+/**
+ * @brief Python entry point: hull of an (N, 2) array, computed with the GIL released.
+ *
+ * Returns the (H, 2) hull vertices, or their (H,) int64 row indices with `return_indices`.
+ */
+py::array compute_convex_hull(PointsArray points, bool closed, bool return_indices)
+{
+    const size_t n = check_points(points);
+    const double *xy = points.data();
+    std::vector<int64_t> indices;
+    {
+        py::gil_scoped_release release;
+        indices = convex_hull_indices(xy, n, closed);
+    }
+    return hull_output(xy, std::move(indices), return_indices);
+}
+
+/**
+ * @brief Python entry point: one hull per label, as (groups[G], offsets[G + 1], hulls) in CSR layout.
  *
- * The function:
- * 1. Converts the input to Boost.Geometry's multi_point structure.
- * 2. Computes the convex hull using Boost.Geometry.
- * 3. Extracts the outer boundary of the hull polygon as a list of [x, y] pairs.
+ * `hulls` holds the vertices of every hull, as rows of an (H, 2) array or as int64 row indices
+ * with `return_indices`.
  */
-std::vector<std::vector<double>> compute_convex_hull(const std::vector<std::vector<double>> &points)
+py::tuple compute_grouped_convex_hulls(PointsArray points, LabelsArray labels, bool closed,
+                                       bool return_indices, unsigned n_threads)
 {
-    // Step 1: Convert input points to Boost.Geometry's multi_point structure
-    bg::model::multi_point<Point> bg_points;
-    for (const auto &pt : points)
-        if (pt.size() >= 2)
-            bg_points.emplace_back(pt[0], pt[1]);
-
-    // Step 2: Compute the convex hull (result is a polygon)
-    Polygon hull;
-    bg::convex_hull(bg_points, hull);
-
-    // Step 3: Extract the outer boundary of the hull as a list of [x, y] pairs
-    std::vector<std::vector<double>> result;
-    for (const auto &pt : hull.outer())
-        result.push_back({bg::get<0>(pt), bg::get<1>(pt)});
-    return result;
+    const size_t n = check_points(points);
+    if (labels.ndim() != 1 || static_cast<size_t>(labels.shape(0)) != n)
+        throw std::invalid_argument("labels must be a 1D array with one label per point");
+    const double *xy = points.data();
+    const int64_t *lab = labels.data();
+    std::vector<int64_t> groups, offsets, indices;
+    {
+        py::gil_scoped_release release;
+        grouped_convex_hull_indices(xy, lab, n, closed, n_threads, groups, offsets, indices);
+    }
+    return py::make_tuple(as_array(std::move(groups)), as_array(std::move(offsets)),
+                          hull_output(xy, std::move(indices), return_indices));
 }
 
 /**
  * @brief Pybind11 module definition.
  *
- * Exposes the `compute_convex_hull` function to Python.
+ * Exposes the `compute_convex_hull` and `compute_grouped_convex_hulls` functions to Python.
  */
 PYBIND11_MODULE(convex_hull_ext, m)
 {
     m.doc() = "Convex hull computation using Boost.Geometry";
-    m.def("compute_convex_hull", &compute_convex_hull, "Compute convex hull for a list of 2D points");
+    m.def("compute_convex_hull", &compute_convex_hull, py::arg("points"), py::kw_only(),
+          py::arg("closed") = true, py::arg("return_indices") = false,
+          "Convex hull of an (N, 2) array (read without copying when C-contiguous float64), computed "
+          "with the GIL released. Returns the (H, 2) hull vertices in clockwise order, or their (H,) "
+          "int64 row indices with return_indices=True. closed=False omits the repeated first vertex.");
+    m.def("compute_grouped_convex_hulls", &compute_grouped_convex_hulls, py::arg("points"), py::arg("labels"),
+          py::kw_only(), py::arg("closed") = true, py::arg("return_indices") = false, py::arg("n_threads") = 0,
+          "Convex hull of each group of an (N, 2) array labelled by an (N,) integer array, in one call "
+          "with the GIL released and groups spread over n_threads (0 = all cores). Returns "
+          "(groups[G], offsets[G + 1], hulls): the distinct labels in ascending order, and the hull of "
+          "groups[g] is hulls[offsets[g]:offsets[g + 1]] (vertices, or row indices with return_indices=True).");
 }
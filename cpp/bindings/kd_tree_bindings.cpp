@@ -1,77 +1,378 @@
 #include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
 #include <pybind11/stl.h>
-#include "nanoflann.hpp"
-#include <vector>
+#include "kd_tree_2d.hpp"
+#include "dynamic_kd_tree_2d.hpp"
+#include "greedy_tour.hpp"
 #include <cmath>
+#include <memory>
+#include <optional>
+#include <stdexcept>
+#include <string>
+#include <vector>
 
 namespace py = pybind11;
 
-#include <iostream>
-#include <vector>
-#include <nanoflann.hpp>
-#include <cmath>
-#include <random>
-#include <iomanip> // For std::setw
+// C-contiguous array of T; pybind11 only copies when the input is not already in this layout
+template <typename T>
+using CoordArray = py::array_t<T, py::array::c_style | py::array::forcecast>;
+using PointsArray = CoordArray<double>;
 
-// PointCloud class encapsulates the data and nanoflann adaptor interface
-class PointCloud
+// Validate that `points` is an (N, 2) array and return it unchanged
+template <typename T>
+static CoordArray<T> check_points(CoordArray<T> points, const char *name = "points")
 {
-public:
-    struct Point
+    if (points.ndim() != 2 || points.shape(1) != 2)
+        throw std::invalid_argument(std::string(name) + " must be an (N, 2) array");
+    return points;
+}
+
+// Search eps must be a non-negative approximation factor
+static float check_eps(float eps)
+{
+    if (!(eps >= 0.0f))
+        throw std::invalid_argument("eps must be non-negative");
+    return eps;
+}
+
+// Batch nearest-neighbour query returning (indices[M], distances[M]) with the GIL released.
+// The query helpers serve both KDTree2D (input indices) and DynamicKDTree2D (external IDs);
+// `extra` forwards tree-specific trailing arguments such as KDTree2D's search eps.
+template <class Tree, class... Extra>
+static py::tuple query_batch(const Tree &tree, PointsArray queries, unsigned n_threads, Extra... extra)
+{
+    queries = check_points<double>(std::move(queries), "queries");
+    const auto m = queries.shape(0);
+    py::array_t<int64_t> indices(m);
+    py::array_t<double> distances(m);
+    const double *q = queries.data();
+    int64_t *idx = indices.mutable_data();
+    double *dist = distances.mutable_data();
     {
-        double x, y;
-    };
-    std::vector<Point> pts;
+        py::gil_scoped_release release;
+        tree.query_batch(q, static_cast<size_t>(m), idx, dist, n_threads, extra...);
+    }
+    return py::make_tuple(indices, distances);
+}
 
-    PointCloud(const std::vector<Point> &points) : pts(points) {}
+// Batch k-nearest-neighbour query returning row-major (M, k) index and distance arrays
+template <class Tree, class... Extra>
+static py::tuple query_knn(const Tree &tree, PointsArray queries, size_t k, unsigned n_threads, Extra... extra)
+{
+    if (k == 0)
+        throw std::invalid_argument("k must be at least 1");
+    queries = check_points<double>(std::move(queries), "queries");
+    const auto m = queries.shape(0);
+    py::array_t<int64_t> indices({m, static_cast<py::ssize_t>(k)});
+    py::array_t<double> distances({m, static_cast<py::ssize_t>(k)});
+    const double *q = queries.data();
+    int64_t *idx = indices.mutable_data();
+    double *dist = distances.mutable_data();
+    {
+        py::gil_scoped_release release;
+        tree.query_knn(q, static_cast<size_t>(m), k, idx, dist, n_threads, extra...);
+    }
+    return py::make_tuple(indices, distances);
+}
 
-    // nanoflann interface
-    inline size_t kdtree_get_point_count() const { return pts.size(); }
+// query_knn plus per-query work counters: (indices[M, k], distances[M, k], nodes_visited[M], distance_computations[M])
+template <class Tree>
+static py::tuple query_knn_profiled(const Tree &tree, PointsArray queries, size_t k, unsigned n_threads, float eps)
+{
+    if (k == 0)
+        throw std::invalid_argument("k must be at least 1");
+    queries = check_points<double>(std::move(queries), "queries");
+    const auto m = queries.shape(0);
+    py::array_t<int64_t> indices({m, static_cast<py::ssize_t>(k)});
+    py::array_t<double> distances({m, static_cast<py::ssize_t>(k)});
+    py::array_t<int64_t> nodes_visited(m);
+    py::array_t<int64_t> distance_computations(m);
+    const double *q = queries.data();
+    int64_t *idx = indices.mutable_data();
+    double *dist = distances.mutable_data();
+    int64_t *nodes = nodes_visited.mutable_data();
+    int64_t *computed = distance_computations.mutable_data();
+    {
+        py::gil_scoped_release release;
+        tree.query_knn_profiled(q, static_cast<size_t>(m), k, idx, dist, nodes, computed, n_threads, eps);
+    }
+    return py::make_tuple(indices, distances, nodes_visited, distance_computations);
+}
 
-    inline double kdtree_get_pt(const size_t idx, const size_t dim) const
+// k nearest other points of every point in a static tree as row-major (N, k) arrays, GIL released
+template <typename T>
+static py::tuple all_nearest_neighbours(const BasicKDTree2D<T> &tree, size_t k, unsigned n_threads)
+{
+    if (k == 0)
+        throw std::invalid_argument("k must be at least 1");
+    const auto n = static_cast<py::ssize_t>(tree.size());
+    py::array_t<int64_t> indices({n, static_cast<py::ssize_t>(k)});
+    py::array_t<double> distances({n, static_cast<py::ssize_t>(k)});
+    int64_t *idx = indices.mutable_data();
+    double *dist = distances.mutable_data();
     {
-        return (dim == 0) ? pts[idx].x : pts[idx].y;
+        py::gil_scoped_release release;
+        tree.all_knn(k, idx, dist, n_threads);
     }
+    return py::make_tuple(indices, distances);
+}
 
-    // Optional bounding-box computation: return false to default
-    template <class BBOX>
-    bool kdtree_get_bbox(BBOX &) const { return false; }
-};
+// Hand a std::vector to NumPy without copying; the array owns the moved-from buffer
+template <typename T>
+static py::array_t<T> as_array(std::vector<T> &&values)
+{
+    auto *owned = new std::vector<T>(std::move(values));
+    py::capsule free_when_done(owned, [](void *p)
+                               { delete static_cast<std::vector<T> *>(p); });
+    return py::array_t<T>(static_cast<py::ssize_t>(owned->size()), owned->data(), free_when_done);
+}
+
+// Batch radius query returning CSR-style (offsets[M + 1], indices[nnz], distances[nnz])
+template <class Tree>
+static py::tuple query_radius(const Tree &tree, PointsArray queries, double radius, unsigned n_threads)
+{
+    if (!(radius >= 0.0))
+        throw std::invalid_argument("radius must be non-negative");
+    queries = check_points<double>(std::move(queries), "queries");
+    std::vector<int64_t> offsets, indices;
+    std::vector<double> distances;
+    const double *q = queries.data();
+    const auto m = static_cast<size_t>(queries.shape(0));
+    {
+        py::gil_scoped_release release;
+        tree.query_radius(q, m, radius, offsets, indices, distances, n_threads);
+    }
+    return py::make_tuple(as_array(std::move(offsets)), as_array(std::move(indices)), as_array(std::move(distances)));
+}
 
-// KDTree wrapper class for nearest neighbor search
-class KDTree2D
+// PointCloud that borrows the buffer of a NumPy array and holds a reference to keep it alive
+template <typename T>
+class NumpyPointCloud : public BasicPointCloud<T>
 {
 public:
-    using KDTree_t = nanoflann::KDTreeSingleIndexAdaptor<
-        nanoflann::L2_Simple_Adaptor<double, PointCloud>,
-        PointCloud,
-        2 /* dimension */
-        >;
-
-    KDTree2D(const PointCloud &cloud)
-        : cloud_(cloud), index_(2, cloud_, nanoflann::KDTreeSingleIndexAdaptorParams(10))
+    explicit NumpyPointCloud(CoordArray<T> points)
+        : BasicPointCloud<T>(points.data(), static_cast<size_t>(points.shape(0))), points_(std::move(points)) {}
+
+private:
+    CoordArray<T> points_;
+};
+
+// Build a temporary tree over `points` (float32 input stays float32) and self-join it
+template <typename T>
+static py::tuple build_and_join(CoordArray<T> points, size_t k, size_t leaf_size, unsigned n_threads)
+{
+    if (k == 0)
+        throw std::invalid_argument("k must be at least 1");
+    auto cloud = std::make_shared<NumpyPointCloud<T>>(check_points<T>(std::move(points)));
+    std::unique_ptr<BasicKDTree2D<T>> tree;
     {
-        index_.buildIndex();
+        py::gil_scoped_release release;
+        tree = std::make_unique<BasicKDTree2D<T>>(cloud, leaf_size);
     }
+    return all_nearest_neighbours(*tree, k, n_threads);
+}
 
-    // Query nearest neighbor for a given point (x,y)
-    std::pair<size_t, double> query(double x, double y) const
+// Greedy nearest-neighbour path from `start`, optionally refined by 2-opt: (order[N], length)
+static py::tuple greedy_tour_path(PointsArray points, size_t start, double two_opt_seconds, size_t neighbours,
+                                  unsigned n_threads)
+{
+    points = check_points(std::move(points));
+    const auto n = static_cast<size_t>(points.shape(0));
+    if (n > 0 && start >= n)
+        throw std::invalid_argument("start must be a row of points, got " + std::to_string(start));
+    if (!std::isfinite(two_opt_seconds) || two_opt_seconds < 0.0)
+        throw std::invalid_argument("two_opt_seconds must be finite and non-negative");
+    const double *xy = points.data();
+    std::vector<int64_t> order;
+    double length = 0.0;
     {
-        double query_pt[2] = {x, y};
-        size_t ret_index = size_t(-1);
-        double out_dist_sqr = 0.0;
+        py::gil_scoped_release release;
+        order = greedy_tour(xy, n, start);
+        if (two_opt_seconds > 0.0)
+            two_opt(xy, order, neighbours, two_opt_seconds, n_threads);
+        length = path_length(xy, order);
+    }
+    return py::make_tuple(as_array(std::move(order)), length);
+}
 
-        nanoflann::KNNResultSet<double> resultSet(1);
-        resultSet.init(&ret_index, &out_dist_sqr);
-        index_.findNeighbors(resultSet, query_pt, nanoflann::SearchParameters(10));
+// C-contiguous int64 ID array; converted once if the caller passes another integer dtype
+using IdsArray = py::array_t<int64_t, py::array::c_style | py::array::forcecast>;
 
-        return {ret_index, std::sqrt(out_dist_sqr)};
+// Insert an (N, 2) array into a dynamic tree and return the assigned IDs
+static py::array_t<int64_t> add_points(DynamicKDTree2D &tree, PointsArray points, std::optional<IdsArray> ids)
+{
+    points = check_points(std::move(points));
+    const auto n = points.shape(0);
+    if (ids && (ids->ndim() != 1 || ids->shape(0) != n))
+        throw std::invalid_argument("ids must be a 1-D array with one entry per point");
+    py::array_t<int64_t> assigned(n);
+    const double *xy = points.data();
+    const int64_t *requested = ids ? ids->data() : nullptr;
+    int64_t *out = assigned.mutable_data();
+    {
+        py::gil_scoped_release release;
+        tree.add_points(xy, static_cast<size_t>(n), requested, out);
     }
+    return assigned;
+}
 
-private:
-    const PointCloud &cloud_;
-    KDTree_t index_;
-};
+static size_t remove_ids(DynamicKDTree2D &tree, IdsArray ids)
+{
+    const int64_t *data = ids.data();
+    const auto n = static_cast<size_t>(ids.size());
+    py::gil_scoped_release release;
+    return tree.remove(data, n);
+}
+
+// Saved points live next to the index file as a .npy array
+static std::string points_path(const std::string &path)
+{
+    return path + ".npy";
+}
+
+// Write the index to `path` and the points it was built over to `path + ".npy"`
+template <typename T>
+static void save(py::object self, const std::string &path)
+{
+    const auto &tree = self.cast<const BasicKDTree2D<T> &>();
+    CoordArray<T> points({static_cast<py::ssize_t>(tree.size()), py::ssize_t(2)}, tree.cloud().data(), self);
+    py::module_::import("numpy").attr("save")(points_path(path), points);
+    py::gil_scoped_release release;
+    tree.save(path);
+}
+
+// Reattach a saved index to its points, memory-mapped read-only rather than read into RAM
+template <typename T>
+static std::unique_ptr<BasicKDTree2D<T>> load(const std::string &path)
+{
+    py::array stored = py::module_::import("numpy").attr("load")(points_path(path), py::arg("mmap_mode") = "r");
+    if (!stored.dtype().is(py::dtype::of<T>()))
+        throw std::invalid_argument("index at " + path + " was saved over " +
+                                    py::str(stored.dtype()).cast<std::string>() + " points");
+    auto cloud = std::make_shared<NumpyPointCloud<T>>(check_points<T>(std::move(stored)));
+    py::gil_scoped_release release;
+    return BasicKDTree2D<T>::load(cloud, path);
+}
+
+// Register the point cloud and static tree over `T` coordinates; returns the cloud class
+template <typename T>
+static py::class_<BasicPointCloud<T>, std::shared_ptr<BasicPointCloud<T>>>
+bind_static_tree(py::module_ &m, const char *cloud_name, const char *tree_name, const char *dtype)
+{
+    using Cloud = BasicPointCloud<T>;
+    using Tree = BasicKDTree2D<T>;
+
+    auto cloud_class = py::class_<Cloud, std::shared_ptr<Cloud>>(m, cloud_name);
+    cloud_class
+        .def(py::init([](CoordArray<T> points)
+                      { return std::make_shared<NumpyPointCloud<T>>(check_points<T>(std::move(points))); }),
+             py::arg("points"),
+             (std::string("Wrap an (N, 2) ") + dtype + " array without copying it (other dtypes/layouts are converted once)").c_str())
+        .def("__len__", &Cloud::size)
+        .def_property_readonly(
+            "points",
+            [](py::object self)
+            {
+                const auto &cloud = self.cast<const Cloud &>();
+                CoordArray<T> view({static_cast<py::ssize_t>(cloud.size()), py::ssize_t(2)}, cloud.data(), self);
+                view.attr("setflags")(py::arg("write") = false);
+                return view;
+            },
+            "Read-only (N, 2) view of the stored points");
+
+    // Build over `cloud` with the GIL released. `cloud` keeps its own reference, so a NumPy-backed
+    // cloud the tree drops (reordered, or on error) is released only once the GIL is held again.
+    auto build = [](std::shared_ptr<Cloud> cloud, size_t leaf_size, const std::string &curve)
+    {
+        const Curve parsed = parse_curve(curve);
+        py::gil_scoped_release release;
+        return std::make_unique<Tree>(cloud, leaf_size, parsed);
+    };
+
+    py::class_<Tree>(m, tree_name)
+        .def(py::init(build), py::arg("cloud"), py::kw_only(), py::arg("leaf_size") = Tree::kDefaultLeafSize,
+             py::arg("curve") = "none")
+        .def(py::init([build](CoordArray<T> points, size_t leaf_size, const std::string &curve)
+                      { return build(std::make_shared<NumpyPointCloud<T>>(check_points<T>(std::move(points))),
+                                     leaf_size, curve); }),
+             py::arg("points"), py::kw_only(), py::arg("leaf_size") = Tree::kDefaultLeafSize,
+             py::arg("curve") = "none",
+             (std::string("Build the index directly over an (N, 2) ") + dtype +
+              " array without copying it; leaves hold up to leaf_size points. curve='morton' or 'hilbert' "
+              "instead stores a copy of the points in that curve order and searches large k-NN batches "
+              "along it; results still refer to input rows")
+                 .c_str())
+        .def("__len__", &Tree::size)
+        .def_property_readonly("leaf_size", &Tree::leaf_size, "Maximum points per leaf the index was built with")
+        .def_property_readonly(
+            "curve", [](const Tree &tree)
+            { return std::string(curve_name(tree.curve())); },
+            "Space-filling curve the points are stored in: 'none', 'morton' or 'hilbert'")
+        .def_property_readonly(
+            "order",
+            [](py::object self) -> py::object
+            {
+                const auto &order = self.cast<const Tree &>().order();
+                if (order.empty())
+                    return py::none();
+                py::array_t<uint32_t> view(static_cast<py::ssize_t>(order.size()), order.data(), self);
+                view.attr("setflags")(py::arg("write") = false);
+                return std::move(view);
+            },
+            "Read-only input row of each stored point (cloud.points[i] is input row order[i]); "
+            "None unless the points were reordered")
+        .def_property_readonly(
+            "dtype", [dtype](const Tree &)
+            { return py::dtype(dtype); },
+            "Coordinate dtype of the stored points")
+        .def_property_readonly(
+            "cloud",
+            [](const Tree &tree)
+            { return std::const_pointer_cast<Cloud>(tree.shared_cloud()); },
+            "Point cloud the index was built over (in curve order on a reordered tree)")
+        .def("memory_usage", &Tree::memory_usage,
+             "Bytes of point storage (owned or borrowed) plus the index")
+        .def("index_memory_usage", &Tree::index_memory_usage,
+             "Bytes of the index alone: tree nodes and the point permutation")
+        .def("save", &save<T>, py::arg("path"),
+             "Write the built index to path and its points to path + '.npy'")
+        .def_static("load", &load<T>, py::arg("path"),
+                    "Load an index written by save() without rebuilding it; the points are "
+                    "memory-mapped read-only from path + '.npy', so processes share one page-cached copy")
+        .def(
+            "query", [](const Tree &tree, double x, double y, float eps)
+            { return tree.query(x, y, check_eps(eps)); },
+            py::arg("x"), py::arg("y"), py::kw_only(), py::arg("eps") = 0.0f)
+        .def(
+            "query_batch", [](const Tree &tree, PointsArray queries, unsigned n_threads, float eps)
+            { return query_batch(tree, std::move(queries), n_threads, check_eps(eps)); },
+            py::arg("queries"), py::arg("n_threads") = 0, py::kw_only(), py::arg("eps") = 0.0f,
+            "Nearest neighbour of each row of an (M, 2) array as (indices[M], distances[M]); "
+            "releases the GIL and splits the batch across n_threads (0 = all cores)")
+        .def(
+            "query_knn", [](const Tree &tree, PointsArray queries, size_t k, unsigned n_threads, float eps)
+            { return query_knn(tree, std::move(queries), k, n_threads, check_eps(eps)); },
+            py::arg("queries"), py::arg("k"), py::arg("n_threads") = 0, py::kw_only(), py::arg("eps") = 0.0f,
+            "k nearest neighbours of each row of an (M, 2) array as (indices[M, k], distances[M, k]), "
+            "nearest first; rows are padded with -1 / NaN when the tree holds fewer than k points. "
+            "eps > 0 returns approximate neighbours, each at most (1 + eps) times farther than the true one")
+        .def(
+            "query_knn_profiled", [](const Tree &tree, PointsArray queries, size_t k, unsigned n_threads, float eps)
+            { return query_knn_profiled(tree, std::move(queries), k, n_threads, check_eps(eps)); },
+            py::arg("queries"), py::arg("k"), py::arg("n_threads") = 0, py::kw_only(), py::arg("eps") = 0.0f,
+            "query_knn plus per-query counters: (indices, distances, nodes_visited[M], distance_computations[M]); "
+            "an instrumented traversal with the same results, kept separate so query_knn has no counting overhead")
+        .def("query_radius", &query_radius<Tree>, py::arg("queries"), py::arg("radius"), py::arg("n_threads") = 0,
+             "Neighbours within radius of each row of an (M, 2) array as CSR (offsets[M + 1], indices, distances); "
+             "neighbours of query i are indices[offsets[i]:offsets[i + 1]], sorted by distance")
+        .def("all_nearest_neighbours", &all_nearest_neighbours<T>, py::arg("k") = 1, py::kw_only(),
+             py::arg("n_threads") = 0,
+             "k nearest other points of every indexed point as (indices[N, k], distances[N, k]) in input "
+             "row order, nearest first. A point is never its own neighbour, but a duplicate of it is (at "
+             "distance 0); rows are padded with -1 / NaN when the tree holds at most k points. Searches a "
+             "leaf of points at a time with the GIL released, split across n_threads (0 = all cores)");
+    return cloud_class;
+}
 
 PYBIND11_MODULE(kd_tree_cpp, m)
 {
@@ -80,10 +381,72 @@ PYBIND11_MODULE(kd_tree_cpp, m)
         .def_readwrite("x", &PointCloud::Point::x)
         .def_readwrite("y", &PointCloud::Point::y);
 
-    py::class_<PointCloud>(m, "PointCloud")
-        .def(py::init<const std::vector<PointCloud::Point> &>());
+    bind_static_tree<double>(m, "PointCloud", "KDTree2D", "float64")
+        .def(py::init<const std::vector<PointCloud::Point> &>(), py::arg("points"));
+    // Half the point storage; queries are still given in float64 and distances returned in float64
+    bind_static_tree<float>(m, "PointCloudFloat32", "KDTree2DFloat32", "float32");
+    m.def(
+        "all_nearest_neighbours",
+        [](py::object points, size_t k, size_t leaf_size, unsigned n_threads)
+        {
+            // float32 arrays stay float32; anything else array-like is converted to float64
+            auto array = py::array::ensure(points);
+            if (array && array.dtype().is(py::dtype::of<float>()))
+                return build_and_join<float>(CoordArray<float>::ensure(array), k, leaf_size, n_threads);
+            auto converted = PointsArray::ensure(points);
+            if (!converted)
+                throw std::invalid_argument("points must be an (N, 2) array");
+            return build_and_join<double>(std::move(converted), k, leaf_size, n_threads);
+        },
+        py::arg("points"), py::arg("k") = 1, py::kw_only(), py::arg("leaf_size") = KDTree2D::kDefaultLeafSize,
+        py::arg("n_threads") = 0,
+        "k nearest other points of every row of an (N, 2) array as (indices[N, k], distances[N, k]), "
+        "without self-matches (duplicates still match each other at distance 0). Builds a temporary "
+        "kd-tree (float32 for float32 input) and searches it a leaf at a time; see "
+        "KDTree2D.all_nearest_neighbours");
+
+    m.def("greedy_tour", &greedy_tour_path, py::arg("points"), py::arg("start") = 0, py::kw_only(),
+          py::arg("two_opt_seconds") = 0.0, py::arg("neighbours") = 8, py::arg("n_threads") = 0,
+          "Stitch path through every row of an (N, 2) array as (order[N], length): starting at row start, "
+          "repeatedly jump to the nearest unvisited point, found in a kd-tree that points are removed from "
+          "(O(N log N)). With two_opt_seconds > 0 the open path is then shortened by 2-opt moves between "
+          "each point and its `neighbours` nearest points until none helps or the time budget is spent; "
+          "start stays first. length is the total jump length. Runs with the GIL released");
 
-    py::class_<KDTree2D>(m, "KDTree2D")
-        .def(py::init<const PointCloud &>())
-        .def("query", &KDTree2D::query);
+    py::class_<DynamicKDTree2D>(m, "DynamicKDTree2D")
+        .def(py::init<size_t>(), py::kw_only(), py::arg("leaf_size") = DynamicKDTree2D::kDefaultLeafSize,
+             "Empty tree; the leaves of every tree in the forest hold up to leaf_size points")
+        .def(py::init([](PointsArray points, std::optional<IdsArray> ids, size_t leaf_size)
+                      {
+                          auto tree = std::make_unique<DynamicKDTree2D>(leaf_size);
+                          add_points(*tree, std::move(points), std::move(ids));
+                          return tree; }),
+             py::arg("points"), py::arg("ids") = py::none(), py::kw_only(),
+             py::arg("leaf_size") = DynamicKDTree2D::kDefaultLeafSize,
+             "Build over an (N, 2) array; IDs default to 0..N-1")
+        .def("__len__", &DynamicKDTree2D::size)
+        .def_property_readonly("leaf_size", &DynamicKDTree2D::leaf_size,
+                               "Maximum points per leaf of each tree in the forest")
+        .def("add_points", &add_points, py::arg("points"), py::arg("ids") = py::none(),
+             "Insert the rows of an (N, 2) array and return their IDs (fresh IDs unless ids is given); "
+             "amortized O(log^2 N) per point")
+        .def("remove", &remove_ids, py::arg("ids"),
+             "Remove the points with the given IDs and return how many were present")
+        .def_property_readonly(
+            "ids", [](const DynamicKDTree2D &tree)
+            { return as_array(tree.ids()); },
+            "IDs of the live points, in insertion order")
+        .def("memory_usage", &DynamicKDTree2D::memory_usage,
+             "Approximate bytes of point storage, ID tables and the index")
+        .def("index_memory_usage", &DynamicKDTree2D::index_memory_usage,
+             "Bytes of the index alone: every tree's nodes and permutation plus the per-point tree assignment")
+        .def("query", &DynamicKDTree2D::query, py::arg("x"), py::arg("y"),
+             "Nearest neighbour of (x, y) as (id, distance)")
+        .def("query_batch", &query_batch<DynamicKDTree2D>, py::arg("queries"), py::arg("n_threads") = 0,
+             "Nearest neighbour ID and distance for each row of an (M, 2) array (GIL released)")
+        .def("query_knn", &query_knn<DynamicKDTree2D>, py::arg("queries"), py::arg("k"), py::arg("n_threads") = 0,
+             "k nearest neighbour IDs and distances as (M, k) arrays, nearest first, padded with -1 / NaN")
+        .def("query_radius", &query_radius<DynamicKDTree2D>, py::arg("queries"), py::arg("radius"),
+             py::arg("n_threads") = 0,
+             "IDs within radius of each row of an (M, 2) array as CSR (offsets[M + 1], ids, distances)");
 }
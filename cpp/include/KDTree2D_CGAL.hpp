@@ -3,12 +3,42 @@
 #include <vector>
 #include <utility>
 #include <cstddef> // for size_t
+#include <cstdint>
 
+/**
+ * CGAL kd-tree over 2D points. Each tree entry carries the point's original index, so a search
+ * reports indices directly (O(log N) per nearest-neighbour query, duplicates keep distinct indices).
+ * The tree is built eagerly, so const queries may run concurrently.
+ */
 class CGALKDTree2D
 {
 public:
     CGALKDTree2D(const std::vector<std::pair<double, double>> &points);
+    CGALKDTree2D(const double *xy, size_t n);
+    ~CGALKDTree2D();
+    CGALKDTree2D(const CGALKDTree2D &) = delete;
+    CGALKDTree2D &operator=(const CGALKDTree2D &) = delete;
+
     std::pair<size_t, double> query(double x, double y) const;
+    size_t size() const;
+
+    // Bytes of the tree: its copy of the entries, the entry pointer array and the leaf/internal nodes
+    size_t memory_usage() const;
+
+    // k nearest neighbours of each (x, y) row as row-major (m, k) blocks, padded with -1 / NaN
+    void query_knn(const double *queries, size_t m, size_t k, int64_t *indices, double *distances,
+                   unsigned n_threads = 0) const;
+
+    // query_knn through a counting traversal of the same tree, plus, per query, the tree nodes
+    // visited and the point distances computed
+    void query_knn_profiled(const double *queries, size_t m, size_t k, int64_t *indices, double *distances,
+                            int64_t *nodes_visited, int64_t *distance_computations,
+                            unsigned n_threads = 0) const;
+
+    // Points within `radius` (inclusive) of each (x, y) row in CSR layout, sorted by distance
+    void query_radius(const double *queries, size_t m, double radius, std::vector<int64_t> &offsets,
+                      std::vector<int64_t> &indices, std::vector<double> &distances,
+                      unsigned n_threads = 0) const;
 
 private:
     struct Impl;
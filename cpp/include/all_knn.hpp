@@ -0,0 +1,197 @@
+/**
+ * @file all_knn.hpp
+ * @brief All-points k-nearest-neighbour search (self-join) over a built nanoflann index.
+ *
+ * Rather than one root-to-leaf search per point, `all_knn_leaves` searches once per leaf on behalf
+ * of all the points in it: a subtree is skipped when its region is farther from the leaf's bounding
+ * box than the current k-th neighbour of every point in the leaf, so one traversal serves about
+ * `leaf_size` points. A point is excluded from its own neighbours by its position in the index,
+ * not by its coordinates, so duplicate points are still reported as each other's neighbours at
+ * distance 0. Distances are the index's own metric, so they match its k-NN queries exactly.
+ */
+
+#pragma once
+
+#include "parallel.hpp"
+#include <algorithm>
+#include <cstddef>
+#include <limits>
+#include <vector>
+
+// Axis-aligned 2D box
+struct Box2D
+{
+    double low[2], high[2];
+};
+
+// Squared distance between two boxes (0 when they overlap)
+inline double box_gap_sqr(const Box2D &a, const Box2D &b)
+{
+    double result = 0.0;
+    for (int d = 0; d < 2; ++d)
+    {
+        const double gap = std::max({a.low[d] - b.high[d], b.low[d] - a.high[d], 0.0});
+        result += gap * gap;
+    }
+    return result;
+}
+
+// k nearest other points of each point in one leaf at a time; reused across leaves by one thread
+template <class Index>
+class LeafNeighbours
+{
+public:
+    using NodePtr = typename Index::NodePtr;
+
+    LeafNeighbours(const Index &index, size_t k) : index_(index), k_(k) {}
+
+    /**
+     * @brief Search for every point of `leaf`, then call `emit(row, indices, dist_sqr, found)` for each.
+     *
+     * `row` is the point's dataset index; its `found` (at most k) neighbours are dataset indices
+     * with squared distances, nearest first.
+     */
+    template <class Emit>
+    void search(NodePtr leaf, Emit &&emit)
+    {
+        constexpr double inf = std::numeric_limits<double>::infinity();
+        const size_t left = leaf->node_type.lr.left;
+        const size_t m = leaf->node_type.lr.right - left;
+        rows_.resize(m);
+        xy_.resize(2 * m);
+        found_.assign(m, 0);
+        worst_.assign(m, inf);
+        indices_.resize(m * k_);
+        dist_sqr_.resize(m * k_);
+        Box2D box{{inf, inf}, {-inf, -inf}};
+        for (size_t i = 0; i < m; ++i)
+        {
+            rows_[i] = index_.vAcc_[left + i];
+            for (int d = 0; d < 2; ++d)
+            {
+                xy_[2 * i + d] = index_.dataset_.kdtree_get_pt(rows_[i], d);
+                box.low[d] = std::min(box.low[d], double(xy_[2 * i + d]));
+                box.high[d] = std::max(box.high[d], double(xy_[2 * i + d]));
+            }
+        }
+        bound_ = inf;
+        Box2D root;
+        for (int d = 0; d < 2; ++d)
+        {
+            root.low[d] = index_.root_bbox_[d].low;
+            root.high[d] = index_.root_bbox_[d].high;
+        }
+        visit(index_.root_node_, root, box);
+        for (size_t i = 0; i < m; ++i)
+            emit(rows_[i], indices_.data() + i * k_, dist_sqr_.data() + i * k_, found_[i]);
+    }
+
+private:
+    using Coord = typename Index::ElementType;
+
+    // Descend into the nearer child first, so the bound has tightened before the farther one is tested
+    void visit(NodePtr node, const Box2D &region, const Box2D &box)
+    {
+        if (node->child1 == nullptr && node->child2 == nullptr)
+        {
+            scan(node, region);
+            return;
+        }
+        const auto dim = node->node_type.sub.divfeat;
+        Box2D low = region, high = region;
+        low.high[dim] = node->node_type.sub.divlow;
+        high.low[dim] = node->node_type.sub.divhigh;
+        const double low_gap = box_gap_sqr(low, box);
+        const double high_gap = box_gap_sqr(high, box);
+        const bool low_first = low_gap <= high_gap;
+        if ((low_first ? low_gap : high_gap) < bound_)
+            visit(low_first ? node->child1 : node->child2, low_first ? low : high, box);
+        if ((low_first ? high_gap : low_gap) < bound_)
+            visit(low_first ? node->child2 : node->child1, low_first ? high : low, box);
+    }
+
+    // Offer the points of a leaf to each point of the current leaf that its region could improve,
+    // then tighten the bound
+    void scan(NodePtr node, const Box2D &region)
+    {
+        for (size_t i = 0; i < rows_.size(); ++i)
+        {
+            const Box2D point{{double(xy_[2 * i]), double(xy_[2 * i + 1])},
+                              {double(xy_[2 * i]), double(xy_[2 * i + 1])}};
+            if (box_gap_sqr(point, region) >= worst_[i])
+                continue;
+            for (auto j = node->node_type.lr.left; j < node->node_type.lr.right; ++j)
+            {
+                const size_t candidate = index_.vAcc_[j];
+                if (candidate == rows_[i])
+                    continue;
+                const double dist = index_.distance_.evalMetric(&xy_[2 * i], candidate, 2);
+                if (dist < worst_[i])
+                    insert(i, dist, candidate);
+            }
+        }
+        bound_ = *std::max_element(worst_.begin(), worst_.end());
+    }
+
+    // Insert into point i's sorted neighbours, dropping the farthest once it has k
+    void insert(size_t i, double dist, size_t candidate)
+    {
+        size_t *indices = indices_.data() + i * k_;
+        double *dist_sqr = dist_sqr_.data() + i * k_;
+        size_t j = found_[i] < k_ ? found_[i]++ : k_ - 1;
+        for (; j > 0 && dist_sqr[j - 1] > dist; --j)
+        {
+            dist_sqr[j] = dist_sqr[j - 1];
+            indices[j] = indices[j - 1];
+        }
+        dist_sqr[j] = dist;
+        indices[j] = candidate;
+        if (found_[i] == k_)
+            worst_[i] = dist_sqr[k_ - 1];
+    }
+
+    const Index &index_;
+    const size_t k_;
+    std::vector<size_t> rows_;
+    std::vector<Coord> xy_;
+    std::vector<size_t> found_;
+    std::vector<double> worst_; // k-th neighbour distance of each point; infinite until it has k
+    std::vector<size_t> indices_;
+    std::vector<double> dist_sqr_;
+    double bound_ = 0.0; // largest entry of worst_
+};
+
+/**
+ * @brief The `k` nearest other points of every point in a built 2D index.
+ *
+ * Calls `emit(row, indices, dist_sqr, found)` once per indexed point (see LeafNeighbours::search),
+ * from up to `n_threads` threads (0 = all cores) working on disjoint runs of leaves; `emit` must be
+ * safe to call concurrently for different rows.
+ */
+template <class Index, class Emit>
+void all_knn_leaves(const Index &index, size_t k, unsigned n_threads, Emit &&emit)
+{
+    if (index.size_ == 0 || index.root_node_ == nullptr || k == 0)
+        return;
+    // Leaves in tree order, so each thread's run of leaves covers a compact region
+    std::vector<typename Index::NodePtr> leaves, stack{index.root_node_};
+    while (!stack.empty())
+    {
+        const auto node = stack.back();
+        stack.pop_back();
+        if (node->child1 == nullptr && node->child2 == nullptr)
+            leaves.push_back(node);
+        else
+        {
+            stack.push_back(node->child2);
+            stack.push_back(node->child1);
+        }
+    }
+    parallel_for(
+        leaves.size(), n_threads, [&](size_t begin, size_t end)
+        {
+            LeafNeighbours<Index> searcher(index, k);
+            for (size_t l = begin; l < end; ++l)
+                searcher.search(leaves[l], emit); },
+        64);
+}
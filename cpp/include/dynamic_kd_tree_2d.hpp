@@ -0,0 +1,321 @@
+/**
+ * @file dynamic_kd_tree_2d.hpp
+ * @brief Dynamic 2D kd-tree supporting insertions and deletions under stable external IDs.
+ *
+ * ## Data Structures
+ * - **DynamicPointStore**: nanoflann dataset adaptor over an owned, append-only `(x0, y0, x1, y1, ...)`
+ *   buffer. Points are addressed by slot; a slot is never reused until the store is compacted.
+ * - **DynamicKDTree2D**: nanoflann's `KDTreeSingleIndexDynamicAdaptor`, a logarithmic forest of static
+ *   trees (tree `i` holds 2^i points), so an insertion costs amortized O(log^2 N) instead of a rebuild.
+ *   Deletions are lazy; once deleted slots outnumber live ones the store is compacted and the forest
+ *   rebuilt, which keeps deletion cost amortized O(1) rebuild work per point. Callers see only
+ *   external IDs, which survive compaction.
+ *
+ * Queries take a shared lock and updates an exclusive one, so concurrent batch queries (with the GIL
+ * released) never observe a half-applied update.
+ */
+
+#pragma once
+
+#include <nanoflann.hpp>
+#include "parallel.hpp"
+#include <algorithm>
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+#include <limits>
+#include <memory>
+#include <mutex>
+#include <shared_mutex>
+#include <stdexcept>
+#include <string>
+#include <unordered_map>
+#include <unordered_set>
+#include <utility>
+#include <vector>
+
+// Append-only point storage addressed by slot, with the nanoflann adaptor interface
+class DynamicPointStore
+{
+public:
+    void append(const double *xy, size_t n) { xy_.insert(xy_.end(), xy, xy + 2 * n); }
+    void clear() { xy_.clear(); }
+    void reserve(size_t n) { xy_.reserve(2 * n); }
+
+    size_t size() const { return xy_.size() / 2; }
+    const double *data() const { return xy_.data(); }
+    size_t capacity_bytes() const { return xy_.capacity() * sizeof(double); }
+
+    // nanoflann interface
+    inline size_t kdtree_get_point_count() const { return size(); }
+
+    inline double kdtree_get_pt(const size_t idx, const size_t dim) const
+    {
+        return xy_[2 * idx + dim];
+    }
+
+    template <class BBOX>
+    bool kdtree_get_bbox(BBOX &) const { return false; }
+
+private:
+    std::vector<double> xy_;
+};
+
+class DynamicKDTree2D
+{
+public:
+    using KDTree_t = nanoflann::KDTreeSingleIndexDynamicAdaptor<
+        nanoflann::L2_Simple_Adaptor<double, DynamicPointStore>,
+        DynamicPointStore,
+        2 /* dimension */,
+        size_t>;
+
+    static constexpr size_t kDefaultLeafSize = 10;
+
+    // Leaves of every tree in the forest hold up to `leaf_size` points
+    explicit DynamicKDTree2D(size_t leaf_size = kDefaultLeafSize) : leaf_size_(leaf_size)
+    {
+        if (leaf_size == 0)
+            throw std::invalid_argument("leaf_size must be at least 1");
+        reset_index();
+    }
+
+    DynamicKDTree2D(const DynamicKDTree2D &) = delete;
+    DynamicKDTree2D &operator=(const DynamicKDTree2D &) = delete;
+
+    /**
+     * @brief Insert `n` points stored as a flat (x, y) buffer.
+     *
+     * With `ids == nullptr` fresh IDs are assigned (one past the largest ID seen so far). The ID of
+     * point `i` is written to `out_ids[i]`. Throws std::invalid_argument, leaving the tree unchanged,
+     * if an ID is negative, repeated, or already present.
+     */
+    void add_points(const double *xy, size_t n, const int64_t *ids, int64_t *out_ids)
+    {
+        std::unique_lock lock(mutex_);
+        if (ids != nullptr)
+        {
+            std::unordered_set<int64_t> batch;
+            batch.reserve(n);
+            for (size_t i = 0; i < n; ++i)
+            {
+                if (ids[i] < 0)
+                    throw std::invalid_argument("ids must be non-negative");
+                if (slot_of_.count(ids[i]) || !batch.insert(ids[i]).second)
+                    throw std::invalid_argument("duplicate id " + std::to_string(ids[i]));
+            }
+        }
+        if (n == 0)
+            return;
+
+        const size_t first = store_.size();
+        store_.append(xy, n);
+        slot_ids_.reserve(first + n);
+        slot_of_.reserve(slot_of_.size() + n);
+        for (size_t i = 0; i < n; ++i)
+        {
+            const int64_t id = ids != nullptr ? ids[i] : next_id_;
+            next_id_ = std::max(next_id_, id + 1);
+            slot_ids_.push_back(id);
+            slot_of_.emplace(id, first + i);
+            out_ids[i] = id;
+        }
+        index_->addPoints(first, first + n - 1);
+    }
+
+    /**
+     * @brief Remove the points with the given IDs; unknown IDs are ignored.
+     *
+     * @return The number of points removed.
+     */
+    size_t remove(const int64_t *ids, size_t n)
+    {
+        std::unique_lock lock(mutex_);
+        size_t removed = 0;
+        for (size_t i = 0; i < n; ++i)
+        {
+            const auto it = slot_of_.find(ids[i]);
+            if (it == slot_of_.end())
+                continue;
+            index_->removePoint(it->second);
+            slot_ids_[it->second] = -1;
+            slot_of_.erase(it);
+            ++removed;
+        }
+        if (store_.size() - slot_of_.size() > slot_of_.size())
+            compact();
+        return removed;
+    }
+
+    // Nearest neighbour of (x, y) as (id, distance); (-1, NaN) if the tree is empty
+    std::pair<int64_t, double> query(double x, double y) const
+    {
+        const double q[2] = {x, y};
+        int64_t id;
+        double dist;
+        query_knn(q, 1, 1, &id, &dist, 1);
+        return {id, dist};
+    }
+
+    // Nearest neighbour ID and distance for each of `m` queries (see KDTree2D::query_batch)
+    void query_batch(const double *queries, size_t m, int64_t *ids, double *distances,
+                     unsigned n_threads = 0) const
+    {
+        query_knn(queries, m, 1, ids, distances, n_threads);
+    }
+
+    /**
+     * @brief The `k` nearest neighbours of each of `m` queries as external IDs, nearest first.
+     *
+     * Same row-major (m, k) layout and -1 / NaN padding as KDTree2D::query_knn.
+     */
+    void query_knn(const double *queries, size_t m, size_t k, int64_t *ids, double *distances,
+                   unsigned n_threads = 0) const
+    {
+        std::shared_lock lock(mutex_);
+        parallel_for(m, n_threads, [&](size_t begin, size_t end)
+                     {
+            std::vector<size_t> ret_index(k);
+            std::vector<double> out_dist_sqr(k);
+            for (size_t i = begin; i < end; ++i)
+            {
+                nanoflann::KNNResultSet<double> resultSet(k);
+                resultSet.init(ret_index.data(), out_dist_sqr.data());
+                index_->findNeighbors(resultSet, queries + 2 * i, search_params_);
+                const size_t found = resultSet.size();
+                int64_t *row_ids = ids + i * k;
+                double *row_dist = distances + i * k;
+                for (size_t j = 0; j < k; ++j)
+                {
+                    row_ids[j] = j < found ? slot_ids_[ret_index[j]] : -1;
+                    row_dist[j] = j < found ? std::sqrt(out_dist_sqr[j]) : std::nan("");
+                }
+            } });
+    }
+
+    /**
+     * @brief All points within `radius` (inclusive) of each of `m` queries, as external IDs in CSR layout.
+     *
+     * Same layout and ordering as KDTree2D::query_radius.
+     */
+    void query_radius(const double *queries, size_t m, double radius, std::vector<int64_t> &offsets,
+                      std::vector<int64_t> &ids, std::vector<double> &distances,
+                      unsigned n_threads = 0) const
+    {
+        std::shared_lock lock(mutex_);
+        // nanoflann's radius test is strict; nudge the squared radius so the bound is inclusive
+        const double radius_sqr = std::nextafter(radius * radius, std::numeric_limits<double>::infinity());
+        std::vector<std::vector<nanoflann::ResultItem<size_t, double>>> chunk_hits(resolve_threads(m, n_threads));
+        offsets.assign(m + 1, 0);
+
+        parallel_chunks(m, n_threads, [&](unsigned chunk, size_t begin, size_t end)
+                        {
+            auto &hits = chunk_hits[chunk];
+            std::vector<nanoflann::ResultItem<size_t, double>> found;
+            for (size_t i = begin; i < end; ++i)
+            {
+                nanoflann::RadiusResultSet<double, size_t> resultSet(radius_sqr, found);
+                index_->findNeighbors(resultSet, queries + 2 * i, search_params_);
+                std::sort(found.begin(), found.end(), nanoflann::IndexDist_Sorter());
+                offsets[i + 1] = static_cast<int64_t>(found.size());
+                hits.insert(hits.end(), found.begin(), found.end());
+            } });
+
+        for (size_t i = 0; i < m; ++i)
+            offsets[i + 1] += offsets[i];
+        ids.resize(static_cast<size_t>(offsets[m]));
+        distances.resize(static_cast<size_t>(offsets[m]));
+        size_t pos = 0;
+        for (const auto &hits : chunk_hits)
+            for (const auto &hit : hits)
+            {
+                ids[pos] = slot_ids_[hit.first];
+                distances[pos] = std::sqrt(hit.second);
+                ++pos;
+            }
+    }
+
+    // Number of live points
+    size_t size() const
+    {
+        std::shared_lock lock(mutex_);
+        return slot_of_.size();
+    }
+
+    // Maximum points per leaf of each tree in the forest
+    size_t leaf_size() const { return leaf_size_; }
+
+    // Live IDs in slot (insertion) order
+    std::vector<int64_t> ids() const
+    {
+        std::shared_lock lock(mutex_);
+        std::vector<int64_t> live;
+        live.reserve(slot_of_.size());
+        for (int64_t id : slot_ids_)
+            if (id >= 0)
+                live.push_back(id);
+        return live;
+    }
+
+    // Approximate bytes held: point storage, slot/ID tables and the index (see index_memory_usage)
+    size_t memory_usage() const
+    {
+        std::shared_lock lock(mutex_);
+        const size_t map_entry = sizeof(std::pair<const int64_t, size_t>) + 2 * sizeof(void *);
+        return store_.capacity_bytes() + slot_ids_.capacity() * sizeof(int64_t) +
+               slot_of_.size() * map_entry + slot_of_.bucket_count() * sizeof(void *) +
+               forest_memory_usage();
+    }
+
+    // Bytes of the forest: every tree's node pool and permutation, plus the per-slot tree assignment
+    size_t index_memory_usage() const
+    {
+        std::shared_lock lock(mutex_);
+        return forest_memory_usage();
+    }
+
+private:
+    size_t forest_memory_usage() const
+    {
+        size_t bytes = store_.size() * sizeof(int); // tree assignment per slot
+        for (const auto &tree : index_->getAllIndices())
+            bytes += tree.pool_.usedMemory + tree.pool_.wastedMemory + tree.vAcc_.capacity() * sizeof(size_t);
+        return bytes;
+    }
+
+    // Drop deleted slots and rebuild the forest over the live points; IDs are unchanged
+    void compact()
+    {
+        DynamicPointStore live;
+        std::vector<int64_t> live_ids;
+        live.reserve(slot_of_.size());
+        live_ids.reserve(slot_of_.size());
+        for (size_t slot = 0; slot < slot_ids_.size(); ++slot)
+        {
+            if (slot_ids_[slot] < 0)
+                continue;
+            slot_of_[slot_ids_[slot]] = live_ids.size();
+            live_ids.push_back(slot_ids_[slot]);
+            live.append(store_.data() + 2 * slot, 1);
+        }
+        store_ = std::move(live);
+        slot_ids_ = std::move(live_ids);
+        reset_index();
+    }
+
+    // The forest references store_, so it is rebuilt whenever the store is replaced
+    void reset_index()
+    {
+        index_.reset();
+        index_ = std::make_unique<KDTree_t>(2, store_, nanoflann::KDTreeSingleIndexAdaptorParams(leaf_size_));
+    }
+
+    size_t leaf_size_;
+    DynamicPointStore store_;
+    std::vector<int64_t> slot_ids_;                // external ID per slot, -1 once removed
+    std::unordered_map<int64_t, size_t> slot_of_;  // live external ID -> slot
+    std::unique_ptr<KDTree_t> index_;
+    int64_t next_id_ = 0;
+    mutable std::shared_mutex mutex_;
+    nanoflann::SearchParameters search_params_{0.0f}; // exact search
+};
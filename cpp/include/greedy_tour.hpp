@@ -0,0 +1,318 @@
+/**
+ * @file greedy_tour.hpp
+ * @brief Greedy nearest-neighbour stitch path (an open tour) over 2D points, with optional 2-opt.
+ *
+ * ## Data Structures
+ * - **ShrinkingKDTree2D**: kd-tree over a fixed point set that supports removal only. Each node
+ *   counts its live points and each leaf keeps its live points at the front of its range, so a
+ *   removal swaps one entry and decrements the counts on one root path (O(log N)), and searches
+ *   skip emptied subtrees however many points are gone.
+ *
+ * ## Algorithms
+ * - `greedy_tour` starts at `start` and repeatedly jumps to the nearest unvisited point:
+ *   N removals and N - 1 nearest-live-point searches, O(N log N) on typical inputs.
+ * - `two_opt` shortens the path with 2-opt moves between each point and its k nearest neighbours,
+ *   taking points from a work queue (re-queueing the endpoints of every applied move) until no
+ *   move helps or the time budget runs out. The start point stays first; the far end is free.
+ */
+
+#pragma once
+
+#include "kd_tree_2d.hpp"
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+#include <deque>
+#include <limits>
+#include <memory>
+#include <numeric>
+#include <stdexcept>
+#include <utility>
+#include <vector>
+
+// kd-tree over `n` (x, y) pairs from which points can be removed but not added
+class ShrinkingKDTree2D
+{
+public:
+    static constexpr uint32_t kLeafSize = 8;
+
+    // `xy` is borrowed and must outlive the tree; `n` must be below 2^32
+    ShrinkingKDTree2D(const double *xy, size_t n) : xy_(xy), perm_(n), pos_(n), leaf_of_(n)
+    {
+        if (n >= kNone)
+            throw std::invalid_argument("ShrinkingKDTree2D supports fewer than 2^32 - 1 points");
+        std::iota(perm_.begin(), perm_.end(), uint32_t(0));
+        nodes_.reserve(2 * (n / kLeafSize + 1));
+        if (n > 0)
+            build(0, static_cast<uint32_t>(n), kNone);
+        for (uint32_t i = 0; i < n; ++i)
+            pos_[perm_[i]] = i;
+    }
+
+    // Number of points not yet removed
+    size_t size() const { return nodes_.empty() ? 0 : nodes_[0].alive; }
+
+    // Remove `point`; returns false if it was already removed
+    bool remove(size_t point)
+    {
+        uint32_t id = leaf_of_[point];
+        Node &leaf = nodes_[id];
+        const uint32_t at = pos_[point];
+        if (at >= leaf.begin + leaf.alive)
+            return false;
+        // Swap it to the end of the leaf's live range
+        const uint32_t last = leaf.begin + leaf.alive - 1;
+        std::swap(perm_[at], perm_[last]);
+        pos_[perm_[at]] = at;
+        pos_[perm_[last]] = last;
+        for (; id != kNone; id = nodes_[id].parent)
+            --nodes_[id].alive;
+        return true;
+    }
+
+    // Nearest live point to (x, y) as (point, squared distance); (-1, inf) once all are removed
+    std::pair<int64_t, double> nearest(double x, double y) const
+    {
+        std::pair<int64_t, double> best{-1, std::numeric_limits<double>::infinity()};
+        if (size() > 0)
+            search(0, x, y, best);
+        return best;
+    }
+
+private:
+    static constexpr uint32_t kNone = std::numeric_limits<uint32_t>::max();
+
+    struct Node
+    {
+        double low[2], high[2]; // tight bounds of the points built into the node
+        uint32_t begin, alive;  // live points are perm_[begin, begin + alive) in a leaf
+        uint32_t child[2] = {kNone, kNone};
+        uint32_t parent;
+    };
+
+    // Build the node over perm_[begin, end), splitting the wider side at the median
+    uint32_t build(uint32_t begin, uint32_t end, uint32_t parent)
+    {
+        const auto id = static_cast<uint32_t>(nodes_.size());
+        nodes_.push_back({});
+        Node node;
+        node.begin = begin;
+        node.alive = end - begin;
+        node.parent = parent;
+        for (int d = 0; d < 2; ++d)
+        {
+            node.low[d] = std::numeric_limits<double>::infinity();
+            node.high[d] = -node.low[d];
+        }
+        for (uint32_t i = begin; i < end; ++i)
+            for (int d = 0; d < 2; ++d)
+            {
+                node.low[d] = std::min(node.low[d], xy_[2 * perm_[i] + d]);
+                node.high[d] = std::max(node.high[d], xy_[2 * perm_[i] + d]);
+            }
+        if (end - begin <= kLeafSize)
+        {
+            for (uint32_t i = begin; i < end; ++i)
+                leaf_of_[perm_[i]] = id;
+        }
+        else
+        {
+            const int dim = node.high[0] - node.low[0] >= node.high[1] - node.low[1] ? 0 : 1;
+            const uint32_t mid = begin + (end - begin) / 2;
+            std::nth_element(perm_.begin() + begin, perm_.begin() + mid, perm_.begin() + end,
+                             [this, dim](uint32_t a, uint32_t b)
+                             { return xy_[2 * a + dim] < xy_[2 * b + dim]; });
+            node.child[0] = build(begin, mid, id);
+            node.child[1] = build(mid, end, id);
+        }
+        nodes_[id] = node;
+        return id;
+    }
+
+    // Squared distance from (x, y) to the node's bounds; infinite for an emptied node
+    double gap_sqr(uint32_t id, double x, double y) const
+    {
+        const Node &node = nodes_[id];
+        if (node.alive == 0)
+            return std::numeric_limits<double>::infinity();
+        const double dx = std::max({node.low[0] - x, x - node.high[0], 0.0});
+        const double dy = std::max({node.low[1] - y, y - node.high[1], 0.0});
+        return dx * dx + dy * dy;
+    }
+
+    void search(uint32_t id, double x, double y, std::pair<int64_t, double> &best) const
+    {
+        const Node &node = nodes_[id];
+        if (node.child[0] == kNone)
+        {
+            for (uint32_t i = node.begin; i < node.begin + node.alive; ++i)
+            {
+                const double dx = xy_[2 * perm_[i]] - x, dy = xy_[2 * perm_[i] + 1] - y;
+                const double dist = dx * dx + dy * dy;
+                if (dist < best.second)
+                    best = {perm_[i], dist};
+            }
+            return;
+        }
+        const double gaps[2] = {gap_sqr(node.child[0], x, y), gap_sqr(node.child[1], x, y)};
+        const int first = gaps[1] < gaps[0] ? 1 : 0;
+        if (gaps[first] < best.second)
+            search(node.child[first], x, y, best);
+        if (gaps[1 - first] < best.second)
+            search(node.child[1 - first], x, y, best);
+    }
+
+    const double *xy_;
+    std::vector<uint32_t> perm_;    // point ids, grouped by leaf
+    std::vector<uint32_t> pos_;     // position of each point in perm_
+    std::vector<uint32_t> leaf_of_; // leaf node holding each point
+    std::vector<Node> nodes_;       // nodes_[0] is the root
+};
+
+// Total Euclidean length of the open path visiting `order`
+inline double path_length(const double *xy, const std::vector<int64_t> &order)
+{
+    double length = 0.0;
+    for (size_t i = 1; i < order.size(); ++i)
+        length += std::hypot(xy[2 * order[i]] - xy[2 * order[i - 1]], xy[2 * order[i] + 1] - xy[2 * order[i - 1] + 1]);
+    return length;
+}
+
+/**
+ * @brief Visit all `n` points, starting at `start`, always jumping to the nearest unvisited one.
+ *
+ * Ties go to whichever point the search reaches first. Returns the visiting order.
+ */
+inline std::vector<int64_t> greedy_tour(const double *xy, size_t n, size_t start)
+{
+    if (n == 0)
+        return {};
+    if (start >= n)
+        throw std::invalid_argument("start must be a row of the points");
+    ShrinkingKDTree2D unvisited(xy, n);
+    std::vector<int64_t> order;
+    order.reserve(n);
+    auto current = static_cast<int64_t>(start);
+    for (;;)
+    {
+        order.push_back(current);
+        unvisited.remove(static_cast<size_t>(current));
+        if (unvisited.size() == 0)
+            break;
+        current = unvisited.nearest(xy[2 * current], xy[2 * current + 1]).first;
+    }
+    return order;
+}
+
+/**
+ * @brief Shorten the open path `order` over `xy` in place with neighbour-list 2-opt.
+ *
+ * A move replaces two path edges, one at a point `a` and one at one of its `k` nearest neighbours
+ * `c`, by the edges `(a, c)` and the pair of their old partners, reversing the path between them.
+ * Moves reversing more than `max_reversal` points are skipped (on an open path the complementary
+ * reversal is not available). Stops when no move improves or after `seconds` (at most 10^6); the
+ * neighbour lists are computed on `n_threads` threads (0 = all cores). Returns the number of moves
+ * applied.
+ */
+inline size_t two_opt(const double *xy, std::vector<int64_t> &order, size_t k, double seconds,
+                      unsigned n_threads = 0, size_t max_reversal = 50000)
+{
+    using Clock = std::chrono::steady_clock;
+    // Converting a longer (or infinite / NaN) budget to clock ticks would overflow
+    constexpr double kMaxSeconds = 1e6;
+    if (!(seconds < kMaxSeconds))
+        seconds = kMaxSeconds;
+    const auto deadline = Clock::now() + std::chrono::duration_cast<Clock::duration>(std::chrono::duration<double>(seconds));
+    const size_t n = order.size();
+    if (n < 4 || k == 0)
+        return 0;
+
+    std::vector<int64_t> neighbours(n * k);
+    {
+        std::vector<double> distances(n * k);
+        const KDTree2D tree(std::make_shared<const PointCloud>(xy, n));
+        tree.all_knn(k, neighbours.data(), distances.data(), n_threads);
+    }
+    std::vector<size_t> pos(n);
+    for (size_t i = 0; i < n; ++i)
+        pos[order[i]] = i;
+    auto dist = [xy](int64_t a, int64_t b)
+    {
+        const double dx = xy[2 * a] - xy[2 * b], dy = xy[2 * a + 1] - xy[2 * b + 1];
+        return std::sqrt(dx * dx + dy * dy);
+    };
+
+    std::deque<int64_t> queue(order.begin(), order.end());
+    std::vector<char> queued(n, 1);
+    auto enqueue = [&](int64_t point)
+    {
+        if (point >= 0 && !queued[point])
+        {
+            queued[point] = 1;
+            queue.push_back(point);
+        }
+    };
+
+    // Try the moves at `a`, apply the first improving one and report whether there was one
+    auto improve = [&](int64_t a)
+    {
+        const size_t pa = pos[a];
+        for (const int step : {1, -1})
+        {
+            // The path edge (a, b) leaves a forwards (b follows a) or backwards (b precedes a)
+            if (step > 0 ? pa + 1 >= n : pa == 0)
+                continue;
+            const int64_t b = order[pa + step];
+            const double ab = dist(a, b);
+            for (size_t j = 0; j < k; ++j)
+            {
+                const int64_t c = neighbours[static_cast<size_t>(a) * k + j];
+                if (c < 0)
+                    break;
+                const double ac = dist(a, c);
+                // Neighbours are nearest first: no later one can make (a, c) shorter than (a, b)
+                if (ac >= ab)
+                    break;
+                const size_t pc = pos[c];
+                if (c == b || (step < 0 && pc == 0))
+                    continue;
+                // c's edge on the same side as a's; the far end of the path has none
+                const size_t pd = step > 0 ? pc + 1 : pc - 1;
+                const int64_t d = pd < n ? order[pd] : -1;
+                const double gain = ab + (d >= 0 ? dist(c, d) - dist(b, d) : 0.0) - ac;
+                if (!(gain > 1e-12 * ab))
+                    continue;
+                // Forwards: reverse (a, c] or (c, a]; backwards: reverse [a, c) or [c, a)
+                const size_t lo = step > 0 ? std::min(pa, pc) + 1 : std::min(pa, pc);
+                const size_t hi = step > 0 ? std::max(pa, pc) : std::max(pa, pc) - 1;
+                if (hi - lo > max_reversal)
+                    continue;
+                std::reverse(order.begin() + lo, order.begin() + hi + 1);
+                for (size_t i = lo; i <= hi; ++i)
+                    pos[order[i]] = i;
+                for (const int64_t point : {a, b, c, d})
+                    enqueue(point);
+                return true;
+            }
+        }
+        return false;
+    };
+
+    size_t moves = 0;
+    for (size_t iteration = 0; !queue.empty(); ++iteration)
+    {
+        if (iteration % 256 == 0 && Clock::now() >= deadline)
+            break;
+        const int64_t a = queue.front();
+        queue.pop_front();
+        queued[a] = 0;
+        if (improve(a))
+        {
+            ++moves;
+            enqueue(a);
+        }
+    }
+    return moves;
+}
@@ -0,0 +1,477 @@
+/**
+ * @file kd_tree_2d.hpp
+ * @brief nanoflann-backed 2D kd-tree shared by the `kd_tree_cpp` extension and the demo executable.
+ *
+ * ## Data Structures
+ * - **PointCloud**: nanoflann dataset adaptor over a flat, row-major `(x0, y0, x1, y1, ...)` buffer.
+ *   The buffer is either owned (copied from a `std::vector<Point>`) or borrowed from the caller
+ *   (e.g. a NumPy array), in which case the caller is responsible for keeping it alive.
+ * - **KDTree2D**: static nanoflann index over a shared `PointCloud`. The index is read-only after
+ *   construction, so batch queries are split across native threads without locking.
+ *   - The leaf size is fixed at build time; k-NN queries take an `eps` approximation factor
+ *     (0 = exact): a returned neighbour is at most `(1 + eps)` times farther than the true one.
+ *   - Optionally the points are copied in Morton or Hilbert curve order before the build, so each
+ *     leaf's points are close together in memory, and large k-NN batches are visited along the same
+ *     curve. Results are always reported as rows of the input.
+ *   - `all_knn()` finds the k nearest other points of every stored point in one leaf-batched pass.
+ *   - A built index can be written with `save()` and reattached to the same points with `load()`,
+ *     skipping the build. The index file does not contain the points themselves.
+ * - **PointCloudFloat32** / **KDTree2DFloat32**: the same over float32 coordinates, halving the
+ *   point storage. Queries are given in double and rounded to float32; distances are accumulated
+ *   and returned in double.
+ */
+
+#pragma once
+
+#include <nanoflann.hpp>
+#include "all_knn.hpp"
+#include "parallel.hpp"
+#include "search_profile.hpp"
+#include "space_filling_curve.hpp"
+#include <algorithm>
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+#include <fstream>
+#include <istream>
+#include <limits>
+#include <memory>
+#include <ostream>
+#include <stdexcept>
+#include <string>
+#include <utility>
+#include <vector>
+
+// BasicPointCloud class encapsulates the data and nanoflann adaptor interface for `T` coordinates
+template <typename T>
+class BasicPointCloud
+{
+public:
+    using Coord = T;
+
+    struct Point
+    {
+        T x, y;
+    };
+    static_assert(sizeof(Point) == 2 * sizeof(T), "Point must be two packed coordinates");
+
+    // Owning constructor: copies (or moves) the points into internal storage
+    BasicPointCloud(std::vector<Point> points)
+        : storage_(std::move(points)), data_(reinterpret_cast<const T *>(storage_.data())), n_(storage_.size()) {}
+
+    // Borrowing constructor: `data` holds `n` (x, y) pairs and must outlive the cloud
+    BasicPointCloud(const T *data, size_t n) : data_(data), n_(n) {}
+
+    // Copying would leave `data_` pointing into the source's storage
+    BasicPointCloud(const BasicPointCloud &) = delete;
+    BasicPointCloud &operator=(const BasicPointCloud &) = delete;
+
+    size_t size() const { return n_; }
+    const T *data() const { return data_; }
+
+    // nanoflann interface
+    inline size_t kdtree_get_point_count() const { return n_; }
+
+    inline T kdtree_get_pt(const size_t idx, const size_t dim) const
+    {
+        return data_[2 * idx + dim];
+    }
+
+    // Optional bounding-box computation: return false to default
+    template <class BBOX>
+    bool kdtree_get_bbox(BBOX &) const { return false; }
+
+private:
+    std::vector<Point> storage_;
+    const T *data_;
+    size_t n_;
+};
+
+using PointCloud = BasicPointCloud<double>;
+using PointCloudFloat32 = BasicPointCloud<float>;
+
+// Squared L2 distance between `T` coordinates, with differences and sums taken in double.
+// For double coordinates this is nanoflann's L2_Simple_Adaptor; for float it avoids rounding
+// the coordinate differences to float.
+template <class T, class DataSource>
+struct L2_Double_Adaptor
+{
+    using ElementType = T;
+    using DistanceType = double;
+
+    const DataSource &data_source;
+
+    L2_Double_Adaptor(const DataSource &source) : data_source(source) {}
+
+    template <class IndexType>
+    double evalMetric(const T *a, const IndexType b_idx, size_t size) const
+    {
+        double result = 0.0;
+        for (size_t i = 0; i < size; ++i)
+        {
+            const double diff = double(a[i]) - double(data_source.kdtree_get_pt(b_idx, i));
+            result += diff * diff;
+        }
+        return result;
+    }
+
+    template <typename U, typename V>
+    double accum_dist(const U a, const V b, const size_t) const
+    {
+        return (double(a) - double(b)) * (double(a) - double(b));
+    }
+};
+
+// KDTree wrapper class for nearest neighbor search over `T` coordinates
+template <typename T>
+class BasicKDTree2D
+{
+public:
+    using Coord = T;
+    using Cloud = BasicPointCloud<T>;
+    using KDTree_t = nanoflann::KDTreeSingleIndexAdaptor<
+        L2_Double_Adaptor<T, Cloud>,
+        Cloud,
+        2 /* dimension */
+        >;
+
+    static constexpr size_t kDefaultLeafSize = 10;
+    // Smaller k-NN batches are searched in caller order; sorting them would not pay off
+    static constexpr size_t kMinSortedBatch = 4096;
+
+    // The tree shares ownership of the cloud, so the points outlive the index.
+    // Leaves hold up to `leaf_size` points: larger leaves build faster and give a smaller tree,
+    // smaller leaves visit fewer points per query.
+    // With a `curve`, the tree instead owns a copy of the points in curve order (the input cloud
+    // is released) and keeps the permutation back to input rows.
+    explicit BasicKDTree2D(std::shared_ptr<const Cloud> cloud, size_t leaf_size = kDefaultLeafSize,
+                           Curve curve = Curve::None, unsigned n_threads = 0)
+        : curve_(curve), frame_(curve_frame(cloud->data(), cloud->size())),
+          order_(curve == Curve::None ? std::vector<uint32_t>()
+                                      : curve_order(curve, frame_, cloud->data(), cloud->size(), n_threads)),
+          cloud_(reordered(std::move(cloud), order_)), index_(2, *cloud_, index_params(leaf_size))
+    {
+        if (leaf_size == 0)
+            throw std::invalid_argument("leaf_size must be at least 1");
+        index_.buildIndex();
+    }
+
+    /**
+     * @brief Reattach an index written by `save()` to the points it was built over.
+     *
+     * Nothing is rebuilt: the tree nodes, point permutation and leaf size are read from `stream`,
+     * as are the curve and curve order of a reordered tree (whose `cloud` is then the saved,
+     * reordered points).
+     * Throws std::invalid_argument if the file was not written by `save()`, was built over a
+     * different number of points or holds a curve order that is not a permutation of them, and
+     * std::runtime_error if it is truncated.
+     */
+    BasicKDTree2D(std::shared_ptr<const Cloud> cloud, std::istream &stream)
+        : frame_(curve_frame(cloud->data(), cloud->size())), cloud_(std::move(cloud)),
+          index_(2, *cloud_, index_params(kDefaultLeafSize))
+    {
+        uint64_t magic = 0, n = 0;
+        stream.read(reinterpret_cast<char *>(&magic), sizeof(magic));
+        stream.read(reinterpret_cast<char *>(&n), sizeof(n));
+        if (!stream || (magic != kFileMagic && magic != kCurveFileMagic))
+            throw std::invalid_argument(std::string("not a KDTree2D index file over ") + kCoordName + " points");
+        if (n != cloud_->size())
+            throw std::invalid_argument("index was built over " + std::to_string(n) + " points, got " +
+                                        std::to_string(cloud_->size()));
+        if (magic == kCurveFileMagic)
+        {
+            uint32_t curve = 0;
+            stream.read(reinterpret_cast<char *>(&curve), sizeof(curve));
+            curve_ = static_cast<Curve>(curve);
+            order_.resize(n);
+            stream.read(reinterpret_cast<char *>(order_.data()), static_cast<std::streamsize>(n * sizeof(uint32_t)));
+            if (!stream)
+                throw std::runtime_error("truncated KDTree2D index file");
+            if (curve_ != Curve::Morton && curve_ != Curve::Hilbert)
+                throw std::invalid_argument("unknown curve " + std::to_string(curve) + " in KDTree2D index file");
+            // input_row() indexes through order_, so it must map stored points one-to-one onto input rows
+            std::vector<char> seen(n, 0);
+            for (const uint32_t row : order_)
+            {
+                if (row >= n || seen[row])
+                    throw std::invalid_argument("index curve order is not a permutation of the points");
+                seen[row] = 1;
+            }
+        }
+        // An empty index has no root node to read back
+        if (n > 0)
+            index_.loadIndex(stream);
+        if (!stream)
+            throw std::runtime_error("truncated KDTree2D index file");
+    }
+
+    static std::unique_ptr<BasicKDTree2D> load(std::shared_ptr<const Cloud> cloud, const std::string &path)
+    {
+        std::ifstream stream(path, std::ios::binary);
+        if (!stream)
+            throw std::runtime_error("cannot open " + path);
+        return std::make_unique<BasicKDTree2D>(std::move(cloud), stream);
+    }
+
+    // Write the built index (tree nodes and point permutation, plus the curve order of a reordered
+    // tree; not the points) to `stream`
+    void save(std::ostream &stream) const
+    {
+        const uint64_t n = cloud_->size();
+        const uint64_t magic = curve_ == Curve::None ? kFileMagic : kCurveFileMagic;
+        stream.write(reinterpret_cast<const char *>(&magic), sizeof(magic));
+        stream.write(reinterpret_cast<const char *>(&n), sizeof(n));
+        if (curve_ != Curve::None)
+        {
+            const auto curve = static_cast<uint32_t>(curve_);
+            stream.write(reinterpret_cast<const char *>(&curve), sizeof(curve));
+            stream.write(reinterpret_cast<const char *>(order_.data()), static_cast<std::streamsize>(n * sizeof(uint32_t)));
+        }
+        if (n > 0)
+            index_.saveIndex(stream);
+        if (!stream)
+            throw std::runtime_error("failed to write KDTree2D index");
+    }
+
+    void save(const std::string &path) const
+    {
+        std::ofstream stream(path, std::ios::binary);
+        if (!stream)
+            throw std::runtime_error("cannot open " + path);
+        save(stream);
+    }
+
+    // Query nearest neighbor for a given point (x,y); `eps` > 0 allows a (1 + eps)-approximate answer
+    std::pair<size_t, double> query(double x, double y, float eps = 0.0f) const
+    {
+        const T query_pt[2] = {T(x), T(y)};
+        size_t ret_index = size_t(-1);
+        double out_dist_sqr = 0.0;
+
+        nanoflann::KNNResultSet<double> resultSet(1);
+        resultSet.init(&ret_index, &out_dist_sqr);
+        index_.findNeighbors(resultSet, query_pt, nanoflann::SearchParameters(eps));
+        if (resultSet.size() > 0)
+            ret_index = input_row(ret_index);
+
+        return {ret_index, std::sqrt(out_dist_sqr)};
+    }
+
+    /**
+     * @brief Nearest neighbour for each of `m` queries stored as a flat (x, y) buffer.
+     *
+     * Writes the neighbour index (-1 if the tree is empty) and Euclidean distance for query `i`
+     * to `indices[i]` and `distances[i]`. Work is split across `n_threads` (0 = all cores).
+     */
+    void query_batch(const double *queries, size_t m, int64_t *indices, double *distances,
+                     unsigned n_threads = 0, float eps = 0.0f) const
+    {
+        query_knn(queries, m, 1, indices, distances, n_threads, eps);
+    }
+
+    /**
+     * @brief The `k` nearest neighbours of each of `m` queries, nearest first.
+     *
+     * Results for query `i` occupy `indices[i * k, (i + 1) * k)` (likewise `distances`), i.e. a
+     * row-major (m, k) block. Rows are padded with -1 / NaN when the tree holds fewer than `k` points.
+     * On a reordered tree, batches of at least kMinSortedBatch queries are searched in curve order.
+     * With `eps` > 0 subtrees that cannot hold a point `(1 + eps)` times closer than the current
+     * k-th neighbour are skipped, trading recall for speed.
+     */
+    void query_knn(const double *queries, size_t m, size_t k, int64_t *indices, double *distances,
+                   unsigned n_threads = 0, float eps = 0.0f) const
+    {
+        const nanoflann::SearchParameters params(eps);
+        knn_rows(queries, m, k, indices, distances, n_threads,
+                 [&](nanoflann::KNNResultSet<double> &resultSet, const T *q, size_t)
+                 { index_.findNeighbors(resultSet, q, params); });
+    }
+
+    /**
+     * @brief query_knn that also reports, per query, the tree nodes visited and the point distances
+     * computed in leaves.
+     *
+     * Uses the instrumented traversal in search_profile.hpp, so the results match query_knn while
+     * query_knn itself stays free of counters.
+     */
+    void query_knn_profiled(const double *queries, size_t m, size_t k, int64_t *indices, double *distances,
+                            int64_t *nodes_visited, int64_t *distance_computations,
+                            unsigned n_threads = 0, float eps = 0.0f) const
+    {
+        knn_rows(queries, m, k, indices, distances, n_threads,
+                 [&](nanoflann::KNNResultSet<double> &resultSet, const T *q, size_t i)
+                 {
+                     SearchCounters counters;
+                     profiled_find_neighbors(index_, resultSet, q, counters, eps);
+                     nodes_visited[i] = static_cast<int64_t>(counters.nodes_visited);
+                     distance_computations[i] = static_cast<int64_t>(counters.distance_computations);
+                 });
+    }
+
+    /**
+     * @brief All points within `radius` (inclusive) of each of `m` queries, in CSR layout.
+     *
+     * Neighbours of query `i` are `indices[offsets[i], offsets[i + 1])`, sorted by distance.
+     * `offsets` has `m + 1` entries. Each thread gathers its chunk locally before the results
+     * are concatenated, so no per-query allocation escapes the search.
+     */
+    void query_radius(const double *queries, size_t m, double radius, std::vector<int64_t> &offsets,
+                      std::vector<int64_t> &indices, std::vector<double> &distances,
+                      unsigned n_threads = 0) const
+    {
+        // nanoflann's radius test is strict; nudge the squared radius so the bound is inclusive
+        const double radius_sqr = std::nextafter(radius * radius, std::numeric_limits<double>::infinity());
+        std::vector<std::vector<nanoflann::ResultItem<size_t, double>>> chunk_hits(resolve_threads(m, n_threads));
+        offsets.assign(m + 1, 0);
+
+        parallel_chunks(m, n_threads, [&](unsigned chunk, size_t begin, size_t end)
+                        {
+            auto &hits = chunk_hits[chunk];
+            std::vector<nanoflann::ResultItem<size_t, double>> found;
+            for (size_t i = begin; i < end; ++i)
+            {
+                nanoflann::RadiusResultSet<double, size_t> resultSet(radius_sqr, found);
+                const T q[2] = {T(queries[2 * i]), T(queries[2 * i + 1])};
+                index_.findNeighbors(resultSet, q, nanoflann::SearchParameters());
+                std::sort(found.begin(), found.end(), nanoflann::IndexDist_Sorter());
+                offsets[i + 1] = static_cast<int64_t>(found.size());
+                hits.insert(hits.end(), found.begin(), found.end());
+            } });
+
+        for (size_t i = 0; i < m; ++i)
+            offsets[i + 1] += offsets[i];
+        indices.resize(static_cast<size_t>(offsets[m]));
+        distances.resize(static_cast<size_t>(offsets[m]));
+        size_t pos = 0;
+        for (const auto &hits : chunk_hits)
+            for (const auto &hit : hits)
+            {
+                indices[pos] = input_row(hit.first);
+                distances[pos] = std::sqrt(hit.second);
+                ++pos;
+            }
+    }
+
+    /**
+     * @brief The `k` nearest other points of every stored point (a self-join), nearest first.
+     *
+     * Results for input row `i` occupy `indices[i * k, (i + 1) * k)` (likewise `distances`), like
+     * query_knn with each point as a query, except that a point is never its own neighbour; a
+     * duplicate of it is, at distance 0. Rows are padded with -1 / NaN when the tree holds at most
+     * `k` points. Points are searched a leaf at a time (see all_knn.hpp), split across `n_threads`
+     * (0 = all cores). Neighbours at equal distances may be ordered differently than by query_knn.
+     */
+    void all_knn(size_t k, int64_t *indices, double *distances, unsigned n_threads = 0) const
+    {
+        all_knn_leaves(index_, k, n_threads,
+                       [&](size_t row, const size_t *found_idx, const double *dist_sqr, size_t found)
+                       {
+                           const size_t i = static_cast<size_t>(input_row(row));
+                           int64_t *row_idx = indices + i * k;
+                           double *row_dist = distances + i * k;
+                           for (size_t j = 0; j < k; ++j)
+                           {
+                               row_idx[j] = j < found ? input_row(found_idx[j]) : -1;
+                               row_dist[j] = j < found ? std::sqrt(dist_sqr[j]) : std::nan("");
+                           }
+                       });
+    }
+
+    size_t size() const { return cloud_->size(); }
+    size_t leaf_size() const { return index_.leaf_max_size_; }
+    Curve curve() const { return curve_; }
+
+    // Input row of each stored point, in storage order; empty unless the points were reordered
+    const std::vector<uint32_t> &order() const { return order_; }
+
+    // Bytes of the index itself: tree nodes (pool blocks, including their unused tails), the point
+    // permutation and any curve order
+    size_t index_memory_usage() const
+    {
+        return index_.pool_.usedMemory + index_.pool_.wastedMemory +
+               index_.vAcc_.capacity() * sizeof(typename decltype(index_.vAcc_)::value_type) +
+               order_.capacity() * sizeof(uint32_t);
+    }
+
+    // Bytes of point storage (owned or borrowed) plus the index
+    size_t memory_usage() const { return cloud_->size() * 2 * sizeof(T) + index_memory_usage(); }
+
+    const Cloud &cloud() const { return *cloud_; }
+    const std::shared_ptr<const Cloud> &shared_cloud() const { return cloud_; }
+
+private:
+    // Run `search(resultSet, q, i)` for each query `i` (`q` is its coordinates rounded to T) and
+    // write its k nearest rows, padded with -1 / NaN
+    template <class Search>
+    void knn_rows(const double *queries, size_t m, size_t k, int64_t *indices, double *distances,
+                  unsigned n_threads, Search &&search) const
+    {
+        // Consecutive queries along the curve descend to neighbouring leaves, so their nodes and
+        // points are still in cache; results are scattered back to the caller's rows
+        const std::vector<uint32_t> visit = curve_ != Curve::None && m >= kMinSortedBatch
+                                                ? curve_order(curve_, frame_, queries, m, n_threads)
+                                                : std::vector<uint32_t>();
+        parallel_for(m, n_threads, [&](size_t begin, size_t end)
+                     {
+            std::vector<size_t> ret_index(k);
+            std::vector<double> out_dist_sqr(k);
+            for (size_t pos = begin; pos < end; ++pos)
+            {
+                const size_t i = visit.empty() ? pos : visit[pos];
+                nanoflann::KNNResultSet<double> resultSet(k);
+                resultSet.init(ret_index.data(), out_dist_sqr.data());
+                const T q[2] = {T(queries[2 * i]), T(queries[2 * i + 1])};
+                search(resultSet, q, i);
+                const size_t found = resultSet.size();
+                int64_t *row_idx = indices + i * k;
+                double *row_dist = distances + i * k;
+                for (size_t j = 0; j < k; ++j)
+                {
+                    row_idx[j] = j < found ? input_row(ret_index[j]) : -1;
+                    row_dist[j] = j < found ? std::sqrt(out_dist_sqr[j]) : std::nan("");
+                }
+            } });
+    }
+
+    // "KDTREE2D" (double) or "KDTREE2F" (float) read as little-endian; "KDCURV2D" / "KDCURV2F" for
+    // reordered trees, whose curve and curve order follow the point count
+    static constexpr uint64_t kFileMagic = sizeof(T) == sizeof(double) ? 0x443245455254444bULL : 0x463245455254444bULL;
+    static constexpr uint64_t kCurveFileMagic =
+        sizeof(T) == sizeof(double) ? 0x443256525543444bULL : 0x463256525543444bULL;
+    static constexpr const char *kCoordName = sizeof(T) == sizeof(double) ? "float64" : "float32";
+
+    // The index is built (or loaded) explicitly; nanoflann would otherwise build it on construction
+    static nanoflann::KDTreeSingleIndexAdaptorParams index_params(size_t leaf_size)
+    {
+        return nanoflann::KDTreeSingleIndexAdaptorParams(
+            leaf_size, nanoflann::KDTreeSingleIndexAdaptorFlags::SkipInitialBuildIndex);
+    }
+
+    // Input row of the point stored at `row`
+    int64_t input_row(size_t row) const
+    {
+        return static_cast<int64_t>(order_.empty() ? row : order_[row]);
+    }
+
+    // `cloud` copied in `order`, or `cloud` itself when there is no order
+    static std::shared_ptr<const Cloud> reordered(std::shared_ptr<const Cloud> cloud, const std::vector<uint32_t> &order)
+    {
+        if (order.empty())
+            return cloud;
+        const T *xy = cloud->data();
+        std::vector<typename Cloud::Point> points(order.size());
+        for (size_t i = 0; i < order.size(); ++i)
+            points[i] = {xy[2 * size_t(order[i])], xy[2 * size_t(order[i]) + 1]};
+        return std::make_shared<const Cloud>(std::move(points));
+    }
+
+    // Declared before the cloud and index, which are built from them
+    Curve curve_ = Curve::None;
+    CurveFrame frame_;
+    std::vector<uint32_t> order_;
+    std::shared_ptr<const Cloud> cloud_;
+    KDTree_t index_;
+};
+
+using KDTree2D = BasicKDTree2D<double>;
+using KDTree2DFloat32 = BasicKDTree2D<float>;
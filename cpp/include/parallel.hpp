@@ -0,0 +1,99 @@
+/**
+ * @file parallel.hpp
+ * @brief Minimal fork-join helper for splitting index ranges across native threads.
+ */
+
+#pragma once
+
+#include <algorithm>
+#include <atomic>
+#include <cstddef>
+#include <thread>
+#include <vector>
+
+/**
+ * @brief Resolve a requested thread count (0 = hardware concurrency) for `n` work items.
+ *
+ * At least `min_chunk` items are assigned to each thread so small batches stay single-threaded.
+ */
+inline unsigned resolve_threads(size_t n, unsigned n_threads, size_t min_chunk = 1024)
+{
+    if (n_threads == 0)
+        n_threads = std::max(1u, std::thread::hardware_concurrency());
+    size_t useful = std::max<size_t>(1, (n + min_chunk - 1) / min_chunk);
+    return static_cast<unsigned>(std::min<size_t>(n_threads, useful));
+}
+
+/**
+ * @brief Call `fn(chunk, begin, end)` over contiguous chunks of `[0, n)`, one chunk per thread.
+ *
+ * `chunk` is in `[0, resolve_threads(n, n_threads, min_chunk))`, so callers can size per-thread
+ * scratch space up front. `fn` must not throw and must not touch Python objects; callers release
+ * the GIL around this.
+ */
+template <class Fn>
+void parallel_chunks(size_t n, unsigned n_threads, Fn &&fn, size_t min_chunk = 1024)
+{
+    unsigned threads = resolve_threads(n, n_threads, min_chunk);
+    if (threads <= 1)
+    {
+        fn(0u, size_t(0), n);
+        return;
+    }
+    std::vector<std::thread> workers;
+    workers.reserve(threads);
+    size_t chunk = (n + threads - 1) / threads;
+    for (unsigned t = 0; t < threads; ++t)
+    {
+        size_t begin = t * chunk;
+        size_t end = std::min(n, begin + chunk);
+        if (begin >= end)
+            break;
+        workers.emplace_back([&fn, t, begin, end]
+                             { fn(t, begin, end); });
+    }
+    for (auto &w : workers)
+        w.join();
+}
+
+/**
+ * @brief Call `fn(begin, end)` over contiguous chunks of `[0, n)`, one chunk per thread.
+ */
+template <class Fn>
+void parallel_for(size_t n, unsigned n_threads, Fn &&fn, size_t min_chunk = 1024)
+{
+    parallel_chunks(
+        n, n_threads, [&fn](unsigned, size_t begin, size_t end)
+        { fn(begin, end); },
+        min_chunk);
+}
+
+/**
+ * @brief Call `fn(i)` for every `i` in `[0, n)`, with threads claiming items one at a time.
+ *
+ * For work items of very different cost (e.g. groups of different sizes): an idle thread takes
+ * the next unclaimed item, so one expensive item does not hold up a whole pre-assigned chunk.
+ * Items are claimed in index order, so ordering them most expensive first balances best.
+ */
+template <class Fn>
+void parallel_for_each_dynamic(size_t n, unsigned n_threads, Fn &&fn)
+{
+    const unsigned threads = resolve_threads(n, n_threads, 1);
+    std::atomic<size_t> next{0};
+    auto worker = [&]
+    {
+        for (size_t i = next++; i < n; i = next++)
+            fn(i);
+    };
+    if (threads <= 1)
+    {
+        worker();
+        return;
+    }
+    std::vector<std::thread> workers;
+    workers.reserve(threads);
+    for (unsigned t = 0; t < threads; ++t)
+        workers.emplace_back(worker);
+    for (auto &w : workers)
+        w.join();
+}
@@ -0,0 +1,78 @@
+/**
+ * @file search_profile.hpp
+ * @brief Instrumented nanoflann search that counts the work done per query.
+ *
+ * `profiled_find_neighbors` walks the nodes of a built `KDTreeSingleIndexAdaptor` exactly as its
+ * `findNeighbors` does (same descent order and pruning, including the `eps` approximate pruning,
+ * so the results are identical) while
+ * counting nodes visited and leaf distance computations. It is a separate code path, so the normal
+ * queries carry no counters.
+ */
+
+#pragma once
+
+#include <cstdint>
+
+// Work done by one search
+struct SearchCounters
+{
+    uint64_t nodes_visited = 0;         // internal and leaf nodes entered
+    uint64_t distance_computations = 0; // point distances evaluated in leaves
+};
+
+// Mirror of nanoflann's KDTreeSingleIndexAdaptor::searchLevel; `eps_error` is 1 + eps
+template <class Index, class Coord, class NodePtr, class ResultSet>
+void profiled_search_level(const Index &index, ResultSet &result, const Coord *q, NodePtr node,
+                           double mindist, double (&dists)[2], float eps_error, SearchCounters &counters)
+{
+    ++counters.nodes_visited;
+    if (node->child1 == nullptr && node->child2 == nullptr)
+    {
+        const double worst = result.worstDist();
+        for (auto i = node->node_type.lr.left; i < node->node_type.lr.right; ++i)
+        {
+            ++counters.distance_computations;
+            const auto point = index.vAcc_[i];
+            const double dist = index.distance_.evalMetric(q, point, 2);
+            if (dist < worst)
+                result.addPoint(dist, point);
+        }
+        return;
+    }
+
+    const auto dim = node->node_type.sub.divfeat;
+    const double val = q[dim];
+    const bool low_first = (val - node->node_type.sub.divlow) + (val - node->node_type.sub.divhigh) < 0;
+    const double cut_dist = index.distance_.accum_dist(
+        val, low_first ? node->node_type.sub.divhigh : node->node_type.sub.divlow, dim);
+    profiled_search_level(index, result, q, low_first ? node->child1 : node->child2, mindist, dists, eps_error,
+                          counters);
+
+    const double saved = dists[dim];
+    mindist = mindist + cut_dist - saved;
+    dists[dim] = cut_dist;
+    if (mindist * eps_error <= result.worstDist())
+        profiled_search_level(index, result, q, low_first ? node->child2 : node->child1, mindist, dists, eps_error,
+                              counters);
+    dists[dim] = saved;
+}
+
+// Search of a built 2D index for `q` (eps-approximate when eps > 0), adding the work done to `counters`
+template <class Index, class Coord, class ResultSet>
+void profiled_find_neighbors(const Index &index, ResultSet &result, const Coord *q, SearchCounters &counters,
+                             float eps = 0.0f)
+{
+    if (index.size_ == 0 || index.root_node_ == nullptr)
+        return;
+    double dists[2] = {0.0, 0.0};
+    double mindist = 0.0;
+    for (int d = 0; d < 2; ++d)
+    {
+        if (q[d] < index.root_bbox_[d].low)
+            dists[d] = index.distance_.accum_dist(q[d], index.root_bbox_[d].low, d);
+        if (q[d] > index.root_bbox_[d].high)
+            dists[d] = index.distance_.accum_dist(q[d], index.root_bbox_[d].high, d);
+        mindist += dists[d];
+    }
+    profiled_search_level(index, result, q, index.root_node_, mindist, dists, 1 + eps, counters);
+}
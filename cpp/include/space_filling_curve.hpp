@@ -0,0 +1,165 @@
+/**
+ * @file space_filling_curve.hpp
+ * @brief Morton (Z-order) and Hilbert orderings of 2D points, for memory locality.
+ *
+ * Coordinates are quantised to a 2^16 x 2^16 grid over a bounding box (`CurveFrame`) and mapped
+ * to a 32-bit position along the curve. Sorting points by that key keeps points that are close in
+ * space close in memory; Hilbert keys keep every step between neighbouring cells, Morton keys are
+ * cheaper but jump between quadrants.
+ */
+
+#pragma once
+
+#include "parallel.hpp"
+#include <algorithm>
+#include <cstddef>
+#include <cstdint>
+#include <limits>
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+enum class Curve : uint32_t
+{
+    None = 0,
+    Morton = 1,
+    Hilbert = 2,
+};
+
+inline Curve parse_curve(const std::string &name)
+{
+    if (name == "none")
+        return Curve::None;
+    if (name == "morton")
+        return Curve::Morton;
+    if (name == "hilbert")
+        return Curve::Hilbert;
+    throw std::invalid_argument("curve must be 'none', 'morton' or 'hilbert', got '" + name + "'");
+}
+
+inline const char *curve_name(Curve curve)
+{
+    switch (curve)
+    {
+    case Curve::Morton:
+        return "morton";
+    case Curve::Hilbert:
+        return "hilbert";
+    default:
+        return "none";
+    }
+}
+
+// Maps coordinates in a bounding box onto the 2^16 x 2^16 curve grid; values outside are clamped
+// and NaN (from a NaN or infinite coordinate) goes to cell 0
+struct CurveFrame
+{
+    double x0 = 0.0, y0 = 0.0, sx = 0.0, sy = 0.0;
+
+    uint32_t cell(double v, double origin, double scale) const
+    {
+        const double c = (v - origin) * scale;
+        return !(c > 0.0) ? 0u : c >= 65535.0 ? 65535u : static_cast<uint32_t>(c);
+    }
+};
+
+// Frame spanning the bounding box of `n` (x, y) pairs
+template <typename T>
+CurveFrame curve_frame(const T *xy, size_t n)
+{
+    CurveFrame frame;
+    if (n == 0)
+        return frame;
+    double lo[2] = {std::numeric_limits<double>::infinity(), std::numeric_limits<double>::infinity()};
+    double hi[2] = {-lo[0], -lo[1]};
+    for (size_t i = 0; i < n; ++i)
+        for (int d = 0; d < 2; ++d)
+        {
+            lo[d] = std::min(lo[d], double(xy[2 * i + d]));
+            hi[d] = std::max(hi[d], double(xy[2 * i + d]));
+        }
+    frame.x0 = lo[0];
+    frame.y0 = lo[1];
+    frame.sx = hi[0] > lo[0] ? 65535.0 / (hi[0] - lo[0]) : 0.0;
+    frame.sy = hi[1] > lo[1] ? 65535.0 / (hi[1] - lo[1]) : 0.0;
+    return frame;
+}
+
+// Interleave the bits of two 16-bit cell coordinates (x in the even bits)
+inline uint32_t morton_key(uint32_t x, uint32_t y)
+{
+    auto spread = [](uint32_t v)
+    {
+        v = (v | (v << 8)) & 0x00ff00ffu;
+        v = (v | (v << 4)) & 0x0f0f0f0fu;
+        v = (v | (v << 2)) & 0x33333333u;
+        v = (v | (v << 1)) & 0x55555555u;
+        return v;
+    };
+    return spread(x) | (spread(y) << 1);
+}
+
+// Position of cell (x, y) along the order-16 Hilbert curve
+inline uint32_t hilbert_key(uint32_t x, uint32_t y)
+{
+    uint32_t d = 0;
+    for (uint32_t s = 1u << 15; s > 0; s >>= 1)
+    {
+        const uint32_t rx = (x & s) ? 1u : 0u;
+        const uint32_t ry = (y & s) ? 1u : 0u;
+        d += s * s * ((3u * rx) ^ ry);
+        // Rotate the quadrant so the sub-curve is entered from the right corner
+        if (ry == 0)
+        {
+            if (rx == 1)
+            {
+                x = 65535u - x;
+                y = 65535u - y;
+            }
+            std::swap(x, y);
+        }
+    }
+    return d;
+}
+
+inline uint32_t curve_key(Curve curve, const CurveFrame &frame, double x, double y)
+{
+    const uint32_t cx = frame.cell(x, frame.x0, frame.sx);
+    const uint32_t cy = frame.cell(y, frame.y0, frame.sy);
+    return curve == Curve::Hilbert ? hilbert_key(cx, cy) : morton_key(cx, cy);
+}
+
+/**
+ * @brief Rows of `n` (x, y) pairs sorted along `curve`; ties keep their input order.
+ *
+ * Keys are computed on `n_threads` threads (0 = all cores) and sorted with a 4-pass radix sort.
+ * `n` must be below 2^32.
+ */
+template <typename T>
+std::vector<uint32_t> curve_order(Curve curve, const CurveFrame &frame, const T *xy, size_t n,
+                                  unsigned n_threads = 0)
+{
+    if (n > std::numeric_limits<uint32_t>::max())
+        throw std::invalid_argument("curve ordering supports at most 2^32 - 1 points");
+    // (key << 32 | row), so sorting by the high half carries the row along
+    std::vector<uint64_t> items(n), buffer(n);
+    parallel_for(n, n_threads, [&](size_t begin, size_t end)
+                 {
+        for (size_t i = begin; i < end; ++i)
+            items[i] = uint64_t(curve_key(curve, frame, double(xy[2 * i]), double(xy[2 * i + 1]))) << 32 | i; });
+    for (int shift = 32; shift < 64; shift += 8)
+    {
+        size_t counts[257] = {};
+        for (const uint64_t v : items)
+            ++counts[((v >> shift) & 0xff) + 1];
+        for (int b = 0; b < 256; ++b)
+            counts[b + 1] += counts[b];
+        for (const uint64_t v : items)
+            buffer[counts[(v >> shift) & 0xff]++] = v;
+        items.swap(buffer);
+    }
+    std::vector<uint32_t> order(n);
+    for (size_t i = 0; i < n; ++i)
+        order[i] = static_cast<uint32_t>(items[i]);
+    return order;
+}
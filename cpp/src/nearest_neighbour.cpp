@@ -1,70 +1,10 @@
 #include <iostream>
 #include <vector>
-#include <nanoflann.hpp>
+#include "kd_tree_2d.hpp"
 #include <cmath>
 #include <random>
 #include <iomanip> // For std::setw
 
-// PointCloud class encapsulates the data and nanoflann adaptor interface
-class PointCloud
-{
-public:
-    struct Point
-    {
-        double x, y;
-    };
-    std::vector<Point> pts;
-
-    PointCloud(const std::vector<Point> &points) : pts(points) {}
-
-    // nanoflann interface
-    inline size_t kdtree_get_point_count() const { return pts.size(); }
-
-    inline double kdtree_get_pt(const size_t idx, const size_t dim) const
-    {
-        return (dim == 0) ? pts[idx].x : pts[idx].y;
-    }
-
-    // Optional bounding-box computation: return false to default
-    template <class BBOX>
-    bool kdtree_get_bbox(BBOX &) const { return false; }
-};
-
-// KDTree wrapper class for nearest neighbor search
-class KDTree2D
-{
-public:
-    using KDTree_t = nanoflann::KDTreeSingleIndexAdaptor<
-        nanoflann::L2_Simple_Adaptor<double, PointCloud>,
-        PointCloud,
-        2 /* dimension */
-        >;
-
-    KDTree2D(const PointCloud &cloud)
-        : cloud_(cloud), index_(2, cloud_, nanoflann::KDTreeSingleIndexAdaptorParams(10))
-    {
-        index_.buildIndex();
-    }
-
-    // Query nearest neighbor for a given point (x,y)
-    std::pair<size_t, double> query(double x, double y) const
-    {
-        double query_pt[2] = {x, y};
-        size_t ret_index = size_t(-1);
-        double out_dist_sqr = 0.0;
-
-        nanoflann::KNNResultSet<double> resultSet(1);
-        resultSet.init(&ret_index, &out_dist_sqr);
-        index_.findNeighbors(resultSet, query_pt, nanoflann::SearchParameters(10));
-
-        return {ret_index, std::sqrt(out_dist_sqr)};
-    }
-
-private:
-    const PointCloud &cloud_;
-    KDTree_t index_;
-};
-
 int main()
 {
     constexpr int num_points = 100;
@@ -80,8 +20,7 @@ int main()
         points.push_back({dist(rng), dist(rng)});
     }
 
-    PointCloud cloud(points);
-    KDTree2D tree(cloud);
+    KDTree2D tree(std::make_shared<PointCloud>(points));
 
     // Generate 50 random query points in [0, 100) x [0, 100)
     std::vector<PointCloud::Point> queries;
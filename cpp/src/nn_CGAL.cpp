@@ -1,46 +1,256 @@
 #include "KDTree2D_CGAL.hpp"
+#include "parallel.hpp"
 
 #include <CGAL/Simple_cartesian.h>
 #include <CGAL/Search_traits_2.h>
+#include <CGAL/Search_traits_adapter.h>
+#include <CGAL/property_map.h>
 #include <CGAL/Kd_tree.h>
+#include <CGAL/Fuzzy_sphere.h>
 #include <CGAL/Orthogonal_k_neighbor_search.h>
+#include <boost/tuple/tuple.hpp>
 #include <vector>
 #include <algorithm>
 #include <cmath>
+#include <iterator>
+#include <limits>
 #include <memory>
 
 typedef CGAL::Simple_cartesian<double> Kernel;
 typedef Kernel::Point_2 Point_2;
-typedef CGAL::Search_traits_2<Kernel> Traits;
-typedef CGAL::Kd_tree<Traits> Tree;
+// Each tree entry stores the point together with its index in the input
+typedef boost::tuple<Point_2, std::size_t> Point_and_index;
+typedef CGAL::Search_traits_2<Kernel> Traits_base;
+typedef CGAL::Search_traits_adapter<Point_and_index, CGAL::Nth_of_tuple_property_map<0, Point_and_index>, Traits_base> Traits;
 typedef CGAL::Orthogonal_k_neighbor_search<Traits> K_neighbor_search;
+typedef K_neighbor_search::Tree Tree;
+typedef CGAL::Fuzzy_sphere<Traits> Fuzzy_circle;
 
 struct CGALKDTree2D::Impl
 {
-    std::vector<Point_2> pts_;
     std::unique_ptr<Tree> tree_;
+    size_t size_ = 0;
 
-    Impl(const std::vector<std::pair<double, double>> &points)
+    Impl(const double *xy, size_t n) : size_(n)
     {
-        for (const auto &p : points)
-            pts_.emplace_back(p.first, p.second);
-        tree_ = std::make_unique<Tree>(pts_.begin(), pts_.end());
+        std::vector<Point_and_index> entries;
+        entries.reserve(n);
+        for (size_t i = 0; i < n; ++i)
+            entries.emplace_back(Point_2(xy[2 * i], xy[2 * i + 1]), i);
+        tree_ = std::make_unique<Tree>(entries.begin(), entries.end());
+        // CGAL builds lazily on the first search; build now so concurrent queries are read-only
+        tree_->build();
+    }
+
+    size_t memory_usage() const
+    {
+        if (size_ == 0)
+            return 0;
+        size_t leaves = 0, internals = 0;
+        count_nodes(tree_->root(), leaves, internals);
+        return size_ * (sizeof(Point_and_index) + sizeof(const Point_and_index *)) +
+               leaves * sizeof(Tree::Leaf_node) + internals * sizeof(Tree::Internal_node);
+    }
+
+    static void count_nodes(Tree::Node_const_handle node, size_t &leaves, size_t &internals)
+    {
+        if (node->is_leaf())
+        {
+            ++leaves;
+            return;
+        }
+        ++internals;
+        auto internal = static_cast<Tree::Internal_node_const_handle>(node);
+        count_nodes(internal->lower(), leaves, internals);
+        count_nodes(internal->upper(), leaves, internals);
     }
 
     std::pair<size_t, double> query(double x, double y) const
     {
-        Point_2 query_pt(x, y);
-        K_neighbor_search search(*tree_, query_pt, 1);
+        if (size_ == 0)
+            return {size_t(-1), std::nan("")};
+        K_neighbor_search search(*tree_, Point_2(x, y), 1);
         auto it = search.begin();
-        const Point_2 &nn = it->first;
-        auto idx = std::distance(pts_.begin(), std::find(pts_.begin(), pts_.end(), nn));
-        double dist_val = std::sqrt(it->second);
-        return {idx, dist_val};
+        return {boost::get<1>(it->first), std::sqrt(it->second)};
+    }
+
+    void query_knn(const double *queries, size_t m, size_t k, int64_t *indices, double *distances,
+                   unsigned n_threads) const
+    {
+        parallel_for(m, n_threads, [&](size_t begin, size_t end)
+                     {
+            for (size_t i = begin; i < end; ++i)
+            {
+                int64_t *row_idx = indices + i * k;
+                double *row_dist = distances + i * k;
+                size_t j = 0;
+                if (size_ > 0)
+                {
+                    K_neighbor_search search(*tree_, Point_2(queries[2 * i], queries[2 * i + 1]), static_cast<unsigned>(k));
+                    for (auto it = search.begin(); it != search.end() && j < k; ++it, ++j)
+                    {
+                        row_idx[j] = static_cast<int64_t>(boost::get<1>(it->first));
+                        row_dist[j] = std::sqrt(it->second);
+                    }
+                }
+                for (; j < k; ++j)
+                {
+                    row_idx[j] = -1;
+                    row_dist[j] = std::nan("");
+                }
+            } });
+    }
+
+    // CGAL's Orthogonal_k_neighbor_search only reports its work as free text, so the profiled path
+    // walks the tree itself (as search_profile.hpp does for nanoflann) and counts exactly. It returns
+    // the same neighbours as query_knn, though equidistant ones may come in another order.
+    void query_knn_profiled(const double *queries, size_t m, size_t k, int64_t *indices, double *distances,
+                            int64_t *nodes_visited, int64_t *distance_computations, unsigned n_threads) const
+    {
+        parallel_for(m, n_threads, [&](size_t begin, size_t end)
+                     {
+            ProfiledSearch search(k);
+            for (size_t i = begin; i < end; ++i)
+            {
+                search.run(*tree_, size_, queries[2 * i], queries[2 * i + 1]);
+                for (size_t j = 0; j < k; ++j)
+                {
+                    const bool found = j < search.found;
+                    indices[i * k + j] = found ? static_cast<int64_t>(search.indices[j]) : -1;
+                    distances[i * k + j] = found ? std::sqrt(search.dist_sqr[j]) : std::nan("");
+                }
+                nodes_visited[i] = search.nodes_visited;
+                distance_computations[i] = search.distance_computations;
+            } });
+    }
+
+    // Exact k-nearest search over the tree's own nodes, counting its work; reused across queries
+    struct ProfiledSearch
+    {
+        size_t k, found = 0;
+        std::vector<size_t> indices;
+        std::vector<double> dist_sqr; // nearest first
+        int64_t nodes_visited = 0;         // internal and leaf nodes entered
+        int64_t distance_computations = 0; // point distances evaluated in leaves
+
+        explicit ProfiledSearch(size_t k) : k(k), indices(k), dist_sqr(k) {}
+
+        void run(const Tree &tree, size_t size, double x, double y)
+        {
+            found = 0;
+            nodes_visited = distance_computations = 0;
+            if (size == 0 || k == 0)
+                return;
+            const double q[2] = {x, y};
+            double offsets[2] = {0.0, 0.0};
+            visit(tree.root(), q, 0.0, offsets);
+        }
+
+        double worst() const { return found < k ? std::numeric_limits<double>::infinity() : dist_sqr[k - 1]; }
+
+        // `mindist` is the squared distance from q to the node's cell, the sum of `offsets`
+        void visit(Tree::Node_const_handle node, const double (&q)[2], double mindist, double (&offsets)[2])
+        {
+            ++nodes_visited;
+            if (node->is_leaf())
+            {
+                auto leaf = static_cast<Tree::Leaf_node_const_handle>(node);
+                for (auto it = leaf->begin(); it != leaf->end(); ++it)
+                {
+                    ++distance_computations;
+                    const Point_2 &p = boost::get<0>(*it);
+                    const double dx = p.x() - q[0], dy = p.y() - q[1];
+                    const double dist = dx * dx + dy * dy;
+                    if (dist < worst())
+                        insert(dist, boost::get<1>(*it));
+                }
+                return;
+            }
+            auto internal = static_cast<Tree::Internal_node_const_handle>(node);
+            const int dim = internal->cutting_dimension();
+            const double gap = q[dim] - internal->cutting_value();
+            const bool lower_first = gap < 0;
+            visit(lower_first ? internal->lower() : internal->upper(), q, mindist, offsets);
+
+            // The far child's cell lies across the cutting line
+            const double saved = offsets[dim];
+            mindist += gap * gap - saved;
+            offsets[dim] = gap * gap;
+            if (mindist < worst())
+                visit(lower_first ? internal->upper() : internal->lower(), q, mindist, offsets);
+            offsets[dim] = saved;
+        }
+
+        // Insert into the sorted neighbours, dropping the farthest once there are k
+        void insert(double dist, size_t index)
+        {
+            size_t j = found < k ? found++ : k - 1;
+            for (; j > 0 && dist_sqr[j - 1] > dist; --j)
+            {
+                dist_sqr[j] = dist_sqr[j - 1];
+                indices[j] = indices[j - 1];
+            }
+            dist_sqr[j] = dist;
+            indices[j] = index;
+        }
+    };
+
+    void query_radius(const double *queries, size_t m, double radius, std::vector<int64_t> &offsets,
+                      std::vector<int64_t> &indices, std::vector<double> &distances, unsigned n_threads) const
+    {
+        std::vector<std::vector<std::pair<double, int64_t>>> chunk_hits(resolve_threads(m, n_threads));
+        offsets.assign(m + 1, 0);
+
+        parallel_chunks(m, n_threads, [&](unsigned chunk, size_t begin, size_t end)
+                        {
+            auto &hits = chunk_hits[chunk];
+            std::vector<Point_and_index> found;
+            for (size_t i = begin; i < end; ++i)
+            {
+                const Point_2 centre(queries[2 * i], queries[2 * i + 1]);
+                found.clear();
+                tree_->search(std::back_inserter(found), Fuzzy_circle(Point_and_index(centre, 0), radius, 0.0));
+                const size_t first = hits.size();
+                for (const auto &entry : found)
+                    hits.emplace_back(std::sqrt(CGAL::squared_distance(centre, boost::get<0>(entry))),
+                                      static_cast<int64_t>(boost::get<1>(entry)));
+                std::sort(hits.begin() + first, hits.end());
+                offsets[i + 1] = static_cast<int64_t>(found.size());
+            } });
+
+        for (size_t i = 0; i < m; ++i)
+            offsets[i + 1] += offsets[i];
+        indices.clear();
+        distances.clear();
+        indices.reserve(static_cast<size_t>(offsets[m]));
+        distances.reserve(static_cast<size_t>(offsets[m]));
+        for (const auto &hits : chunk_hits)
+            for (const auto &hit : hits)
+            {
+                distances.push_back(hit.first);
+                indices.push_back(hit.second);
+            }
     }
 };
 
+// Flatten (x, y) pairs into the interleaved layout the Impl constructor reads
+static std::vector<double> flatten(const std::vector<std::pair<double, double>> &points)
+{
+    std::vector<double> xy;
+    xy.reserve(2 * points.size());
+    for (const auto &p : points)
+    {
+        xy.push_back(p.first);
+        xy.push_back(p.second);
+    }
+    return xy;
+}
+
 CGALKDTree2D::CGALKDTree2D(const std::vector<std::pair<double, double>> &points)
-    : pimpl_(new Impl(points)) {}
+    : pimpl_(new Impl(flatten(points).data(), points.size())) {}
+
+CGALKDTree2D::CGALKDTree2D(const double *xy, size_t n)
+    : pimpl_(new Impl(xy, n)) {}
 
 CGALKDTree2D::~CGALKDTree2D() { delete pimpl_; }
 
@@ -48,3 +258,27 @@ std::pair<size_t, double> CGALKDTree2D::query(double x, double y) const
 {
     return pimpl_->query(x, y);
 }
+
+size_t CGALKDTree2D::size() const { return pimpl_->size_; }
+
+size_t CGALKDTree2D::memory_usage() const { return pimpl_->memory_usage(); }
+
+void CGALKDTree2D::query_knn(const double *queries, size_t m, size_t k, int64_t *indices, double *distances,
+                             unsigned n_threads) const
+{
+    pimpl_->query_knn(queries, m, k, indices, distances, n_threads);
+}
+
+void CGALKDTree2D::query_knn_profiled(const double *queries, size_t m, size_t k, int64_t *indices,
+                                      double *distances, int64_t *nodes_visited,
+                                      int64_t *distance_computations, unsigned n_threads) const
+{
+    pimpl_->query_knn_profiled(queries, m, k, indices, distances, nodes_visited, distance_computations, n_threads);
+}
+
+void CGALKDTree2D::query_radius(const double *queries, size_t m, double radius, std::vector<int64_t> &offsets,
+                                std::vector<int64_t> &indices, std::vector<double> &distances,
+                                unsigned n_threads) const
+{
+    pimpl_->query_radius(queries, m, radius, offsets, indices, distances, n_threads);
+}
@@ -0,0 +1,72 @@
+#define CATCH_CONFIG_MAIN
+#include <catch2/catch_test_macros.hpp> // (v3.x style)
+#include <catch2/catch_approx.hpp>
+
+#include "KDTree2D_CGAL.hpp"
+#include <cmath>
+#include <random>
+#include <vector>
+
+// Uniform random (x, y) pairs in [0, 100)^2
+static std::vector<double> random_points(size_t n, unsigned seed)
+{
+    std::mt19937 rng(seed);
+    std::uniform_real_distribution<double> coord(0.0, 100.0);
+    std::vector<double> xy(2 * n);
+    for (auto &v : xy)
+        v = coord(rng);
+    return xy;
+}
+
+TEST_CASE("Nearest neighbour keeps the original index", "[cgal_kdtree]")
+{
+    const double points[] = {0, 0, 2, 2, 10, 10};
+    CGALKDTree2D tree(points, 3);
+    REQUIRE(tree.size() == 3);
+    auto [idx, dist] = tree.query(10, 10);
+    REQUIRE(idx == 2);
+    REQUIRE(dist == Catch::Approx(0.0).margin(1e-12));
+    REQUIRE(tree.query(1.5, 1.5).first == 1);
+}
+
+TEST_CASE("Profiled k-NN matches query_knn and counts its work", "[cgal_kdtree]")
+{
+    const size_t n = 2000, m = 200, k = 5;
+    const auto points = random_points(n, 1);
+    const auto queries = random_points(m, 2);
+    CGALKDTree2D tree(points.data(), n);
+
+    std::vector<int64_t> indices(m * k), profiled_indices(m * k), nodes(m), computed(m);
+    std::vector<double> distances(m * k), profiled_distances(m * k);
+    tree.query_knn(queries.data(), m, k, indices.data(), distances.data(), 2);
+    tree.query_knn_profiled(queries.data(), m, k, profiled_indices.data(), profiled_distances.data(),
+                            nodes.data(), computed.data(), 2);
+
+    for (size_t i = 0; i < m * k; ++i)
+    {
+        REQUIRE(profiled_distances[i] == Catch::Approx(distances[i]));
+        REQUIRE(profiled_indices[i] == indices[i]);
+    }
+    for (size_t i = 0; i < m; ++i)
+    {
+        // At least a root-to-leaf path, and at least the k points returned, but far from a full scan
+        REQUIRE(nodes[i] >= 2);
+        REQUIRE(computed[i] >= static_cast<int64_t>(k));
+        REQUIRE(computed[i] < static_cast<int64_t>(n / 2));
+    }
+}
+
+TEST_CASE("Profiled k-NN pads rows beyond the point count", "[cgal_kdtree]")
+{
+    const double points[] = {0, 0, 1, 1};
+    const double query[] = {0, 0};
+    CGALKDTree2D tree(points, 2);
+    int64_t indices[3], nodes, computed;
+    double distances[3];
+    tree.query_knn_profiled(query, 1, 3, indices, distances, &nodes, &computed);
+    REQUIRE(indices[0] == 0);
+    REQUIRE(indices[1] == 1);
+    REQUIRE(indices[2] == -1);
+    REQUIRE(std::isnan(distances[2]));
+    REQUIRE(computed == 2);
+}
@@ -6,14 +6,35 @@
 
 TEST_CASE("Convex hull of triangle", "[convex_hull]")
 {
-    std::vector<std::vector<double>> points = {{0, 0}, {1, 0}, {0, 1}};
-    auto hull = compute_convex_hull(points);
+    const double points[] = {0, 0, 1, 0, 0, 1};
+    auto hull = convex_hull_indices(points, 3);
     REQUIRE(hull.size() == 4); // 3 points + repeat of first
+    REQUIRE(hull.front() == hull.back());
 }
 
 TEST_CASE("Convex hull of square with inner point", "[convex_hull]")
 {
-    std::vector<std::vector<double>> points = {{0, 0}, {1, 0}, {1, 1}, {0, 1}, {0.5, 0.5}};
-    auto hull = compute_convex_hull(points);
+    const double points[] = {0, 0, 1, 0, 1, 1, 0, 1, 0.5, 0.5};
+    auto hull = convex_hull_indices(points, 5);
     REQUIRE(hull.size() == 5); // 4 corners + repeat of first
+    REQUIRE(std::find(hull.begin(), hull.end(), 4) == hull.end()); // inner point excluded
+}
+
+TEST_CASE("Open convex hull omits the closing point", "[convex_hull]")
+{
+    const double points[] = {0, 0, 1, 0, 1, 1, 0, 1, 0.5, 0.5};
+    REQUIRE(convex_hull_indices(points, 5, false).size() == 4);
+    REQUIRE(convex_hull_indices(points, 0).empty());
+}
+
+TEST_CASE("Grouped convex hulls in CSR layout", "[convex_hull]")
+{
+    // Triangle labelled 2 and square with inner point labelled -1, interleaved
+    const double points[] = {0, 0, 5, 5, 1, 0, 6, 5, 0, 1, 6, 6, 5, 6, 5.5, 5.5};
+    const int64_t labels[] = {2, -1, 2, -1, 2, -1, -1, -1};
+    std::vector<int64_t> groups, offsets, indices;
+    grouped_convex_hull_indices(points, labels, 8, false, 2, groups, offsets, indices);
+    REQUIRE(groups == std::vector<int64_t>{-1, 2});
+    REQUIRE(offsets == std::vector<int64_t>{0, 4, 7});
+    REQUIRE(std::find(indices.begin(), indices.end(), 7) == indices.end()); // inner point excluded
 }
@@ -1,6 +1,5 @@
 import sys
 
-import numpy as np
 import plotly.graph_objects as go
 import streamlit as st
 from pathlib import Path
@@ -8,6 +7,8 @@ from pathlib import Path
 sys.path.insert(0, "build/")
 import convex_hull_ext
 
+from python.src.point_generators import PointGenerator
+
 
 def display_markdown_file(
     filepath: str,
@@ -26,48 +27,46 @@ def display_markdown_file(
 
 
 # --- Distribution options ---
+DISTRIBUTIONS = {
+    "Uniform": ("uniform", {}),
+    "Normal": ("gaussian", {}),
+    "Clustered": (
+        "clustered",
+        dict(centers=[[0.2, 0.2], [0.8, 0.8], [0.5, 0.5]], spread=0.07),
+    ),
+    "Disk": ("disk", dict(center=(0.5, 0.5), radius=0.5)),
+    "Power law": ("power_law", {}),
+    "Line": ("line", dict(width=0.05)),
+}
+
+
 def generate_points(num_points, distribution, seed=None):
-    if seed is not None:
-        np.random.seed(seed)
-    if distribution == "Uniform":
-        return np.random.rand(num_points, 2).tolist()
-    elif distribution == "Normal":
-        return np.random.randn(num_points, 2).tolist()
-    elif distribution == "Clustered":
-        # Example: 3 clusters
-        centers = np.array([[0.2, 0.2], [0.8, 0.8], [0.5, 0.5]])
-        points = []
-        for _ in range(num_points):
-            center = centers[np.random.choice(len(centers))]
-            points.append((center + 0.07 * np.random.randn(2)).tolist())
-        return points
-    else:
-        # Default to uniform
-        return np.random.rand(num_points, 2).tolist()
+    name, params = DISTRIBUTIONS.get(distribution, DISTRIBUTIONS["Uniform"])
+    return PointGenerator(seed).generate(name, num_points, **params)
 
 
 def plot_convex_hull(points, hull):
-    points_np = np.array(points)
+    """
+    Plot the (N, 2) points and the closed (H, 2) hull returned by compute_convex_hull.
+    """
     fig = go.Figure()
 
     # Plot all points
     fig.add_trace(
         go.Scatter(
-            x=points_np[:, 0],
-            y=points_np[:, 1],
+            x=points[:, 0],
+            y=points[:, 1],
             mode="markers",
             name="Points",
             marker=dict(size=4, opacity=0.7),
         )
     )
 
-    # Plot convex hull (closed polygon)
-    hull_x = np.append(hull[:, 0], hull[0, 0])
-    hull_y = np.append(hull[:, 1], hull[0, 1])
+    # Plot convex hull (closed polygon: the first vertex is repeated at the end)
     fig.add_trace(
         go.Scatter(
-            x=hull_x,
-            y=hull_y,
+            x=hull[:, 0],
+            y=hull[:, 1],
             mode="lines+markers",
             name="Convex Hull",
             line=dict(color="red", width=2),
@@ -91,7 +90,7 @@ st.subheader("Hull calculated via C++ code")
 
 # Sidebar controls
 num_points = st.sidebar.slider("Number of Points", 10, 2000, 500, step=10)
-distribution = st.sidebar.selectbox("Distribution", ["Uniform", "Normal", "Clustered"])
+distribution = st.sidebar.selectbox("Distribution", list(DISTRIBUTIONS))
 seed = st.sidebar.slider("Random Seed", 0, 100, 42)
 
 
@@ -101,7 +100,7 @@ with tab1:
     # Generate and compute
     points = generate_points(num_points, distribution, seed)
     try:
-        hull = np.array(convex_hull_ext.compute_convex_hull(points))
+        hull = convex_hull_ext.compute_convex_hull(points)
         fig = plot_convex_hull(points, hull)
         st.plotly_chart(fig, use_container_width=True)
     except Exception as e:
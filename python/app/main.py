@@ -1,29 +1,30 @@
-import sys
 import time
-from typing import Any, List, Optional, Tuple
+from typing import Any, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
 from loguru import logger
-from sklearn.neighbors import KDTree
 
-from python.src.kdtree_backends import PythonKDTree
-# from python_duckdb_backend import DuckDBNearestNeighbour
-# from python_cgal_backend import CGALKDTreeBackend
-# from python_cpp_backend import CppKDTreeBackend
-
-
-# Try to import the C++ backend
-sys.path.append("build")
-try:
-    import kd_tree_cpp
-except ImportError:
-    kd_tree_cpp = None
+from python.src import instrumentation
+from python.src.index_cache import LRUCache, points_key
+from python.src.kdtree_backends import available_backends, create_backend
+from python.src.point_generators import PointGenerator
 
 FIXED_SEED = 42
 README_TITLE = "**`nearest-neighbour-cg`**"
+# Entries kept by the caches shared across all sessions
+MAX_CACHED_POINT_SETS = 8
+MAX_CACHED_INDICES = 8
+# Input point shapes offered in the sidebar
+SHAPES = ["Rectangle", "Circle", "Gaussian", "Clustered", "Power law", "Line"]
+# Marker traces switch to WebGL (Scattergl) above this many points
+WEBGL_THRESHOLD = 5000
+# Larger results tables are truncated on screen; the Parquet export has every row
+MAX_RENDERED_ROWS = 10_000
+# Upper bound of the query-count input in the sidebar
+MAX_QUERIES = 1_000_000
 
 logger.add("nn_search.log", rotation="5 MB", enqueue=True, backtrace=True)
 
@@ -69,91 +70,31 @@ class PointCloud:
 #         return [self.query(pt[0], pt[1]) for pt in query_points]
 
 
-class KDTree2D_CPP:
-    """C++ KDTree wrapper using pybind11."""
-
-    def __init__(self, point_cloud: PointCloud):
-        """
-        Args:
-            point_cloud: PointCloud instance.
-        Raises:
-            ImportError: If C++ backend is unavailable.
-        """
-        if kd_tree_cpp is None:
-            raise ImportError("C++ backend not available")
-        points = [kd_tree_cpp.Point(float(x), float(y)) for x, y in point_cloud.points]
-        self.cloud = kd_tree_cpp.PointCloud(points)
-        self.tree = kd_tree_cpp.KDTree2D(self.cloud)
-
-    def query(self, x: float, y: float) -> Tuple[int, float]:
-        """
-        Find nearest neighbor for (x, y) using C++ backend.
-        Returns:
-            Tuple of (index, distance)
-        """
-        idx, dist = self.tree.query(float(x), float(y))
-        return int(idx), float(dist)
-
-    def query_parallel(self, query_points: np.ndarray) -> List[Tuple[int, float]]:
-        """
-        Query all points (serial).
-        Args:
-            query_points: Nx2 numpy array.
-        Returns:
-            List of (index, distance) tuples.
-        """
-        return [self.query(pt[0], pt[1]) for pt in query_points]
+@st.cache_resource
+def get_caches() -> Tuple[LRUCache, LRUCache]:
+    """
+    Process-wide (point set, built index) caches, shared by every session.
+    """
+    return (
+        LRUCache(MAX_CACHED_POINT_SETS, name="point cache"),
+        LRUCache(MAX_CACHED_INDICES, name="index cache"),
+    )
 
 
-class RandomPointGenerator:
-    """Random point generator for rectangles and circles."""
+class NearestNeighbourApp:
+    """Main Streamlit app for nearest neighbour demo."""
 
-    def __init__(self, seed: int):
+    def __init__(self, webgl_threshold: int = WEBGL_THRESHOLD):
         """
+        Initialise app state and sidebar.
         Args:
-            seed: Random seed.
+            webgl_threshold: Point count above which markers are drawn with Scattergl.
         """
-        self.rng = np.random.default_rng(seed)
-
-    def generate_rectangle(
-        self,
-        num_points: int,
-        x_range: Tuple[float, float],
-        y_range: Tuple[float, float],
-    ) -> np.ndarray:
-        """
-        Generate points in a rectangle.
-        Returns:
-            Nx2 numpy array.
-        """
-        xs = self.rng.uniform(x_range[0], x_range[1], num_points)
-        ys = self.rng.uniform(y_range[0], y_range[1], num_points)
-        return np.column_stack((xs, ys))
-
-    def generate_circle(
-        self, num_points: int, center: Tuple[float, float], radius: float
-    ) -> np.ndarray:
-        """
-        Generate points in a circle.
-        Returns:
-            Nx2 numpy array.
-        """
-        points = []
-        while len(points) < num_points:
-            x = self.rng.uniform(center[0] - radius, center[0] + radius)
-            y = self.rng.uniform(center[1] - radius, center[1] + radius)
-            if (x - center[0]) ** 2 + (y - center[1]) ** 2 <= radius**2:
-                points.append([x, y])
-        return np.array(points)
-
-
-class NearestNeighbourApp:
-    """Main Streamlit app for nearest neighbour demo."""
-
-    def __init__(self):
-        """Initialise app state and sidebar."""
-        self.seed = FIXED_SEED
-        self.point_gen = RandomPointGenerator(self.seed)
+        self.webgl_threshold = webgl_threshold
+        # The seed lives in session state so regenerated points survive reruns
+        st.session_state.setdefault("seed", FIXED_SEED)
+        self.seed = st.session_state["seed"]
+        self.point_cache, self.index_cache = get_caches()
         self.sidebar_state = self.create_sidebar()
 
     def create_sidebar(self) -> dict:
@@ -162,7 +103,7 @@ class NearestNeighbourApp:
         Returns:
             Dictionary of sidebar parameters.
         """
-        backend = st.sidebar.radio("Select backend", ["Python", "C++"])
+        backend = st.sidebar.radio("Select backend", available_backends())
         st.sidebar.markdown("---")
 
         st.sidebar.subheader("Visualisation Notes:")
@@ -171,17 +112,25 @@ class NearestNeighbourApp:
         )
         st.sidebar.markdown("---")
         if st.sidebar.button("Clear/Regenerate Points"):
-            self.seed += 1
-            self.point_gen = RandomPointGenerator(self.seed)
+            st.session_state["seed"] = self.seed + 1
             st.session_state["nn_results"] = None
             st.rerun()
         st.sidebar.subheader("Generate Settings for random points")
-        num_points = st.sidebar.slider("Number of input points", 100, 5000, 100, 100)
-        num_queries = st.sidebar.slider("Number of query points", 10, 1000, 10)
-        shape = st.sidebar.selectbox("Input points shape", ["Rectangle", "Circle"])
+        num_points = st.sidebar.slider("Number of input points", 100, 100_000, 100, 100)
+        # Typed rather than a slider, so batches large enough to truncate the results table are reachable
+        num_queries = st.sidebar.number_input(
+            "Number of query points", min_value=10, max_value=MAX_QUERIES, value=10, step=10
+        )
+        shape = st.sidebar.selectbox("Input points shape", SHAPES)
         x_min, x_max = st.sidebar.slider("X range", -100.0, 100.0, (-50.0, 50.0))
         y_min, y_max = st.sidebar.slider("Y range", -100.0, 100.0, (-50.0, 50.0))
         radius = st.sidebar.slider("Circle radius (if selected)", 1.0, 100.0, 40.0)
+        export_parquet = st.sidebar.checkbox("Export results as Parquet")
+        record_metrics = st.sidebar.checkbox(
+            "Record instrumentation",
+            help="Record build phases, query latency and native search counters "
+            "(process-wide, shared by every session)",
+        )
 
         return dict(
             backend=backend,
@@ -193,30 +142,55 @@ class NearestNeighbourApp:
             y_min=y_min,
             y_max=y_max,
             radius=radius,
+            export_parquet=export_parquet,
+            record_metrics=record_metrics,
         )
 
     def generate_points(self) -> Tuple[np.ndarray, np.ndarray, PointCloud]:
         """
-        Generate input and query points based on sidebar state.
+        Input and query points for the sidebar state, generated once per
+        (seed, settings) and then served from the point cache.
         Returns:
             Tuple: (input points, query points, PointCloud)
         """
         s = self.sidebar_state
-        if s["shape"] == "Rectangle":
-            points = self.point_gen.generate_rectangle(
-                s["num_points"], (s["x_min"], s["x_max"]), (s["y_min"], s["y_max"])
-            )
-        else:
-            center = ((s["x_min"] + s["x_max"]) / 2, (s["y_min"] + s["y_max"]) / 2)
-            points = self.point_gen.generate_circle(
-                s["num_points"], center, s["radius"]
-            )
-        query_points = self.point_gen.generate_rectangle(
-            s["num_queries"], (s["x_min"], s["x_max"]), (s["y_min"], s["y_max"])
+        key = (self.seed,) + tuple(
+            v for k, v in s.items() if k not in ("backend", "export_parquet", "record_metrics")
+        )
+        (points, query_points), _ = self.point_cache.get_or_create(
+            key, self._generate_points
         )
         cloud = PointCloud(points)
         return points, query_points, cloud
 
+    def _generate_points(self) -> Tuple[np.ndarray, np.ndarray]:
+        s = self.sidebar_state
+        point_gen = PointGenerator(self.seed)
+        x_range, y_range = (s["x_min"], s["x_max"]), (s["y_min"], s["y_max"])
+        center = ((s["x_min"] + s["x_max"]) / 2, (s["y_min"] + s["y_max"]) / 2)
+        span = min(s["x_max"] - s["x_min"], s["y_max"] - s["y_min"])
+        shape_params = {
+            "Rectangle": ("uniform", dict(x_range=x_range, y_range=y_range)),
+            "Circle": ("disk", dict(center=center, radius=s["radius"])),
+            "Gaussian": ("gaussian", dict(mean=center, std=span / 6)),
+            "Clustered": (
+                "clustered",
+                dict(num_clusters=5, spread=span / 30, x_range=x_range, y_range=y_range),
+            ),
+            "Power law": ("power_law", dict(x_range=x_range, y_range=y_range)),
+            "Line": (
+                "line",
+                dict(start=(x_range[0], y_range[0]), end=(x_range[1], y_range[1]), width=span / 50),
+            ),
+        }
+        distribution, params = shape_params[s["shape"]]
+        points = point_gen.generate(distribution, s["num_points"], **params)
+        query_points = point_gen.uniform(s["num_queries"], x_range, y_range)
+        # Cached arrays are shared across sessions, so make them read-only
+        points.setflags(write=False)
+        query_points.setflags(write=False)
+        return points, query_points
+
     def run(self) -> None:
         """Main entry point for the app."""
 
@@ -231,6 +205,11 @@ class NearestNeighbourApp:
         """Run the main demo tab, including controls and results."""
         points, query_points, cloud = self.generate_points()
         s = self.sidebar_state
+        if s["record_metrics"] != instrumentation.is_enabled():
+            if s["record_metrics"]:
+                instrumentation.enable(native_counters=True)
+            else:
+                instrumentation.disable()
         if "nn_results" not in st.session_state:
             st.session_state["nn_results"] = None
 
@@ -248,75 +227,119 @@ class NearestNeighbourApp:
                     f"radius={s['radius']}, backend={s['backend']}, seed={self.seed}"
                 )
                 t0 = time.perf_counter()
-                if s["backend"] == "Python":
-                    kd = PythonKDTree(points)
-                    results = kd.query_parallel(query_points)
-                elif s["backend"] == "C++":
-                    if kd_tree_cpp is None:
-                        st.error("C++ backend is not available.")
-                        results = [(None, None)] * len(query_points)
-                    else:
-                        kd = KDTree2D_CPP(cloud)
-                        results = kd.query_parallel(query_points)
-                else:
-                    st.warning("Unknown backend selected.")
-                    results = [(None, None)] * len(query_points)
+                kd, cached = self.index_cache.get_or_create(
+                    (points_key(points), s["backend"]),
+                    lambda: create_backend(s["backend"], points),
+                )
                 t1 = time.perf_counter()
-                elapsed = t1 - t0
+                # Indices cached before instrumentation was enabled are wrapped here
+                results = instrumentation.instrument(kd).query_batch(query_points)
+                t2 = time.perf_counter()
+                build_time = "cached" if cached else f"{t1 - t0:.4f}s"
                 logger.success(
-                    f"Run completed | backend={s['backend']} | elapsed={elapsed:.4f}s"
+                    f"Run completed | backend={s['backend']} | build={build_time} | "
+                    f"query={t2 - t1:.4f}s"
                 )
                 st.session_state["nn_results"] = results
                 st.toast(
-                    f"Run completed in {elapsed:.4f} seconds using {s['backend']} backend.",
+                    f"Run completed using {s['backend']} backend: build {build_time}, "
+                    f"query {t2 - t1:.4f}s.",
                     icon="✅",
                 )
 
         plot_container = st.container(border=True)
         results = st.session_state["nn_results"]
-        results_data = []
-        if results is not None:
-            st.subheader("Results Table")
-            for i, (qp, res) in enumerate(zip(query_points, results)):
-                idx, dist = res
-                neighbour = (
-                    points[idx]
-                    if idx is not None and idx < len(points)
-                    else (None, None)
-                )
-                results_data.append(
-                    {
-                        "Query #": i + 1,
-                        "Query X": qp[0],
-                        "Query Y": qp[1],
-                        "NN Index": idx,
-                        "NN X": neighbour[0],
-                        "NN Y": neighbour[1],
-                        "Distance": dist,
-                    }
-                )
+        # Results from before the query count changed no longer line up with the queries
+        if results is not None and len(results[0]) != len(query_points):
+            results = st.session_state["nn_results"] = None
         self.plot(points, query_points, results, container=plot_container)
         if results is not None:
             st.toast("Nearest neighbour search completed.", icon="✅")
             st.write(
                 "The lines indicate the nearest neighbour connections between query points and input points."
             )
-            df = pd.DataFrame(results_data)
-            st.dataframe(df, use_container_width=True)
+            st.subheader("Results Table")
+            df = self.results_table(points, query_points, *results)
+            if s["export_parquet"]:
+                self.export_parquet(df)
+            else:
+                if len(df) > MAX_RENDERED_ROWS:
+                    st.caption(
+                        f"Showing the first {MAX_RENDERED_ROWS:,} of {len(df):,} rows; "
+                        "export as Parquet for the full table."
+                    )
+                st.dataframe(df.head(MAX_RENDERED_ROWS), use_container_width=True)
+        if s["record_metrics"]:
+            with st.expander("Instrumentation snapshot"):
+                st.json(instrumentation.snapshot())
+
+    @staticmethod
+    def results_table(
+        points: np.ndarray,
+        query_points: np.ndarray,
+        indices: np.ndarray,
+        distances: np.ndarray,
+    ) -> pd.DataFrame:
+        """
+        Build the results table column by column from batch query arrays.
+
+        Neighbours are gathered with one fancy-index; queries without a valid
+        neighbour (index -1 or out of range) get NA in the neighbour columns.
+        Returns:
+            DataFrame with one row per query.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        missing = (indices < 0) | (indices >= len(points))
+        # Column-major so each coordinate column is contiguous without a copy
+        neighbours = np.full((len(indices), 2), np.nan, order="F")
+        neighbours[~missing] = points[indices[~missing]]
+        return pd.DataFrame(
+            {
+                "Query #": np.arange(1, len(indices) + 1),
+                "Query X": query_points[:, 0],
+                "Query Y": query_points[:, 1],
+                "NN Index": pd.arrays.IntegerArray(indices, missing.copy()),
+                "NN X": pd.arrays.FloatingArray(neighbours[:, 0], missing.copy()),
+                "NN Y": pd.arrays.FloatingArray(neighbours[:, 1], missing.copy()),
+                "Distance": pd.arrays.FloatingArray(
+                    np.asarray(distances, dtype=np.float64), missing.copy()
+                ),
+            },
+            copy=False,
+        )
+
+    @staticmethod
+    def export_parquet(df: pd.DataFrame) -> None:
+        """Offer the results table as a Parquet download instead of rendering it."""
+        try:
+            data = df.to_parquet(index=False)
+        except ImportError as e:
+            st.error(f"Parquet export needs pyarrow or fastparquet: {e}")
+            return
+        st.download_button(
+            f"Download {len(df):,} rows as Parquet",
+            data=data,
+            file_name="nn_results.parquet",
+            mime="application/vnd.apache.parquet",
+        )
 
     def plot(
         self,
         points: np.ndarray,
         query_points: np.ndarray,
-        results: Optional[List[Tuple[int, float]]] = None,
+        results: Optional[Tuple[np.ndarray, np.ndarray]] = None,
         container: Optional[Any] = None,
     ) -> None:
         """
         Plot points and nearest neighbour lines.
+
+        All connections share one NaN-separated trace, and layers larger than
+        `webgl_threshold` are drawn with Scattergl, so the figure stays at
+        three traces however many queries there are.
         Args:
             points: Nx2 array of input points.
             query_points: Mx2 array of query points.
-            results: List of (index, distance) tuples or None.
+            results: (indices, distances) arrays from query_batch, or None.
             container: Streamlit container to plot in.
         """
         if container is None:
@@ -324,7 +347,7 @@ class NearestNeighbourApp:
         with container:
             fig = go.Figure()
             fig.add_trace(
-                go.Scatter(
+                self._scatter(len(points))(
                     x=points[:, 0],
                     y=points[:, 1],
                     mode="markers",
@@ -333,7 +356,7 @@ class NearestNeighbourApp:
                 )
             )
             fig.add_trace(
-                go.Scatter(
+                self._scatter(len(query_points))(
                     x=query_points[:, 0],
                     y=query_points[:, 1],
                     mode="markers",
@@ -342,18 +365,17 @@ class NearestNeighbourApp:
                 )
             )
             if results is not None:
-                for (qx, qy), (idx, dist) in zip(query_points, results):
-                    if idx is not None and idx < len(points):
-                        nx, ny = points[idx]
-                        fig.add_trace(
-                            go.Scatter(
-                                x=[qx, nx],
-                                y=[qy, ny],
-                                mode="lines",
-                                line=dict(color="green", dash="dash"),
-                                showlegend=False,
-                            )
-                        )
+                line_x, line_y = self.connection_lines(points, query_points, results[0])
+                fig.add_trace(
+                    self._scatter(len(query_points))(
+                        x=line_x,
+                        y=line_y,
+                        mode="lines",
+                        line=dict(color="green", dash="dash"),
+                        connectgaps=False,
+                        showlegend=False,
+                    )
+                )
             fig.update_layout(
                 xaxis_title="X",
                 yaxis_title="Y",
@@ -363,6 +385,33 @@ class NearestNeighbourApp:
             )
             st.plotly_chart(fig)
 
+    def _scatter(self, num_points: int) -> type:
+        """
+        Plotly trace class for a layer of `num_points` points: WebGL above the threshold.
+        """
+        return go.Scattergl if num_points > self.webgl_threshold else go.Scatter
+
+    @staticmethod
+    def connection_lines(
+        points: np.ndarray,
+        query_points: np.ndarray,
+        indices: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Coordinates of every query -> neighbour segment packed for one line trace.
+
+        Each segment is (query, neighbour, NaN); the NaN breaks the line so
+        segments are not joined. Queries without a valid neighbour are skipped.
+        Returns:
+            (x, y) arrays of length 3 * number of segments.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        valid = (indices >= 0) & (indices < len(points))
+        segments = np.full((int(valid.sum()), 3, 2), np.nan)
+        segments[:, 0] = query_points[valid]
+        segments[:, 1] = points[indices[valid]]
+        return segments[:, :, 0].ravel(), segments[:, :, 1].ravel()
+
     def show_readme_tab(self) -> None:
         """Display README tab."""
         try:
@@ -0,0 +1,95 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+sys.path.append("build")
+import kd_tree_cpp
+
+from python.src.point_generators import PointGenerator
+
+
+def stream_with_rebuild(
+    points: np.ndarray, updates: list[tuple[np.ndarray, int]], queries: np.ndarray
+) -> float:
+    """
+    Apply each update by rebuilding a static KDTree2D over the surviving points.
+
+    Returns:
+        Elapsed seconds for all updates plus one nearest neighbour batch after each.
+    """
+    start = time.perf_counter()
+    current = points
+    for arrivals, expired in updates:
+        current = np.concatenate([current[expired:], arrivals])
+        kd_tree_cpp.KDTree2D(current).query_batch(queries)
+    return time.perf_counter() - start
+
+
+def stream_with_dynamic(
+    points: np.ndarray, updates: list[tuple[np.ndarray, int]], queries: np.ndarray
+) -> float:
+    """
+    Apply each update in place on a DynamicKDTree2D (oldest points expire first).
+
+    Returns:
+        Elapsed seconds for all updates plus one nearest neighbour batch after each.
+    """
+    start = time.perf_counter()
+    tree = kd_tree_cpp.DynamicKDTree2D(points)
+    oldest = 0
+    for arrivals, expired in updates:
+        tree.remove(np.arange(oldest, oldest + expired))
+        oldest += expired
+        tree.add_points(arrivals)
+        tree.query_batch(queries)
+    return time.perf_counter() - start
+
+
+def main(max_exp: int = 6, n_updates: int = 100, batch: int = 100):
+    """
+    Compare a full rebuild per update with in-place dynamic updates.
+
+    Each update expires the `batch` oldest points and inserts `batch` new ones,
+    then runs 1000 nearest neighbour queries.
+
+    Args:
+        max_exp: Largest problem size as a power of ten.
+        n_updates: Number of updates per size.
+        batch: Points inserted and expired per update.
+    """
+    point_gen = PointGenerator(42)
+    queries = point_gen.uniform(1000, (0, 100), (0, 100))
+    report_rows = []
+    for exp in range(4, max_exp + 1):
+        n_points = 10**exp
+        points = point_gen.uniform(n_points, (0, 100), (0, 100))
+        updates = [
+            (point_gen.uniform(batch, (0, 100), (0, 100)), batch) for _ in range(n_updates)
+        ]
+        t_rebuild = stream_with_rebuild(points, updates, queries)
+        t_dynamic = stream_with_dynamic(points, updates, queries)
+        logger.info(
+            f"{n_points} points | {n_updates} updates of {batch} | "
+            f"rebuild={t_rebuild:.4f}s | dynamic={t_dynamic:.4f}s"
+        )
+        report_rows.append(
+            {
+                "Num Points": n_points,
+                "Updates": n_updates,
+                "Batch": batch,
+                "Rebuild (s)": t_rebuild,
+                "Dynamic (s)": t_dynamic,
+                "Speedup": t_rebuild / t_dynamic,
+            }
+        )
+
+    df_report = pd.DataFrame(report_rows)
+    logger.info(f"Dynamic update benchmark complete:\n{df_report}")
+    print(df_report.to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:4]))
@@ -0,0 +1,74 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+sys.path.append("build")
+import kd_tree_cpp
+
+from python.src.point_generators import PointGenerator
+
+
+def build_from_list(points: np.ndarray) -> float:
+    """
+    Build a KDTree2D via a Python list of kd_tree_cpp.Point objects (legacy path).
+
+    Returns:
+        Elapsed seconds, including the per-point object construction.
+    """
+    start = time.perf_counter()
+    cloud = kd_tree_cpp.PointCloud(
+        [kd_tree_cpp.Point(float(x), float(y)) for x, y in points]
+    )
+    kd_tree_cpp.KDTree2D(cloud)
+    return time.perf_counter() - start
+
+
+def build_from_array(points: np.ndarray) -> float:
+    """
+    Build a KDTree2D directly over the (N, 2) float64 array (zero-copy path).
+
+    Returns:
+        Elapsed seconds.
+    """
+    start = time.perf_counter()
+    kd_tree_cpp.KDTree2D(points)
+    return time.perf_counter() - start
+
+
+def main(max_exp: int = 6, repeats: int = 3):
+    """
+    Compare index build time for the list and NumPy ingestion paths.
+
+    Args:
+        max_exp: Largest problem size as a power of ten.
+        repeats: Number of trials per size; the best time is reported.
+    """
+    point_gen = PointGenerator(42)
+    report_rows = []
+    for exp in range(3, max_exp + 1):
+        n_points = 10**exp
+        points = point_gen.uniform(n_points, (0, 100), (0, 100))
+        t_list = min(build_from_list(points) for _ in range(repeats))
+        t_array = min(build_from_array(points) for _ in range(repeats))
+        logger.info(
+            f"{n_points} points | list={t_list:.4f}s | ndarray={t_array:.4f}s"
+        )
+        report_rows.append(
+            {
+                "Num Points": n_points,
+                "List Build (s)": t_list,
+                "NDArray Build (s)": t_array,
+                "Speedup": t_list / t_array,
+            }
+        )
+
+    df_report = pd.DataFrame(report_rows)
+    logger.info(f"Ingestion benchmark complete:\n{df_report}")
+    print(df_report.to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,92 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+sys.path.append("build")
+import kd_tree_cpp
+
+from python.src.benchmark_suite import DISTRIBUTION_PARAMS
+from python.src.point_generators import PointGenerator
+
+
+def tour_with_rebuild(points: np.ndarray, start: int = 0) -> tuple[np.ndarray, float]:
+    """
+    Greedy path the slow way: query a KDTree2D over the unvisited points and
+    rebuild it after every visit (O(N^2 log N)).
+
+    Returns:
+        (order, length) like kd_tree_cpp.greedy_tour
+    """
+    unvisited = np.ones(len(points), dtype=bool)
+    order = [start]
+    unvisited[start] = False
+    while unvisited.any():
+        rows = np.flatnonzero(unvisited)
+        nearest, _ = kd_tree_cpp.KDTree2D(points[rows]).query(*points[order[-1]])
+        order.append(int(rows[nearest]))
+        unvisited[order[-1]] = False
+    order = np.array(order)
+    return order, float(np.linalg.norm(np.diff(points[order], axis=0), axis=1).sum())
+
+
+def main(max_exp: int = 6, two_opt_seconds: float = 10.0, max_rebuild_exp: int = 4):
+    """
+    Time greedy stitch paths and their 2-opt refinement on uniform and clustered designs.
+
+    Args:
+        max_exp: Largest design size as a power of ten.
+        two_opt_seconds: 2-opt time budget per design.
+        max_rebuild_exp: Largest size also timed with the rebuild-per-visit loop.
+    """
+    point_gen = PointGenerator(42)
+    report_rows = []
+    for distribution in ("uniform", "clustered"):
+        for exp in range(3, max_exp + 1):
+            n_points = 10**exp
+            points = point_gen.generate(
+                distribution, n_points, **DISTRIBUTION_PARAMS[distribution]
+            )
+            start = time.perf_counter()
+            _, greedy_length = kd_tree_cpp.greedy_tour(points)
+            t_greedy = time.perf_counter() - start
+            start = time.perf_counter()
+            _, length = kd_tree_cpp.greedy_tour(points, two_opt_seconds=two_opt_seconds)
+            t_two_opt = time.perf_counter() - start
+            t_rebuild = float("nan")
+            if exp <= max_rebuild_exp:
+                start = time.perf_counter()
+                tour_with_rebuild(points)
+                t_rebuild = time.perf_counter() - start
+            logger.info(
+                f"{distribution} | {n_points} points | greedy={t_greedy:.4f}s "
+                f"length={greedy_length:.1f} | 2-opt={t_two_opt:.4f}s length={length:.1f} | "
+                f"rebuild loop={t_rebuild:.4f}s"
+            )
+            report_rows.append(
+                {
+                    "Distribution": distribution,
+                    "Num Points": n_points,
+                    "Greedy (s)": t_greedy,
+                    "Greedy Length": greedy_length,
+                    "Greedy + 2-opt (s)": t_two_opt,
+                    "2-opt Length": length,
+                    "2-opt Saving (%)": 100 * (1 - length / greedy_length),
+                    "Rebuild Loop (s)": t_rebuild,
+                }
+            )
+
+    df_report = pd.DataFrame(report_rows)
+    logger.info(f"Stitch path benchmark complete:\n{df_report}")
+    print(df_report.to_markdown(index=False))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:4]
+    main(
+        int(args[0]) if len(args) > 0 else 6,
+        float(args[1]) if len(args) > 1 else 10.0,
+        int(args[2]) if len(args) > 2 else 4,
+    )
@@ -1,177 +1,226 @@
-import time
-import numpy as np
+import argparse
+import sys
+
 import pandas as pd
-from sklearn.neighbors import KDTree
+import plotly.graph_objects as go
 from loguru import logger
 
-# Import your C++ backends if available
-try:
-    from kd_tree_cpp import KDTree2D_CPP  # Replace with your actual import
-
-    cpp_nanoflann_available = True
-except ImportError:
-    cpp_nanoflann_available = False
-
-try:
-    from cgal_bindings import KDTree2D_CGAL  # Replace with your actual import
-
-    cpp_cgal_available = True
-except ImportError:
-    cpp_cgal_available = False
-
-try:
-    import duckdb
-    from duckdb_nn import DuckDBNearestNeighbour  # Replace with your actual import
-
-    duckdb_available = True
-except ImportError:
-    duckdb_available = False
-
-
-# Python KDTree wrapper
-class KDTree2D_Python:
-    def __init__(self, points):
-        self.points = points
-        self.tree = KDTree(points)
-
-    def query(self, point):
-        dist, ind = self.tree.query([point], k=1)
-        return ind[0][0], dist[0][0]
-
-
-# Helper function to run a backend on all queries and time it
-def run_backend(backend, queries, backend_name):
-    logger.info(f"Running backend: {backend_name} on {len(queries)} queries.")
-    start = time.perf_counter()
-    results = [backend.query(q) for q in queries]
-    end = time.perf_counter()
-    logger.info(f"Backend {backend_name} completed in {end - start:.4f} seconds.")
-    return results, end - start
+from python.src.benchmark_suite import (
+    DISTRIBUTION_PARAMS,
+    GATED_METRICS,
+    compare_results,
+    exact_mismatches,
+    load_results,
+    recall_qps_sweep,
+    run_suite,
+    save_results,
+)
+from python.src.kdtree_backends import available_backends
+from python.src.point_generators import PointGenerator
+
+
+def summary_table(report: dict) -> pd.DataFrame:
+    """
+    One row per scenario with the headline numbers of a suite run.
+    """
+    return pd.DataFrame(
+        [
+            {
+                "Backend": r["backend"],
+                "Distribution": r["distribution"],
+                "Num Points": r["n_points"],
+                "Num Queries": r["n_queries"],
+                "k": r["k"],
+                "Threads": r["n_threads"],
+                "Build (s)": r["build_s"]["median"],
+                "p50 (us)": r["latency_us"]["p50"],
+                "p99 (us)": r["latency_us"]["p99"],
+                "Batch (q/s)": r["batch_qps"],
+                "Memory (MB)": r["memory"]["index_bytes"] / 2**20,
+                "Build RSS +(MB)": r["memory"]["build_rss_increase"] / 2**20,
+                "Query RSS +(MB)": r["memory"]["query_rss_increase"] / 2**20,
+            }
+            for r in report["results"]
+        ]
+    )
 
 
-def compare_results(results_dict, threshold=1e-6):
+def recall_figure(rows: list[dict]) -> go.Figure:
     """
-    results_dict: {backend_name: [(idx, dist), ...]}
-    Compares all backends pairwise and reports differences in index or distance > threshold.
+    Recall against queries/sec, one trace per backend and leaf size, points labelled by eps.
     """
-    backends = list(results_dict.keys())
-    n_queries = len(next(iter(results_dict.values())))
-    diffs = []
-    for i in range(n_queries):
-        # Gather ith result from each backend
-        res_i = {b: results_dict[b][i] for b in backends}
-        # Compare indices pairwise
-        indices = [res_i[b][0] for b in backends]
-        distances = [res_i[b][1] for b in backends]
-        # Check if all indices match
-        if len(set(indices)) > 1:
-            diffs.append(
-                {
-                    "query_idx": i,
-                    "type": "index_mismatch",
-                    "indices": indices,
-                    "distances": distances,
-                }
+    fig = go.Figure()
+    df = pd.DataFrame(rows)
+    for (backend, leaf_size), group in df.groupby(["backend", "leaf_size"], dropna=False):
+        name = backend if pd.isna(leaf_size) else f"{backend} (leaf {int(leaf_size)})"
+        fig.add_trace(
+            go.Scatter(
+                x=group["recall"],
+                y=group["qps"],
+                mode="lines+markers",
+                name=name,
+                text=[None if pd.isna(e) else f"eps={e:g}" for e in group["eps"]],
+                hovertemplate="%{text}<br>recall=%{x:.4f}<br>%{y:.0f} q/s",
             )
-        else:
-            # Indices match, check distance differences
-            max_dist = max(distances)
-            min_dist = min(distances)
-            if max_dist - min_dist > threshold:
-                diffs.append(
-                    {
-                        "query_idx": i,
-                        "type": "distance_diff",
-                        "indices": indices,
-                        "distances": distances,
-                        "diff": max_dist - min_dist,
-                    }
-                )
-    logger.info(
-        f"Compared results: found {len(diffs)} differences exceeding threshold {threshold}."
+        )
+    k = rows[0]["k"] if rows else 1
+    fig.update_layout(
+        title="Recall vs throughput",
+        xaxis_title=f"Recall@{k}",
+        yaxis_title="Queries / sec",
+        yaxis_type="log",
     )
-    return diffs
+    return fig
 
 
-def main():
+def recall(args: argparse.Namespace) -> int:
     logger.add("nn_benchmark.log", rotation="10 MB")
-    np.random.seed(42)
-    Npointexp_max = 4  # Up to 10^4 points, adjust as needed
-    threshold = 1e-6
-
-    backends = {}
-
-    # Prepare backend availability
-    backends["Python KDTree"] = None
-    if cpp_nanoflann_available:
-        backends["C++ nanoflann"] = None
-    if cpp_cgal_available:
-        backends["C++ CGAL"] = None
-    if duckdb_available:
-        backends["DuckDB SQL"] = None
-
-    report_rows = []
-
-    for exp in range(1, Npointexp_max + 1):
-        n_points = 10**exp
-        n_queries = max(1, n_points // 10)
-        logger.info(f"Scenario: {n_points} points, {n_queries} queries.")
-
-        # Generate points and queries
-        points = np.random.uniform(0, 100, size=(n_points, 2))
-        queries = np.random.uniform(0, 100, size=(n_queries, 2))
-        logger.info(f"Generated random points and queries for scenario.")
-
-        # Initialize backends
-        backends_instances = {}
-        logger.info("Initializing backends...")
-        backends_instances["Python KDTree"] = KDTree2D_Python(points)
-        if cpp_nanoflann_available:
-            backends_instances["C++ nanoflann"] = KDTree2D_CPP(points)
-        if cpp_cgal_available:
-            backends_instances["C++ CGAL"] = KDTree2D_CGAL(points)
-        if duckdb_available:
-            backends_instances["DuckDB SQL"] = DuckDBNearestNeighbour(points)
-        logger.info(f"Backends initialized: {list(backends_instances.keys())}")
-
-        # Run all backends
-        results = {}
-        times = {}
-        for name, instance in backends_instances.items():
-            res, t = run_backend(instance, queries, name)
-            results[name] = res
-            times[name] = t
-
-        # Compare results
-        diffs = compare_results(results, threshold=threshold)
-
-        # Prepare report rows
-        for name, t in times.items():
-            report_rows.append(
-                {
-                    "Backend": name,
-                    "Num Points": n_points,
-                    "Num Queries": n_queries,
-                    "Time (s)": t,
-                    "Differences": len(diffs),
-                }
-            )
+    backends = args.backends or [
+        b for b in ("nanoflann", "duckdb") if b in available_backends()
+    ]
+    point_gen = PointGenerator(args.seed)
+    points = point_gen.generate(
+        args.distribution, args.points, **DISTRIBUTION_PARAMS[args.distribution]
+    )
+    queries = point_gen.uniform(args.queries, **DISTRIBUTION_PARAMS["uniform"])
+    rows = recall_qps_sweep(
+        backends,
+        points,
+        queries,
+        k=args.k,
+        eps_values=args.eps,
+        leaf_sizes=args.leaf_sizes,
+        oracle=args.oracle,
+        n_threads=args.threads,
+        repeats=args.repeats,
+    )
+    recall_figure(rows).write_html(args.output)
+    logger.info(f"Recall/throughput plot saved as {args.output}")
+    table = pd.DataFrame(rows).drop(columns="batch_s")
+    print(table.to_markdown(index=False))
+    return 0
 
-        # Optionally print some diff details
-        if diffs:
-            logger.warning(f"Sample differences for scenario {n_points} points:")
-            for d in diffs[:5]:
-                logger.warning(d)
 
-    # Summary report
-    df_report = pd.DataFrame(report_rows)
-    logger.info("Benchmark complete. Summary report:")
-    logger.info(f"\n{df_report}")
+def run(args: argparse.Namespace) -> int:
+    logger.add("nn_benchmark.log", rotation="10 MB")
+    backends = args.backends or available_backends()
+    logger.info(f"Benchmarking backends: {backends}")
+    report = run_suite(
+        backends,
+        n_points=args.points,
+        n_queries=args.queries,
+        ks=args.k,
+        distributions=args.distributions,
+        threads=args.threads,
+        warmup=args.warmup,
+        repeats=args.repeats,
+        latency_queries=args.latency_queries,
+        seed=args.seed,
+    )
+    # Timings alone would let a backend returning wrong neighbours pass, so check
+    # every exact backend against the oracle on the smallest scenario of each distribution
+    report["mismatches"] = []
+    for distribution in args.distributions:
+        point_gen = PointGenerator(args.seed)
+        points = point_gen.generate(
+            distribution, min(args.points), **DISTRIBUTION_PARAMS[distribution]
+        )
+        queries = point_gen.uniform(min(args.queries), **DISTRIBUTION_PARAMS["uniform"])
+        report["mismatches"] += [
+            m | {"distribution": distribution}
+            for m in exact_mismatches(backends, points, queries, max(args.k), args.oracle)
+        ]
+    save_results(report, args.output)
+    logger.info(f"Results saved as {args.output}")
+    print(summary_table(report).to_markdown(index=False))
+    if report["mismatches"]:
+        logger.warning(
+            f"{len(report['mismatches'])} queries disagree with the {args.oracle} oracle"
+        )
+        print(pd.DataFrame(report["mismatches"]).to_markdown(index=False))
+        return 1
+    return 0
+
+
+def compare(args: argparse.Namespace) -> int:
+    regressions = compare_results(
+        load_results(args.baseline), load_results(args.current), args.tolerance
+    )
+    if not regressions:
+        logger.info(
+            f"No regressions beyond {args.tolerance:.0%} in "
+            f"{', '.join(f'{f}.{s}' for f, s in GATED_METRICS)}"
+        )
+        return 0
+    logger.warning(f"{len(regressions)} regressions beyond {args.tolerance:.0%}")
+    print(pd.DataFrame(regressions).to_markdown(index=False))
+    return 1
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Nearest neighbour backend benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser(
+        "run",
+        help="Run the benchmark matrix and save JSON (exit code 1 if an exact backend "
+        "disagrees with the oracle)",
+    )
+    run_parser.add_argument(
+        "--backends",
+        nargs="+",
+        help="Default: all available. Options may follow a colon, "
+        "e.g. nanoflann:curve=hilbert,leaf_size=16",
+    )
+    run_parser.add_argument("--points", nargs="+", type=int, default=[10**3, 10**4, 10**5])
+    run_parser.add_argument("--queries", nargs="+", type=int, default=[10**4])
+    run_parser.add_argument("--k", nargs="+", type=int, default=[1])
+    run_parser.add_argument("--distributions", nargs="+", default=["uniform"])
+    run_parser.add_argument(
+        "--threads", nargs="+", type=int, default=[1, 0], help="0 = all cores"
+    )
+    run_parser.add_argument("--warmup", type=int, default=1)
+    run_parser.add_argument("--repeats", type=int, default=5)
+    run_parser.add_argument("--latency-queries", type=int, default=1000)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument(
+        "--oracle", default="sklearn", help="Exact reference backend for the agreement check"
+    )
+    run_parser.add_argument("--output", default="nn_benchmark.json")
+    run_parser.set_defaults(func=run)
+
+    recall_parser = commands.add_parser(
+        "recall", help="Plot recall against queries/sec versus an exact oracle"
+    )
+    recall_parser.add_argument(
+        "--backends", nargs="+", help="Default: nanoflann and duckdb, where available"
+    )
+    recall_parser.add_argument("--points", type=int, default=10**5)
+    recall_parser.add_argument("--queries", type=int, default=10**4)
+    recall_parser.add_argument("--k", type=int, default=10)
+    recall_parser.add_argument("--distribution", default="uniform")
+    recall_parser.add_argument(
+        "--eps", nargs="+", type=float, default=[0.0, 0.1, 0.5, 1.0, 2.0, 5.0]
+    )
+    recall_parser.add_argument("--leaf-sizes", nargs="+", type=int, default=[10])
+    recall_parser.add_argument("--oracle", default="sklearn", help="Exact reference backend")
+    recall_parser.add_argument("--threads", type=int, help="0 = all cores")
+    recall_parser.add_argument("--repeats", type=int, default=3)
+    recall_parser.add_argument("--seed", type=int, default=42)
+    recall_parser.add_argument("--output", default="nn_recall.html")
+    recall_parser.set_defaults(func=recall)
+
+    compare_parser = commands.add_parser(
+        "compare", help="Flag regressions against a baseline (exit code 1 if any)"
+    )
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=0.1)
+    compare_parser.set_defaults(func=compare)
 
-    # Save report CSV if desired
-    df_report.to_csv("nn_comparison_report.csv", index=False)
-    logger.info("Report saved as nn_comparison_report.csv.")
+    args = parser.parse_args(argv)
+    return args.func(args)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -2,6 +2,7 @@ import numpy as np
 import pandas as pd
 
 from src.kdtree_backends import DuckDBNearestNeighbour
+from src.point_generators import PointGenerator
 
 
 def main():
@@ -9,29 +10,25 @@ def main():
     n_queries = 50
     dim = 2
     FIXED_SEED = 42
-    np.random.seed(FIXED_SEED)
+    point_gen = PointGenerator(FIXED_SEED)
 
-    points = np.random.uniform(0, 100, size=(n_points, dim))
-    queries = np.random.uniform(0, 100, size=(n_queries, dim))
+    points = point_gen.uniform(n_points, (0, 100), (0, 100))
+    queries = point_gen.uniform(n_queries, (0, 100), (0, 100))
 
     nn = DuckDBNearestNeighbour(points)
 
-    # Collect results for all queries
-    results_data = []
-    for i, q in enumerate(queries):
-        neighbours = nn.query(q, k=1)
-        for idx, dist in neighbours:
-            results_data.append(
-                {
-                    "Query #": i + 1,
-                    "Query X": q[0],
-                    "Query Y": q[1],
-                    "Neighbour Index": idx,
-                    "Neighbour X": points[idx][0],
-                    "Neighbour Y": points[idx][1],
-                    "Distance": dist,
-                }
-            )
+    # Collect results for all queries (k=1 -> one column of the (M, k) arrays)
+    indices, distances = nn.query_knn(queries, k=1)
+    indices, distances = indices[:, 0], distances[:, 0]
+    results_data = {
+        "Query #": np.arange(1, n_queries + 1),
+        "Query X": queries[:, 0],
+        "Query Y": queries[:, 1],
+        "Neighbour Index": indices,
+        "Neighbour X": points[indices, 0],
+        "Neighbour Y": points[indices, 1],
+        "Distance": distances,
+    }
 
     # Output as a DataFrame
     df = pd.DataFrame(results_data)
@@ -1,5 +1,4 @@
 import sys
-from typing import List
 
 import numpy as np
 import plotly.graph_objects as go
@@ -7,53 +6,51 @@ import plotly.graph_objects as go
 sys.path.insert(0, "build/")
 import convex_hull_ext
 
+from python.src.point_generators import PointGenerator
 
-def generate_random_points(num_points: int, seed: int = None) -> List[List[float]]:
+
+def generate_random_points(num_points: int, seed: int = None) -> np.ndarray:
     """
-    Generate a list of random 2D points.
+    Generate random 2D points.
 
     Args:
         num_points: Number of points to generate.
         seed: Optional random seed for reproducibility.
 
     Returns:
-        A list of [x, y] coordinate pairs.
+        An (N, 2) array of [x, y] coordinates.
     """
-    if seed is not None:
-        np.random.seed(seed)
-    return np.random.rand(num_points, 2).tolist()
+    return PointGenerator(seed).uniform(num_points)
 
 
-def compute_convex_hull(points: List[List[float]]) -> np.ndarray:
+def compute_convex_hull(points: np.ndarray) -> np.ndarray:
     """
     Compute the convex hull of a set of 2D points using the C++ extension.
 
     Args:
-        points: List of [x, y] points.
+        points: (N, 2) array of [x, y] points; read by the extension without copying.
 
     Returns:
-        Numpy array of convex hull vertices as [[x1, y1], [x2, y2], ...].
+        (H, 2) array of convex hull vertices, closed (the first vertex is repeated at the end).
     """
-    hull = convex_hull_ext.compute_convex_hull(points)
-    return np.array(hull)
+    return convex_hull_ext.compute_convex_hull(points)
 
 
-def plot_convex_hull(points: List[List[float]], hull: np.ndarray) -> None:
+def plot_convex_hull(points: np.ndarray, hull: np.ndarray) -> None:
     """
     Plot the set of points and their convex hull using Plotly.
 
     Args:
-        points: List of [x, y] points.
-        hull: Numpy array of convex hull vertices.
+        points: (N, 2) array of [x, y] points.
+        hull: Closed (H, 2) array of convex hull vertices.
     """
-    points_np = np.array(points)
     fig = go.Figure()
 
     # Plot all points
     fig.add_trace(
         go.Scatter(
-            x=points_np[:, 0],
-            y=points_np[:, 1],
+            x=points[:, 0],
+            y=points[:, 1],
             mode="markers",
             name="Points",
             marker=dict(size=4, opacity=0.7),
@@ -61,12 +58,10 @@ def plot_convex_hull(points: List[List[float]], hull: np.ndarray) -> None:
     )
 
     # Plot convex hull (closed polygon)
-    hull_x = np.append(hull[:, 0], hull[0, 0])
-    hull_y = np.append(hull[:, 1], hull[0, 1])
     fig.add_trace(
         go.Scatter(
-            x=hull_x,
-            y=hull_y,
+            x=hull[:, 0],
+            y=hull[:, 1],
             mode="lines+markers",
             name="Convex Hull",
             line=dict(color="red", width=2),
@@ -0,0 +1,481 @@
+import datetime
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+from loguru import logger
+
+from python.src.kdtree_backends import create_backend, get_backend
+from python.src.point_generators import PointGenerator
+
+# Scenario fields; together they identify a result when comparing runs
+SCENARIO_KEYS = ("backend", "n_points", "n_queries", "k", "distribution", "n_threads")
+
+# Point distributions scaled to the [0, 100)^2 benchmark square
+DISTRIBUTION_PARAMS = {
+    "uniform": dict(x_range=(0.0, 100.0), y_range=(0.0, 100.0)),
+    "disk": dict(center=(50.0, 50.0), radius=50.0),
+    "gaussian": dict(mean=(50.0, 50.0), std=15.0),
+    "clustered": dict(num_clusters=10, spread=2.0, x_range=(0.0, 100.0), y_range=(0.0, 100.0)),
+    "power_law": dict(x_range=(0.0, 100.0), y_range=(0.0, 100.0)),
+    "line": dict(start=(0.0, 0.0), end=(100.0, 100.0), width=1.0),
+}
+
+# Timing metrics where larger is worse, as (result field, statistic)
+GATED_METRICS = (
+    ("build_s", "median"),
+    ("batch_s", "median"),
+    ("latency_us", "p50"),
+    ("latency_us", "p99"),
+)
+
+
+def parse_backend_spec(spec: str) -> tuple[str, dict]:
+    """
+    Split a backend spec such as "nanoflann:curve=hilbert,leaf_size=16" into
+    the registered name and its constructor options. Numeric values become
+    int or float; anything else stays a string.
+    """
+    name, _, option_text = spec.partition(":")
+    options = {}
+    for item in filter(None, option_text.split(",")):
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Backend option {item!r} in {spec!r} is not key=value")
+        for convert in (int, float):
+            try:
+                value = convert(value)
+                break
+            except ValueError:
+                pass
+        options[key.strip()] = value
+    return name, options
+
+
+def machine_metadata() -> dict:
+    """
+    Describe the machine and checkout a benchmark ran on.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "git_commit": commit,
+    }
+
+
+def _summary(samples: Iterable[float]) -> dict:
+    samples = np.asarray(list(samples), dtype=np.float64)
+    return {
+        "min": float(samples.min()),
+        "median": float(np.median(samples)),
+        "max": float(samples.max()),
+        "repeats": int(len(samples)),
+    }
+
+
+def _proc_status_bytes(field: str) -> Optional[int]:
+    """
+    A kB field of /proc/self/status (e.g. VmRSS, VmHWM) in bytes; None off Linux.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class PeakRSS:
+    """
+    Context manager recording the process's peak resident set size over its block.
+
+    On Linux the kernel's high-water mark is reset on entry (/proc/self/clear_refs),
+    so `peak` is the peak within the block. Elsewhere it falls back to
+    getrusage's lifetime maximum and `resettable` is False, so `peak` may
+    predate the block. `increase` is `peak` minus the RSS on entry.
+    """
+
+    def __enter__(self) -> "PeakRSS":
+        self.resettable = True
+        try:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+        except OSError:
+            self.resettable = False
+        self.start = _proc_status_bytes("VmRSS") or self._max_rss()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        peak = _proc_status_bytes("VmHWM") if self.resettable else None
+        self.peak = peak if peak is not None else self._max_rss()
+        self.increase = max(self.peak - self.start, 0)
+
+    @staticmethod
+    def _max_rss() -> int:
+        import resource
+
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _timed(fn, warmup: int, repeats: int) -> list[float]:
+    """
+    Run `fn` `warmup` times untimed, then return `repeats` wall-clock timings in seconds.
+    """
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def benchmark_scenario(
+    backend: str,
+    points: np.ndarray,
+    queries: np.ndarray,
+    k: int = 1,
+    n_threads: Optional[int] = None,
+    warmup: int = 1,
+    repeats: int = 5,
+    latency_queries: int = 1000,
+) -> dict:
+    """
+    Time index build, single-query latency and batch throughput for one backend.
+
+    Args:
+        backend: Registered backend name, or a spec with constructor options
+            (see parse_backend_spec)
+        points: (N, 2) input points
+        queries: (M, 2) query points
+        k: Neighbours per query in the batch measurement
+        n_threads: Native threads for backends with the "threads" capability
+            (0 = all cores); None uses the backend default
+        warmup: Untimed runs before each measurement
+        repeats: Timed runs per measurement
+        latency_queries: Number of single `query` calls sampled for latency
+
+    Returns:
+        Dict with build_s / batch_s summaries (seconds), latency_us percentiles
+        of single queries (microseconds), batch_qps (queries per second at
+        the median batch time) and memory: the backend's memory_usage()
+        (index_bytes, bytes_per_point) and the peak RSS (bytes) and its rise
+        over the starting RSS during one build and one batch query.
+    """
+    name, options = parse_backend_spec(backend)
+    # Measure memory on the first build, before timed builds leave freed pages behind
+    with PeakRSS() as build_rss:
+        nn = create_backend(name, points, **options)
+    build_s = _timed(lambda: create_backend(name, points, **options), warmup=0, repeats=repeats)
+
+    sample = queries[:latency_queries]
+    for q in sample[: min(warmup * 10, len(sample))]:
+        nn.query(q)
+    latencies = np.empty(len(sample))
+    for i, q in enumerate(sample):
+        start = time.perf_counter_ns()
+        nn.query(q)
+        latencies[i] = (time.perf_counter_ns() - start) / 1e3
+
+    thread_args = {} if n_threads is None else {"n_threads": n_threads}
+    with PeakRSS() as query_rss:
+        nn.query_knn(queries, k, **thread_args)
+    batch_s = _timed(lambda: nn.query_knn(queries, k, **thread_args), warmup, repeats)
+    batch = _summary(batch_s)
+    latency = {f"p{p}": float(np.percentile(latencies, p)) for p in (50, 95, 99)}
+    latency["samples"] = int(len(latencies))
+    index_bytes = int(nn.memory_usage())
+    return {
+        "build_s": _summary(build_s),
+        "latency_us": latency,
+        "batch_s": batch,
+        "batch_qps": len(queries) / batch["median"] if batch["median"] > 0 else float("inf"),
+        "memory": {
+            "index_bytes": index_bytes,
+            "bytes_per_point": index_bytes / len(points) if len(points) else 0.0,
+            "build_peak_rss": build_rss.peak,
+            "build_rss_increase": build_rss.increase,
+            "query_peak_rss": query_rss.peak,
+            "query_rss_increase": query_rss.increase,
+            "rss_resettable": build_rss.resettable,
+        },
+    }
+
+
+def run_suite(
+    backends: Iterable[str],
+    n_points: Iterable[int] = (10**3, 10**4, 10**5),
+    n_queries: Iterable[int] = (10**4,),
+    ks: Iterable[int] = (1,),
+    distributions: Iterable[str] = ("uniform",),
+    threads: Iterable[int] = (1, 0),
+    warmup: int = 1,
+    repeats: int = 5,
+    latency_queries: int = 1000,
+    seed: int = 42,
+) -> dict:
+    """
+    Benchmark every backend over the matrix of sizes, k, distributions and thread counts.
+
+    Points are drawn from each distribution scaled to [0, 100)^2
+    (DISTRIBUTION_PARAMS); queries are uniform over the same square. Thread
+    counts only apply to backends with the "threads" capability; the others
+    run once per scenario. Backends may be specs with constructor options
+    (e.g. "nanoflann:curve=hilbert"); the spec is kept as the result's backend.
+
+    Returns:
+        {"metadata": machine_metadata(), "config": ..., "results": [...]} with one
+        result per scenario, ready for `save_results` / `compare_results`.
+    """
+    config = {
+        "n_points": list(n_points),
+        "n_queries": list(n_queries),
+        "k": list(ks),
+        "distributions": list(distributions),
+        "threads": list(threads),
+        "warmup": warmup,
+        "repeats": repeats,
+        "latency_queries": latency_queries,
+        "seed": seed,
+    }
+    results = []
+    for distribution, n, m in itertools.product(
+        config["distributions"], config["n_points"], config["n_queries"]
+    ):
+        point_gen = PointGenerator(seed)
+        points = point_gen.generate(distribution, n, **DISTRIBUTION_PARAMS[distribution])
+        queries = point_gen.uniform(m, **DISTRIBUTION_PARAMS["uniform"])
+        for backend in backends:
+            threaded = "threads" in get_backend(parse_backend_spec(backend)[0]).capabilities
+            for k, n_threads in itertools.product(
+                config["k"], config["threads"] if threaded else [None]
+            ):
+                scenario = dict(
+                    backend=backend,
+                    n_points=n,
+                    n_queries=m,
+                    k=k,
+                    distribution=distribution,
+                    n_threads=n_threads,
+                )
+                logger.info(f"Benchmarking {scenario}")
+                result = benchmark_scenario(
+                    backend,
+                    points,
+                    queries,
+                    k=k,
+                    n_threads=n_threads,
+                    warmup=warmup,
+                    repeats=repeats,
+                    latency_queries=latency_queries,
+                )
+                results.append(scenario | result)
+    return {"metadata": machine_metadata(), "config": config, "results": results}
+
+
+def recall_at_k(distances: np.ndarray, exact_distances: np.ndarray) -> float:
+    """
+    Mean fraction of each query's k results that are true k nearest neighbours.
+
+    A result counts when it is no farther than the exact k-th neighbour, so
+    ties at the k-th distance are not penalised. Padding (NaN) never counts.
+
+    Args:
+        distances: (M, k) distances returned by the backend under test
+        exact_distances: (M, k) distances from an exact oracle
+    """
+    if distances.size == 0:
+        return 1.0
+    kth = exact_distances[:, -1:]
+    # Relative slack for distances recomputed in a different order or precision
+    hits = distances <= kth * (1 + 1e-9) + 1e-12
+    return float(hits.mean())
+
+
+def exact_mismatches(
+    backends: Iterable[str],
+    points: np.ndarray,
+    queries: np.ndarray,
+    k: int = 1,
+    oracle: str = "sklearn",
+    threshold: float = 1e-6,
+) -> list[dict]:
+    """
+    Check that every exact backend returns the oracle's k nearest neighbours.
+
+    A query is a "distance_mismatch" when its distances differ from the
+    oracle's by more than `threshold` at some rank, and an "index_mismatch"
+    when they agree but a returned index is not at its reported distance
+    (indices differing only among equidistant neighbours are ties, not
+    errors). Backends without the "exact" capability, such as DuckDB's HNSW
+    index or nanoflann built with eps > 0, are skipped; their accuracy is what
+    recall_qps_sweep measures. float32 storage widens the threshold to the
+    rounding of the points.
+
+    Returns:
+        One dict per mismatching query with backend, query_idx, type, and the
+        backend's and the oracle's indices and distances.
+    """
+    exact_indices, exact = create_backend(oracle, points).query_knn(queries, k)
+    scale = float(np.abs(points).max(initial=1.0))
+    mismatches = []
+    for backend in backends:
+        name, options = parse_backend_spec(backend)
+        nn = create_backend(name, points, **options)
+        if "exact" not in nn.capabilities:
+            logger.info(f"Agreement check | backend={backend} | skipped: not exact")
+            continue
+        indices, distances = nn.query_knn(queries, k)
+        atol = max(threshold, 4 * np.finfo(getattr(nn, "dtype", np.float64)).eps * scale)
+        wrong_distance = ~np.isclose(distances, exact, rtol=0.0, atol=atol, equal_nan=True).all(axis=1)
+        # Distance from each query to the point each returned index names (NaN for padding)
+        found = np.where(indices[..., None] >= 0, points[np.maximum(indices, 0)], np.nan)
+        named = np.linalg.norm(found - queries[:, None, :], axis=2)
+        wrong_index = ~np.isclose(named, distances, rtol=0.0, atol=atol, equal_nan=True).all(axis=1)
+        for i in np.flatnonzero(wrong_distance | wrong_index):
+            mismatches.append(
+                dict(
+                    backend=backend,
+                    query_idx=int(i),
+                    type="distance_mismatch" if wrong_distance[i] else "index_mismatch",
+                    indices=indices[i].tolist(),
+                    distances=distances[i].tolist(),
+                    oracle_indices=exact_indices[i].tolist(),
+                    oracle_distances=exact[i].tolist(),
+                )
+            )
+        logger.info(
+            f"Agreement check | backend={backend} | oracle={oracle} | "
+            f"mismatches={int((wrong_distance | wrong_index).sum())} of {len(queries)}"
+        )
+    return mismatches
+
+
+def recall_qps_sweep(
+    backends: Iterable[str],
+    points: np.ndarray,
+    queries: np.ndarray,
+    k: int = 10,
+    eps_values: Iterable[float] = (0.0, 0.1, 0.5, 1.0, 2.0, 5.0),
+    leaf_sizes: Iterable[int] = (10,),
+    oracle: str = "sklearn",
+    n_threads: Optional[int] = None,
+    warmup: int = 1,
+    repeats: int = 3,
+) -> list[dict]:
+    """
+    Recall against queries/sec for each backend operating point.
+
+    Backends with the "eps" capability are built once per leaf size and
+    queried at every eps; other backends (e.g. DuckDB's HNSW index) give a
+    single point at their default settings. Recall is measured against the
+    exact `oracle` backend (see recall_at_k). Backends may be specs with
+    constructor options (e.g. "nanoflann:curve=hilbert"); a `leaf_size` or
+    `eps` given in the spec fixes that axis of the sweep, and the spec is kept
+    as the row's backend. `n_threads` only reaches backends with the
+    "threads" capability.
+
+    Returns:
+        One dict per operating point with backend, leaf_size and eps (None
+        when not applicable), k, recall, batch_s (summary) and qps.
+    """
+    _, exact = create_backend(oracle, points).query_knn(queries, k)
+    rows = []
+    for backend in backends:
+        name, options = parse_backend_spec(backend)
+        capabilities = get_backend(name).capabilities
+        tunable = "eps" in capabilities
+        # n_threads only applies to backends that can split a batch across threads
+        threaded = n_threads is not None and "threads" in capabilities
+        thread_args = {"n_threads": n_threads} if threaded else {}
+        backend_leaf_sizes = [options.pop("leaf_size")] if "leaf_size" in options else leaf_sizes
+        backend_eps_values = [options.pop("eps")] if "eps" in options else eps_values
+        for leaf_size in backend_leaf_sizes if tunable else [None]:
+            build_options = options | ({} if leaf_size is None else {"leaf_size": leaf_size})
+            nn = create_backend(name, points, **build_options)
+            for eps in backend_eps_values if tunable else [None]:
+                query_args = thread_args | ({} if eps is None else {"eps": eps})
+                _, distances = nn.query_knn(queries, k, **query_args)
+                batch = _summary(
+                    _timed(lambda: nn.query_knn(queries, k, **query_args), warmup, repeats)
+                )
+                row = dict(
+                    backend=backend,
+                    leaf_size=leaf_size,
+                    eps=eps,
+                    k=k,
+                    recall=recall_at_k(distances, exact),
+                    batch_s=batch,
+                    qps=len(queries) / batch["median"] if batch["median"] > 0 else float("inf"),
+                )
+                logger.info(
+                    f"Recall sweep | backend={backend} | leaf_size={leaf_size} | eps={eps} | "
+                    f"recall={row['recall']:.4f} | qps={row['qps']:.0f}"
+                )
+                rows.append(row)
+    return rows
+
+
+def save_results(report: dict, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_results(baseline: dict, current: dict, tolerance: float = 0.1) -> list[dict]:
+    """
+    Flag timing regressions of `current` against `baseline`.
+
+    Scenarios are matched on SCENARIO_KEYS; scenarios missing from either run
+    are ignored. A metric in GATED_METRICS regresses when it is more than
+    `tolerance` (fractional) slower than the baseline.
+
+    Returns:
+        One dict per regression with the scenario, metric, both values and the ratio.
+    """
+    base = {tuple(r[key] for key in SCENARIO_KEYS): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        scenario = tuple(result[key] for key in SCENARIO_KEYS)
+        if scenario not in base:
+            continue
+        for field, stat in GATED_METRICS:
+            old = base[scenario][field][stat]
+            new = result[field][stat]
+            if old > 0 and new > old * (1 + tolerance):
+                regressions.append(
+                    dict(zip(SCENARIO_KEYS, scenario))
+                    | {
+                        "metric": f"{field}.{stat}",
+                        "baseline": old,
+                        "current": new,
+                        "ratio": new / old,
+                    }
+                )
+    return regressions
@@ -0,0 +1,86 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import numpy as np
+from loguru import logger
+
+
+def points_key(points: np.ndarray) -> str:
+    """
+    Content hash of a point array (shape, dtype and raw bytes).
+    """
+    points = np.ascontiguousarray(points)
+    digest = hashlib.sha256(f"{points.shape}{points.dtype.str}".encode())
+    digest.update(memoryview(points).cast("B"))
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe least-recently-used cache.
+
+    Inserting beyond `max_entries` evicts the least recently used entry, so a
+    cache shared by every Streamlit session holds at most `max_entries`
+    point sets or built indices.
+    """
+
+    def __init__(self, max_entries: int, name: str = "cache"):
+        """
+        Args:
+            max_entries: Maximum number of entries kept
+            name: Label used in log messages
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.name = name
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> tuple[Any, bool]:
+        """
+        Value cached under `key`, calling `factory()` to create it on a miss.
+
+        The factory runs without holding the lock, so a slow build does not
+        block other sessions' lookups; if two sessions miss on the same key
+        at once, the first value stored wins.
+
+        Returns:
+            (value, hit) where `hit` is True if the value was already cached
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key], True
+        value = factory()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key], False
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                logger.info(f"Evicted from {self.name} | key={evicted}")
+        return value, False
+
+    def evict(self, key: Hashable) -> bool:
+        """
+        Drop `key` if cached; returns whether it was present.
+        """
+        with self._lock:
+            if key not in self._entries:
+                return False
+            del self._entries[key]
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
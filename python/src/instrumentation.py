@@ -0,0 +1,310 @@
+import contextlib
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+# Upper edges of the latency buckets in seconds: 1 us doubling up to ~17 s
+LATENCY_BUCKETS_S = 1e-6 * 2.0 ** np.arange(25)
+
+# Upper edges of the batch-size and per-query work buckets: 1 doubling up to ~1.7e7
+COUNT_BUCKETS = 2.0 ** np.arange(25)
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; bucket i counts values in (edges[i - 1], edges[i]],
+    and a final open bucket ("inf" in snapshots) counts values above the last edge.
+    """
+
+    def __init__(self, edges: np.ndarray):
+        self.edges = edges
+        self.counts = np.zeros(len(edges) + 1, dtype=np.int64)
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def observe(self, values) -> None:
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        if len(values) == 0:
+            return
+        self.counts += np.bincount(
+            np.searchsorted(self.edges, values), minlength=len(self.counts)
+        )
+        self.total += float(values.sum())
+        self.max = max(self.max, float(values.max()))
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper edge of the bucket holding the q-quantile (the maximum for the open bucket).
+        """
+        count = self.count
+        if count == 0:
+            return float("nan")
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q * count))
+        return float(self.edges[bucket]) if bucket < len(self.edges) else self.max
+
+    def snapshot(self) -> dict:
+        count = self.count
+        return {
+            "count": count,
+            "sum": self.total,
+            "mean": self.total / count if count else float("nan"),
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": {
+                f"{edge:g}": int(n)
+                for edge, n in zip(np.append(self.edges, np.inf), self.counts)
+                if n
+            },
+        }
+
+
+class Metrics:
+    """
+    Thread-safe store of build phase timings, per-call latencies, batch sizes
+    and native search counters, keyed by backend name (and operation).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.build_phases: dict[str, dict[str, Histogram]] = {}
+            self.latency: dict[tuple[str, str], Histogram] = {}
+            self.batch_sizes: dict[tuple[str, str], Histogram] = {}
+            self.nodes_visited: dict[str, Histogram] = {}
+            self.distance_computations: dict[str, Histogram] = {}
+
+    def observe_phase(self, backend: str, phase: str, seconds: float) -> None:
+        with self._lock:
+            phases = self.build_phases.setdefault(backend, {})
+            phases.setdefault(phase, Histogram(LATENCY_BUCKETS_S)).observe(seconds)
+
+    def observe_call(self, backend: str, op: str, seconds: float, batch_size: int) -> None:
+        with self._lock:
+            key = (backend, op)
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS_S)).observe(seconds)
+            self.batch_sizes.setdefault(key, Histogram(COUNT_BUCKETS)).observe(batch_size)
+
+    def observe_counters(
+        self, backend: str, nodes_visited: np.ndarray, distance_computations: np.ndarray
+    ) -> None:
+        """
+        Record per-query native counters (one value per query in each array).
+        """
+        with self._lock:
+            self.nodes_visited.setdefault(backend, Histogram(COUNT_BUCKETS)).observe(
+                nodes_visited
+            )
+            self.distance_computations.setdefault(backend, Histogram(COUNT_BUCKETS)).observe(
+                distance_computations
+            )
+
+    def snapshot(self) -> dict:
+        """
+        Plain-dict copy of every metric, keyed by backend; safe to serialise or log.
+        """
+        with self._lock:
+            backends: dict[str, dict] = {}
+
+            def entry(backend: str) -> dict:
+                return backends.setdefault(
+                    backend, {"build_phases_s": {}, "calls": {}, "native": {}}
+                )
+
+            for backend, phases in self.build_phases.items():
+                entry(backend)["build_phases_s"] = {
+                    phase: hist.snapshot() for phase, hist in phases.items()
+                }
+            for (backend, op), hist in self.latency.items():
+                entry(backend)["calls"][op] = {
+                    "latency_s": hist.snapshot(),
+                    "batch_size": self.batch_sizes[(backend, op)].snapshot(),
+                }
+            for backend, hist in self.nodes_visited.items():
+                entry(backend)["native"] = {
+                    "nodes_visited": hist.snapshot(),
+                    "distance_computations": self.distance_computations[backend].snapshot(),
+                }
+            return {"enabled": _config["enabled"], "backends": backends}
+
+
+METRICS = Metrics()
+
+_config = {"enabled": False, "native_counters": False, "slow_call_s": None}
+
+
+def enable(native_counters: bool = False, slow_call_s: Optional[float] = None) -> None:
+    """
+    Start recording metrics for backends built (or passed to `instrument`) from now on.
+
+    Args:
+        native_counters: Route k-NN queries of backends with the "counters"
+            capability through their instrumented native search, recording
+            nodes visited and leaf distance computations per query
+        slow_call_s: Calls at least this slow are logged at WARNING with their
+            batch size and counters; None logs every call at TRACE only
+    """
+    _config.update(enabled=True, native_counters=native_counters, slow_call_s=slow_call_s)
+    logger.info(
+        f"Instrumentation enabled | native_counters={native_counters} | slow_call_s={slow_call_s}"
+    )
+
+
+def disable() -> None:
+    """
+    Stop recording. Backends built afterwards are returned unwrapped; existing
+    wrappers stop recording. Recorded metrics are kept until `reset`.
+    """
+    _config["enabled"] = False
+    logger.info("Instrumentation disabled")
+
+
+def is_enabled() -> bool:
+    return _config["enabled"]
+
+
+def snapshot() -> dict:
+    return METRICS.snapshot()
+
+
+def reset() -> None:
+    METRICS.reset()
+
+
+class _PhaseTimer:
+    def __init__(self, backend: str, phase: str):
+        self.backend = backend
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        METRICS.observe_phase(self.backend, self.phase, elapsed)
+        logger.bind(
+            event="nn_build_phase", backend=self.backend, phase=self.phase, seconds=elapsed
+        ).trace(f"Build phase | backend={self.backend} | phase={self.phase} | {elapsed:.6f}s")
+
+
+def build_phase(backend: str, phase: str):
+    """
+    Context manager timing one phase of an index build; a shared no-op when disabled.
+    """
+    return _PhaseTimer(backend, phase) if _config["enabled"] else _NULL_CONTEXT
+
+
+def instrument(backend):
+    """
+    Wrap `backend` in an InstrumentedBackend if instrumentation is enabled;
+    otherwise return it unchanged, so disabled instrumentation adds nothing to
+    the query path. Already wrapped backends are returned as they are.
+    """
+    if not _config["enabled"] or isinstance(backend, InstrumentedBackend):
+        return backend
+    return InstrumentedBackend(backend)
+
+
+class InstrumentedBackend:
+    """
+    Proxy for an NNBackend that records the latency and batch size of every
+    query call (and native search counters when enabled) in METRICS, and emits
+    a structured loguru event per call.
+
+    Attributes other than the query methods are forwarded to the wrapped backend.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        self.capabilities = backend.capabilities
+
+    def __getattr__(self, attr):
+        return getattr(self.backend, attr)
+
+    def _record(
+        self,
+        op: str,
+        start: float,
+        batch_size: int,
+        nodes_visited: Optional[np.ndarray] = None,
+        distance_computations: Optional[np.ndarray] = None,
+    ) -> None:
+        elapsed = time.perf_counter() - start
+        if not _config["enabled"]:
+            return
+        METRICS.observe_call(self.name, op, elapsed, batch_size)
+        fields = dict(
+            event="nn_query", backend=self.name, op=op, batch_size=batch_size, seconds=elapsed
+        )
+        if nodes_visited is not None:
+            METRICS.observe_counters(self.name, nodes_visited, distance_computations)
+            fields.update(
+                nodes_visited=int(nodes_visited.sum()),
+                max_nodes_visited=int(nodes_visited.max(initial=0)),
+                distance_computations=int(distance_computations.sum()),
+            )
+        message = (
+            f"{op} | backend={self.name} | batch={batch_size} | {elapsed * 1e6:.1f}us"
+        )
+        slow = _config["slow_call_s"]
+        if slow is not None and elapsed >= slow:
+            logger.bind(**fields).warning(f"Slow {message}")
+        else:
+            logger.bind(**fields).trace(message)
+
+    def _profiled(self) -> bool:
+        return _config["native_counters"] and "counters" in self.capabilities
+
+    def query(self, point, *args, **kwargs):
+        start = time.perf_counter()
+        result = self.backend.query(point, *args, **kwargs)
+        self._record("query", start, 1)
+        return result
+
+    def query_batch(self, queries, *args, **kwargs):
+        start = time.perf_counter()
+        if self._profiled():
+            indices, distances, nodes, computed = self.backend.query_knn_profiled(
+                queries, 1, *args, **kwargs
+            )
+            self._record("query_batch", start, len(queries), nodes, computed)
+            return indices.reshape(-1), distances.reshape(-1)
+        result = self.backend.query_batch(queries, *args, **kwargs)
+        self._record("query_batch", start, len(queries))
+        return result
+
+    def query_knn(self, queries, k, *args, **kwargs):
+        start = time.perf_counter()
+        if self._profiled():
+            indices, distances, nodes, computed = self.backend.query_knn_profiled(
+                queries, k, *args, **kwargs
+            )
+            self._record("query_knn", start, len(queries), nodes, computed)
+            return indices, distances
+        result = self.backend.query_knn(queries, k, *args, **kwargs)
+        self._record("query_knn", start, len(queries))
+        return result
+
+    def query_radius(self, queries, radius, *args, **kwargs):
+        start = time.perf_counter()
+        result = self.backend.query_radius(queries, radius, *args, **kwargs)
+        self._record("query_radius", start, len(queries))
+        return result
+
+    def memory_usage(self) -> int:
+        return self.backend.memory_usage()
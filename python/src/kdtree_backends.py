@@ -1,19 +1,523 @@
+import functools
+import hashlib
+import importlib
+import importlib.util
+import subprocess
+import sys
+import time
+from typing import Protocol, runtime_checkable
+
 import numpy as np
-from sklearn.neighbors import KDTree
+from loguru import logger
+
+from .instrumentation import build_phase, instrument
+
+# Compiled extensions (kd_tree_cpp, cgal_kdtree_cpp) are built here by CMake
+BUILD_DIR = "build"
+
+
+@runtime_checkable
+class NNBackend(Protocol):
+    """
+    Interface shared by all nearest neighbour backends.
+
+    A backend is built by calling its class with an (N, 2) array of points.
+    Index arrays are int64 and padded with -1, distances are float64 and
+    padded with NaN. `memory_usage` reports the bytes of point storage plus
+    index structures held by the backend.
+
+    `capabilities` lists the optional features a backend has:
+        exact: query results are the true nearest neighbours
+        approximate: k-NN results may miss true neighbours
+        radius: `query_radius` returns CSR neighbours within a radius
+        threads: batch queries take `n_threads` (0 = all cores)
+        persistent: the index can be saved and reloaded without rebuilding
+        dynamic: points can be added and removed after the build
+        counters: `query_knn_profiled` reports per-query native search work
+        eps: query methods take an `eps` approximation factor (0 = exact)
+        all_knn: `all_nearest_neighbours(k)` returns the k nearest other
+            indexed points of every indexed point
+    """
+
+    name: str
+    capabilities: frozenset[str]
+
+    def query(self, point: np.ndarray) -> tuple[int, float]: ...
+
+    def query_batch(self, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]: ...
+
+    def query_knn(
+        self, queries: np.ndarray, k: int
+    ) -> tuple[np.ndarray, np.ndarray]: ...
+
+    def memory_usage(self) -> int: ...
+
+
+_REGISTRY: dict[str, type] = {}
+
+
+def register_backend(cls: type) -> type:
+    """
+    Class decorator adding a backend to the registry under `cls.name`.
+    """
+    _REGISTRY[cls.name] = cls
+    return cls
+
+
+def _module_available(module: str) -> bool:
+    """
+    Whether `module` can be imported, checked without importing it.
+    """
+    if BUILD_DIR not in sys.path:
+        sys.path.append(BUILD_DIR)
+    return importlib.util.find_spec(module) is not None
+
+
+def _import_extension(module: str):
+    """
+    Import a compiled extension from BUILD_DIR the first time a backend needs it.
+    """
+    if BUILD_DIR not in sys.path:
+        sys.path.append(BUILD_DIR)
+    return importlib.import_module(module)
+
+
+def backend_names() -> list[str]:
+    """
+    Names of all registered backends, available or not.
+    """
+    return list(_REGISTRY)
+
+
+def available_backends() -> list[str]:
+    """
+    Names of the registered backends whose library or extension is installed
+    and, for backends defining an `available()` classmethod, usable (e.g.
+    DuckDB's vss extension loads).
+    """
+    return [
+        name
+        for name, cls in _REGISTRY.items()
+        if _module_available(cls.requires) and getattr(cls, "available", lambda: True)()
+    ]
+
+
+def get_backend(name: str) -> type:
+    """
+    Backend class registered under `name`.
+
+    Raises:
+        ValueError: If no backend has that name.
+    """
+    try:
+        return _REGISTRY[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown backend {name!r}; expected one of {backend_names()}"
+        ) from None
+
+
+def create_backend(name: str, points: np.ndarray, **options) -> NNBackend:
+    """
+    Build the backend registered under `name` over `points`.
+
+    The backend's library is imported here, on first use, not when this
+    module is imported. While instrumentation is enabled the build time is
+    recorded and the backend is returned wrapped (see instrumentation.instrument).
+    """
+    cls = get_backend(name)
+    start = time.perf_counter()
+    with build_phase(name, "total"):
+        backend = cls(points, **options)
+    logger.info(
+        f"Built backend | name={name} | points={len(points)} | "
+        f"build={time.perf_counter() - start:.4f}s"
+    )
+    return instrument(backend)
+
+
+def _empty_knn(num_queries: int, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Allocate (M, k) index/distance arrays filled with the -1 / NaN padding values.
+    """
+    if k < 1:
+        raise ValueError("k must be at least 1")
+    return (
+        np.full((num_queries, k), -1, dtype=np.int64),
+        np.full((num_queries, k), np.nan),
+    )
+
+
+def _to_csr(
+    index_lists, distance_lists
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pack per-query neighbour arrays into CSR (offsets[M + 1], indices, distances).
+    """
+    counts = np.fromiter((len(ind) for ind in index_lists), dtype=np.int64)
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    if offsets[-1] == 0:
+        return offsets, np.empty(0, dtype=np.int64), np.empty(0)
+    return (
+        offsets,
+        np.concatenate(index_lists).astype(np.int64, copy=False),
+        np.concatenate(distance_lists).astype(np.float64, copy=False),
+    )
+
+
+@register_backend
+class KDTree2D_CPP:
+    """
+    nanoflann kd-tree from the kd_tree_cpp extension (GIL-free, multi-threaded batches).
+
+    Exact by default. Built with `eps` > 0 it answers queries approximately
+    (each neighbour at most (1 + eps) times farther than the true one) and
+    reports the "approximate" capability instead of "exact"; query methods
+    also take a per-call `eps` overriding the backend's.
+
+    float32 input is stored and indexed as float32 (half the point memory);
+    anything else as float64. Queries are always float64 and are rounded to
+    the storage precision; distances are computed and returned in float64.
+
+    With `curve="morton"` or `"hilbert"` the tree stores its own copy of the
+    points in that space-filling-curve order, so nearby points share cache
+    lines, and searches large k-NN batches along the same curve. Results
+    still refer to input rows.
+    """
+
+    name = "nanoflann"
+    requires = "kd_tree_cpp"
+    capabilities = frozenset(
+        {"exact", "radius", "threads", "persistent", "counters", "eps", "all_knn"}
+    )
+
+    def __init__(
+        self,
+        points: np.ndarray,
+        leaf_size: int = 10,
+        eps: float = 0.0,
+        dtype: np.dtype | str | None = None,
+        curve: str = "none",
+    ):
+        """
+        Args:
+            points: (N, 2) numpy array of input points
+            leaf_size: Maximum points per tree leaf
+            eps: Default search approximation factor (0 = exact)
+            dtype: Storage precision, float32 or float64; None follows `points`
+                (float32 arrays stay float32, anything else is float64)
+            curve: Space-filling curve to store the points in: "none",
+                "morton" or "hilbert"
+        """
+        kd_tree_cpp = _import_extension(self.requires)
+        dtype = self._storage_dtype(points, dtype)
+        cloud_cls, tree_cls = self._classes(kd_tree_cpp, dtype)
+        # The C++ PointCloud borrows the array buffer directly (no per-point objects)
+        with build_phase(self.name, "points"):
+            cloud = cloud_cls(np.ascontiguousarray(points, dtype=dtype))
+        with build_phase(self.name, "index"):
+            self.tree = tree_cls(cloud, leaf_size=leaf_size, curve=curve)
+        # A reordered tree holds its own copy, so the borrowed input can be released
+        self.cloud = self.tree.cloud
+        self._set_eps(eps)
+
+    @staticmethod
+    def _storage_dtype(points: np.ndarray, dtype) -> np.dtype:
+        if dtype is None:
+            dtype = np.float32 if np.asarray(points).dtype == np.float32 else np.float64
+        dtype = np.dtype(dtype)
+        if dtype not in (np.float32, np.float64):
+            raise ValueError(f"dtype must be float32 or float64, got {dtype}")
+        return dtype
+
+    @staticmethod
+    def _classes(kd_tree_cpp, dtype: np.dtype) -> tuple[type, type]:
+        if dtype == np.float32:
+            return kd_tree_cpp.PointCloudFloat32, kd_tree_cpp.KDTree2DFloat32
+        return kd_tree_cpp.PointCloud, kd_tree_cpp.KDTree2D
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.tree.dtype
+
+    @property
+    def curve(self) -> str:
+        return self.tree.curve
+
+    def _set_eps(self, eps: float):
+        if eps < 0:
+            raise ValueError("eps must be non-negative")
+        self.eps = float(eps)
+        if self.eps > 0:
+            self.capabilities = type(self).capabilities - {"exact"} | {"approximate"}
+
+    def _eps(self, eps: float | None) -> float:
+        return self.eps if eps is None else eps
+
+    def save(self, path: str):
+        """
+        Write the built index to `path` and the points to `path + ".npy"`.
+        """
+        self.tree.save(str(path))
+
+    @classmethod
+    def load(cls, path: str, eps: float = 0.0) -> "KDTree2D_CPP":
+        """
+        Load an index written by `save` without rebuilding it.
+
+        The points are memory-mapped read-only, so processes loading the same
+        file share one page-cached copy instead of each holding their own.
+        The leaf size, storage dtype and curve order are stored with the
+        index; `eps` is a query setting and is not.
+        """
+        kd_tree_cpp = _import_extension(cls.requires)
+        start = time.perf_counter()
+        stored = np.load(f"{path}.npy", mmap_mode="r").dtype
+        _, tree_cls = cls._classes(kd_tree_cpp, stored)
+        backend = cls.__new__(cls)
+        backend.tree = tree_cls.load(str(path))
+        backend.cloud = backend.tree.cloud
+        backend._set_eps(eps)
+        logger.info(
+            f"Loaded nanoflann index | path={path} | points={len(backend.tree)} | "
+            f"load={time.perf_counter() - start:.4f}s"
+        )
+        return backend
+
+    def query(self, point: np.ndarray, eps: float | None = None) -> tuple[int, float]:
+        idx, dist = self.tree.query(float(point[0]), float(point[1]), eps=self._eps(eps))
+        return int(idx), float(dist)
+
+    def query_batch(
+        self, queries: np.ndarray, n_threads: int = 0, eps: float | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest neighbour of every query in one native call (GIL released).
+
+        Args:
+            queries: (M, 2) numpy array
+            n_threads: Number of native threads (0 = all cores)
+            eps: Approximation factor for this call; None uses the backend's
+
+        Returns:
+            (indices[M], distances[M]) arrays
+        """
+        return self.tree.query_batch(
+            np.ascontiguousarray(queries, dtype=np.float64), n_threads, eps=self._eps(eps)
+        )
+
+    def query_knn(
+        self, queries: np.ndarray, k: int, n_threads: int = 0, eps: float | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            (indices[M, k], distances[M, k]) arrays, nearest first
+        """
+        return self.tree.query_knn(
+            np.ascontiguousarray(queries, dtype=np.float64), k, n_threads, eps=self._eps(eps)
+        )
+
+    def query_knn_profiled(
+        self, queries: np.ndarray, k: int, n_threads: int = 0, eps: float | None = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        `query_knn` through the instrumented native search (same results).
+
+        Returns:
+            (indices[M, k], distances[M, k], nodes_visited[M], distance_computations[M])
+        """
+        return self.tree.query_knn_profiled(
+            np.ascontiguousarray(queries, dtype=np.float64), k, n_threads, eps=self._eps(eps)
+        )
+
+    def query_radius(
+        self, queries: np.ndarray, radius: float, n_threads: int = 0
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns:
+            CSR (offsets[M + 1], indices, distances), sorted by distance (always exact)
+        """
+        return self.tree.query_radius(
+            np.ascontiguousarray(queries, dtype=np.float64), radius, n_threads
+        )
+
+    def all_nearest_neighbours(
+        self, k: int = 1, n_threads: int = 0
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        k nearest other points of every indexed point, in one leaf-batched native pass.
+
+        A point is never its own neighbour; duplicates of it are, at distance 0.
+        Always exact, whatever the backend's `eps`.
+
+        Returns:
+            (indices[N, k], distances[N, k]) in input row order, nearest first,
+            padded with -1 / NaN when fewer than k + 1 points are indexed
+        """
+        return self.tree.all_nearest_neighbours(k, n_threads=n_threads)
+
+    def memory_usage(self) -> int:
+        """
+        Bytes of point storage (8 or 16 per point) plus the tree nodes and point permutation.
+        """
+        return int(self.tree.memory_usage())
+
+
+@register_backend
+class DynamicKDTree2D_CPP:
+    """
+    Dynamic nanoflann kd-tree from kd_tree_cpp, for point sets that change between queries.
+
+    Points are addressed by stable external IDs: queries return IDs rather than
+    row positions, and `add_points` / `remove` update the index in amortized
+    O(log^2 N) per point instead of rebuilding it.
+    """
+
+    name = "nanoflann-dynamic"
+    requires = "kd_tree_cpp"
+    capabilities = frozenset({"exact", "radius", "threads", "dynamic"})
+
+    def __init__(
+        self, points: np.ndarray, ids: np.ndarray | None = None, leaf_size: int = 10
+    ):
+        """
+        Args:
+            points: (N, 2) numpy array of input points
+            ids: Optional (N,) integer IDs; defaults to 0..N-1
+            leaf_size: Maximum points per leaf of each tree in the forest
+        """
+        kd_tree_cpp = _import_extension(self.requires)
+        self.tree = kd_tree_cpp.DynamicKDTree2D(
+            np.asarray(points, dtype=np.float64), ids, leaf_size=leaf_size
+        )
+
+    def add_points(self, points: np.ndarray, ids: np.ndarray | None = None) -> np.ndarray:
+        """
+        Insert points and return their IDs (fresh IDs unless `ids` is given).
+
+        Raises:
+            ValueError: If an ID is negative or already present.
+        """
+        return self.tree.add_points(np.asarray(points, dtype=np.float64), ids)
+
+    def remove(self, ids: np.ndarray) -> int:
+        """
+        Remove points by ID; returns how many were present.
+        """
+        return self.tree.remove(np.asarray(ids, dtype=np.int64).ravel())
+
+    def query(self, point: np.ndarray) -> tuple[int, float]:
+        idx, dist = self.tree.query(float(point[0]), float(point[1]))
+        return int(idx), float(dist)
+
+    def query_batch(
+        self, queries: np.ndarray, n_threads: int = 0
+    ) -> tuple[np.ndarray, np.ndarray]:
+        return self.tree.query_batch(np.ascontiguousarray(queries, dtype=np.float64), n_threads)
+
+    def query_knn(
+        self, queries: np.ndarray, k: int, n_threads: int = 0
+    ) -> tuple[np.ndarray, np.ndarray]:
+        return self.tree.query_knn(np.ascontiguousarray(queries, dtype=np.float64), k, n_threads)
+
+    def query_radius(
+        self, queries: np.ndarray, radius: float, n_threads: int = 0
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.tree.query_radius(
+            np.ascontiguousarray(queries, dtype=np.float64), radius, n_threads
+        )
+
+    def memory_usage(self) -> int:
+        """
+        Approximate bytes of point storage, ID tables and the tree forest.
+        """
+        return int(self.tree.memory_usage())
+
+
+@register_backend
+class KDTree2D_CGAL:
+    """
+    CGAL kd-tree from the optional cgal_kdtree_cpp extension.
+    """
 
+    name = "cgal"
+    requires = "cgal_kdtree_cpp"
+    capabilities = frozenset({"exact", "radius", "threads", "counters"})
 
+    def __init__(self, points: np.ndarray):
+        """
+        Args:
+            points: (N, 2) numpy array of input points
+        """
+        cgal_kdtree_cpp = _import_extension(self.requires)
+        with build_phase(self.name, "index"):
+            self.tree = cgal_kdtree_cpp.CGALKDTree2D(
+                np.ascontiguousarray(points, dtype=np.float64)
+            )
+
+    def query(self, point: np.ndarray) -> tuple[int, float]:
+        idx, dist = self.tree.query(float(point[0]), float(point[1]))
+        return int(idx), float(dist)
+
+    def query_batch(
+        self, queries: np.ndarray, n_threads: int = 0
+    ) -> tuple[np.ndarray, np.ndarray]:
+        return self.tree.query_batch(np.ascontiguousarray(queries, dtype=np.float64), n_threads)
+
+    def query_knn(
+        self, queries: np.ndarray, k: int, n_threads: int = 0
+    ) -> tuple[np.ndarray, np.ndarray]:
+        return self.tree.query_knn(np.ascontiguousarray(queries, dtype=np.float64), k, n_threads)
+
+    def query_knn_profiled(
+        self, queries: np.ndarray, k: int, n_threads: int = 0
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        `query_knn` through a counting traversal of the CGAL tree; the counters
+        are the tree nodes entered and the point distances computed.
+
+        Returns:
+            (indices[M, k], distances[M, k], nodes_visited[M], distance_computations[M])
+        """
+        return self.tree.query_knn_profiled(
+            np.ascontiguousarray(queries, dtype=np.float64), k, n_threads
+        )
+
+    def query_radius(
+        self, queries: np.ndarray, radius: float, n_threads: int = 0
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.tree.query_radius(
+            np.ascontiguousarray(queries, dtype=np.float64), radius, n_threads
+        )
+
+    def memory_usage(self) -> int:
+        """
+        Bytes of the tree entries (a 2D point plus its input index each) and its nodes.
+        """
+        return int(self.tree.memory_usage())
+
+
+@register_backend
 class PythonKDTree:
     """
     Standalone Python KDTree nearest neighbour backend for benchmarking.
     """
 
+    name = "sklearn"
+    requires = "sklearn"
+    capabilities = frozenset({"exact", "radius"})
+
     def __init__(self, points: np.ndarray):
         """
         Args:
             points: (N, 2) numpy array of input points
         """
+        from sklearn.neighbors import KDTree
+
         self.points = points
-        self.tree = KDTree(points)
+        with build_phase(self.name, "index"):
+            self.tree = KDTree(points)
 
     def query(self, point: np.ndarray) -> tuple:
         """
@@ -28,7 +532,7 @@ class PythonKDTree:
         dist, ind = self.tree.query([point], k=1)
         return int(ind[0][0]), float(dist[0][0])
 
-    def query_batch(self, queries: np.ndarray) -> list:
+    def query_batch(self, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
         """
         Find nearest neighbours for a batch of query points.
 
@@ -36,46 +540,598 @@ class PythonKDTree:
             queries: (M, 2) numpy array
 
         Returns:
-            List of (index, distance) tuples
+            (indices[M], distances[M]) arrays
+        """
+        indices, distances = self.query_knn(queries, k=1)
+        return indices[:, 0], distances[:, 0]
+
+    def query_knn(
+        self, queries: np.ndarray, k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest neighbours for a batch of query points.
+
+        Args:
+            queries: (M, 2) numpy array
+            k: Number of neighbours per query
+
+        Returns:
+            (indices[M, k], distances[M, k]) arrays, nearest first, padded with
+            -1 / NaN when fewer than k points exist
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 2)
+        indices, distances = _empty_knn(len(queries), k)
+        k_found = min(k, len(self.points))
+        if len(queries) and k_found:
+            dists, inds = self.tree.query(queries, k=k_found)
+            indices[:, :k_found] = inds
+            distances[:, :k_found] = dists
+        return indices, distances
+
+    def query_radius(
+        self, queries: np.ndarray, radius: float
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find all points within a radius of each query point.
+
+        Args:
+            queries: (M, 2) numpy array
+            radius: Search radius (inclusive)
+
+        Returns:
+            CSR (offsets[M + 1], indices, distances); neighbours of query i are
+            indices[offsets[i]:offsets[i + 1]], sorted by distance
+        """
+        if radius < 0:
+            raise ValueError("radius must be non-negative")
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 2)
+        if len(queries) == 0:
+            return _to_csr([], [])
+        inds, dists = self.tree.query_radius(
+            queries, r=radius, return_distance=True, sort_results=True
+        )
+        return _to_csr(inds, dists)
+
+    def memory_usage(self) -> int:
+        """
+        Bytes of the tree's own arrays (copied points, index permutation, node data and bounds).
+        """
+        return int(sum(a.nbytes for a in self.tree.get_arrays()))
+
+
+@register_backend
+class GridNearestNeighbour:
+    """
+    Exact nearest neighbour search on a uniform grid, in pure NumPy.
+
+    Points are bucketed into cells of a grid over their bounding box and
+    stored cell by cell (CSR layout), so building is a single argsort. Batch
+    queries visit growing square blocks of cells around each query's cell,
+    all queries at once, until no unvisited cell can hold anything closer.
+    For near-uniform points this is expected O(1) per query. Skewed point
+    sets, where a few cells hold most of the points, fall back to PythonKDTree.
+    """
+
+    name = "grid"
+    requires = "numpy"
+    capabilities = frozenset({"exact"})
+
+    def __init__(
+        self,
+        points: np.ndarray,
+        points_per_cell: float = 2.0,
+        skew_threshold: float = 32.0,
+        max_rings: int = 8,
+    ):
+        """
+        Args:
+            points: (N, 2) numpy array of input points
+            points_per_cell: Target mean cell occupancy used to size the grid
+            skew_threshold: Fall back to PythonKDTree when the fullest cell holds
+                more than this multiple of the mean occupancy
+            max_rings: Queries still unresolved after this many rings of cells
+                (far outside the bounding box or in sparse regions) are
+                answered by the PythonKDTree fallback
+        """
+        self.points = np.ascontiguousarray(points, dtype=np.float64).reshape(-1, 2)
+        self.max_rings = max_rings
+        self.fallback = None
+        n = len(self.points)
+        self.origin = self.points.min(axis=0) if n else np.zeros(2)
+        extent = (self.points.max(axis=0) - self.origin) if n else np.zeros(2)
+        self.shape = self._grid_shape(extent, max(1, int(n / points_per_cell)))
+        self.cell_size = np.where(self.shape > 1, extent / self.shape, 0.0)
+
+        with build_phase(self.name, "bin"):
+            cells = self._cell_ids(*self._cell_coords(self.points))
+            self.order = np.argsort(cells, kind="stable")
+            self.sorted_points = self.points[self.order]
+            counts = np.bincount(cells, minlength=int(self.shape.prod()))
+            self.cell_start = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=self.cell_start[1:])
+
+        self.skewed = bool(n and counts.max() > skew_threshold * max(1.0, n / len(counts)))
+        if self.skewed:
+            logger.warning(
+                f"Grid backend: skewed points (fullest cell {counts.max()} of {n}), "
+                "falling back to PythonKDTree"
+            )
+            self._fallback_tree()
+
+    @staticmethod
+    def _grid_shape(extent: np.ndarray, num_cells: int) -> np.ndarray:
+        # Cells as close to square as the bounding box allows
+        if extent.min() > 0:
+            nx = int(np.clip(round(np.sqrt(num_cells * extent[0] / extent[1])), 1, num_cells))
+            return np.array([nx, max(1, num_cells // nx)])
+        if extent.max() > 0:
+            return np.where(extent > 0, num_cells, 1)
+        return np.array([1, 1])
+
+    def _fallback_tree(self) -> "PythonKDTree":
+        if self.fallback is None:
+            self.fallback = PythonKDTree(self.points)
+        return self.fallback
+
+    def _cell_coords(self, xy: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # Queries outside the bounding box are clamped onto the border cells
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scaled = np.where(self.cell_size > 0, (xy - self.origin) / self.cell_size, 0.0)
+        cell = np.clip(np.floor(scaled), 0, self.shape - 1).astype(np.int64)
+        return cell[:, 0], cell[:, 1]
+
+    def _cell_ids(self, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        return cy * self.shape[0] + cx
+
+    @staticmethod
+    def _ring_offsets(r: int) -> np.ndarray:
+        """
+        (dx, dy) offsets of the cells at Chebyshev distance exactly r.
+        """
+        if r == 0:
+            return np.zeros((1, 2), dtype=np.int64)
+        side = np.arange(-r, r + 1)
+        inner = np.arange(-r + 1, r)
+        return np.concatenate(
+            [
+                np.column_stack([side, np.full_like(side, -r)]),
+                np.column_stack([side, np.full_like(side, r)]),
+                np.column_stack([np.full_like(inner, -r), inner]),
+                np.column_stack([np.full_like(inner, r), inner]),
+            ]
+        )
+
+    def _unvisited_distance(self, queries: np.ndarray, cx, cy, r: int) -> np.ndarray:
+        """
+        Lower bound on the distance from each query to any cell outside the
+        (2r + 1)^2 block around its cell. Block sides on the grid border are
+        closed, so a query clamped onto the border is bounded correctly.
+        """
+        bound = np.full(len(queries), np.inf)
+        for axis, c in enumerate((cx, cy)):
+            low_edge = self.origin[axis] + (c - r) * self.cell_size[axis]
+            high_edge = self.origin[axis] + (c + r + 1) * self.cell_size[axis]
+            bound = np.where(c - r > 0, np.minimum(bound, queries[:, axis] - low_edge), bound)
+            bound = np.where(
+                c + r < self.shape[axis] - 1,
+                np.minimum(bound, high_edge - queries[:, axis]),
+                bound,
+            )
+        return bound
+
+    def _visit(self, queries, cx, cy, offsets, best_idx, best_d2):
+        """
+        Fold the points of the cells at `offsets` from each query's cell into
+        its k best, held as (A, k) index / squared distance arrays with -1 / inf
+        padding.
+        """
+        k = best_idx.shape[1]
+        ox = cx[:, None] + offsets[:, 0]
+        oy = cy[:, None] + offsets[:, 1]
+        valid = (ox >= 0) & (ox < self.shape[0]) & (oy >= 0) & (oy < self.shape[1])
+        cell_rows = np.broadcast_to(np.arange(len(queries))[:, None], ox.shape)[valid]
+        cells = self._cell_ids(ox[valid], oy[valid])
+        starts = self.cell_start[cells]
+        counts = self.cell_start[cells + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return best_idx, best_d2
+        # Expand each visited cell into the positions of its points; rows stay contiguous
+        rows = np.repeat(cell_rows, counts)
+        ends = np.cumsum(counts)
+        pos = np.arange(total) - np.repeat(ends - counts, counts) + np.repeat(starts, counts)
+        delta = self.sorted_points[pos] - queries[rows]
+        d2 = np.einsum("ij,ij->i", delta, delta)
+        row_counts = np.bincount(rows, minlength=len(queries))
+        row_start = np.cumsum(row_counts) - row_counts
+
+        if k == 1:
+            # Segmented argmin over each row's contiguous run of candidates
+            hit_rows = np.flatnonzero(row_counts)
+            mins = np.minimum.reduceat(d2, row_start[hit_rows])
+            at_min = np.flatnonzero(d2 == np.repeat(mins, row_counts[hit_rows]))
+            first = at_min[np.r_[True, rows[at_min[1:]] != rows[at_min[:-1]]]]
+            better = mins < best_d2[hit_rows, 0]
+            best_idx[hit_rows[better], 0] = self.order[pos[first[better]]]
+            best_d2[hit_rows[better], 0] = mins[better]
+            return best_idx, best_d2
+
+        col = np.arange(total) - np.repeat(row_start, row_counts)
+        width = k + int(row_counts.max())
+        cand_idx = np.full((len(queries), width), -1, dtype=np.int64)
+        cand_d2 = np.full((len(queries), width), np.inf)
+        cand_idx[:, :k] = best_idx
+        cand_d2[:, :k] = best_d2
+        cand_idx[rows, k + col] = self.order[pos]
+        cand_d2[rows, k + col] = d2
+        keep = np.argpartition(cand_d2, k - 1, axis=1)[:, :k]
+        keep = np.take_along_axis(
+            keep, np.argsort(np.take_along_axis(cand_d2, keep, axis=1), axis=1), axis=1
+        )
+        return np.take_along_axis(cand_idx, keep, axis=1), np.take_along_axis(cand_d2, keep, axis=1)
+
+    def query(self, point: np.ndarray) -> tuple[int, float]:
+        indices, distances = self.query_batch(np.asarray(point).reshape(1, 2))
+        return int(indices[0]), float(distances[0])
+
+    def query_batch(self, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest neighbour for a batch of query points.
+
+        Returns:
+            (indices[M], distances[M]) arrays
+        """
+        indices, distances = self.query_knn(queries, k=1)
+        return indices[:, 0], distances[:, 0]
+
+    def query_knn(
+        self, queries: np.ndarray, k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        k nearest neighbours for a batch of query points, by vectorized ring expansion.
+
+        Returns:
+            (indices[M, k], distances[M, k]) arrays, nearest first, padded with
+            -1 / NaN when fewer than k points exist
         """
-        dists, inds = self.tree.query(queries, k=1)
-        return [(int(idx[0]), float(dist[0])) for idx, dist in zip(inds, dists)]
+        if self.skewed:
+            return self.fallback.query_knn(queries, k)
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 2)
+        indices, distances = _empty_knn(len(queries), k)
+        if len(queries) == 0 or len(self.points) == 0:
+            return indices, distances
+        k_found = min(k, len(self.points))
+        cx, cy = self._cell_coords(queries)
+        active = np.arange(len(queries))
+        best_idx = np.full((len(queries), k_found), -1, dtype=np.int64)
+        best_d2 = np.full((len(queries), k_found), np.inf)
+        # The 3x3 block resolves most queries on uniform data in one pass
+        offsets = np.concatenate([self._ring_offsets(0), self._ring_offsets(1)])
+        for r in range(1, int(self.shape.max()) + 1):
+            if r > self.max_rings:
+                fb_idx, fb_dist = self._fallback_tree().query_knn(queries[active], k_found)
+                best_idx[active], best_d2[active] = fb_idx, fb_dist**2
+                break
+            best_idx[active], best_d2[active] = self._visit(
+                queries[active], cx[active], cy[active], offsets, best_idx[active], best_d2[active]
+            )
+            done = best_d2[active, -1] <= self._unvisited_distance(
+                queries[active], cx[active], cy[active], r
+            ) ** 2
+            active = active[~done]
+            if len(active) == 0:
+                break
+            offsets = self._ring_offsets(r + 1)
+        indices[:, :k_found] = best_idx
+        distances[:, :k_found] = np.sqrt(best_d2)
+        return indices, distances
+
+    def memory_usage(self) -> int:
+        """
+        Bytes of the cell-sorted points, their permutation and the cell offsets,
+        plus the PythonKDTree fallback once it has been built.
+        """
+        fallback = self.fallback.memory_usage() if self.fallback is not None else 0
+        return int(
+            self.sorted_points.nbytes + self.order.nbytes + self.cell_start.nbytes + fallback
+        )
+
+
+def _fingerprint(points: np.ndarray) -> str:
+    """
+    Content hash of a point set as stored by DuckDB (shape + float32 coordinates).
+    """
+    coords = np.ascontiguousarray(points, dtype=np.float32)
+    digest = hashlib.sha256(str(coords.shape).encode())
+    digest.update(memoryview(coords).cast("B"))
+    return digest.hexdigest()
+
+
+@functools.cache
+def _duckdb_vss_loads() -> bool:
+    """
+    Whether DuckDB's vss extension installs and loads (it is downloaded on
+    first use, so this fails offline). Checked once per process, in a
+    subprocess so that probing does not import duckdb here.
+    """
+    code = "import duckdb; con = duckdb.connect(); con.execute('INSTALL vss'); con.execute('LOAD vss')"
+    try:
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, timeout=60
+        )
+    except subprocess.TimeoutExpired:
+        logger.warning("DuckDB vss extension probe timed out; duckdb backend unavailable")
+        return False
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1:] or ["unknown error"]
+        logger.warning(f"DuckDB vss extension unavailable; duckdb backend disabled | {error[0]}")
+    return result.returncode == 0
 
 
+@register_backend
 class DuckDBNearestNeighbour:
-    """DuckDB VSS backend."""
+    """
+    DuckDB VSS backend.
 
-    def __init__(self, points: np.ndarray):
+    k-NN queries served by the HNSW index are approximate: HNSW is a graph
+    search that can miss true neighbours, and DuckDB exposes no per-query
+    knob to trade speed for recall. Coordinates are also stored as float32.
+    Measure its recall against an exact backend with
+    benchmark_suite.recall_qps_sweep.
+    """
+
+    name = "duckdb"
+    requires = "duckdb"
+    capabilities = frozenset({"approximate", "radius", "persistent"})
+
+    @classmethod
+    def available(cls) -> bool:
+        return _duckdb_vss_loads()
+
+    def __init__(self, points: np.ndarray, database: str = ":memory:"):
+        """
+        Args:
+            points: (N, dim) numpy array of input points
+            database: DuckDB database path. With a file path the table and its
+                HNSW index are persisted (experimental VSS persistence) and
+                reused on later runs when the stored data fingerprint matches.
+        """
         import duckdb
 
         self.points = points
         self.dim = points.shape[1]
-        self.con = duckdb.connect(database=":memory:")
-        self._setup_table()
-        self._create_index()
+        self.database = database
+        self.con = duckdb.connect(database=database)
+        self.fingerprint = _fingerprint(points)
+        self.timings = {"load": 0.0, "index": 0.0}
 
-    def _setup_table(self):
-        self.con.execute(f"CREATE TABLE points (id INTEGER, vec FLOAT[{self.dim}])")
-        data = [
-            (i, [float(x) for x in self.points[i]]) for i in range(len(self.points))
-        ]
-        self.con.executemany("INSERT INTO points VALUES (?, ?)", data)
+        self._load_extension()
+        self.reused = database != ":memory:" and self._stored_fingerprint() == self.fingerprint
+        if self.reused:
+            logger.info(
+                f"DuckDB backend reusing persisted index | database={database} | points={len(points)}"
+            )
+            return
 
-    def _create_index(self):
+        start = time.perf_counter()
+        with build_phase(self.name, "load"):
+            self._setup_table()
+        self.timings["load"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with build_phase(self.name, "index"):
+            self._create_index()
+        self.timings["index"] = time.perf_counter() - start
+        self._store_fingerprint()
+        logger.info(
+            f"DuckDB backend ready | points={len(points)} | "
+            f"load={self.timings['load']:.4f}s | index={self.timings['index']:.4f}s"
+        )
+
+    def close(self):
+        self.con.close()
+
+    def memory_usage(self) -> int:
+        """
+        Bytes held by the DuckDB buffer manager (table and HNSW index).
+        """
+        return int(
+            self.con.execute("SELECT sum(memory_usage_bytes) FROM duckdb_memory()").fetchone()[0]
+        )
+
+    def _create_vector_table(
+        self, table: str, id_column: str, coords: np.ndarray, temp: bool = False
+    ):
+        """
+        Create `table(id_column, vec FLOAT[dim])` from an (N, dim) array in one statement.
+
+        The coordinates are registered as NumPy columns, which DuckDB scans
+        without per-row Python objects.
+        """
+        coords = np.asarray(coords, dtype=np.float32).reshape(-1, self.dim)
+        columns = {id_column: np.arange(len(coords), dtype=np.int32)}
+        columns.update({f"c{d}": np.ascontiguousarray(coords[:, d]) for d in range(self.dim)})
+        vec = ", ".join(f"c{d}" for d in range(self.dim))
+        self.con.register(f"{table}_input", columns)
+        try:
+            self.con.execute(
+                f"CREATE OR REPLACE {'TEMP ' if temp else ''}TABLE {table} AS "
+                f"SELECT {id_column}, [{vec}]::FLOAT[{self.dim}] AS vec FROM {table}_input"
+            )
+        finally:
+            self.con.unregister(f"{table}_input")
+
+    def _load_extension(self):
         self.con.execute("INSTALL vss")
         self.con.execute("LOAD vss")
+        if self.database != ":memory:":
+            self.con.execute("SET hnsw_enable_experimental_persistence = true")
+
+    def _stored_fingerprint(self):
+        """
+        Fingerprint of the persisted point set, or None if there is no complete
+        table + HNSW index from an earlier run.
+        """
+        has_index = self.con.execute(
+            "SELECT count(*) FROM duckdb_indexes() "
+            "WHERE index_name = 'idx_vec' AND table_name = 'points'"
+        ).fetchone()[0]
+        has_metadata = self.con.execute(
+            "SELECT count(*) FROM duckdb_tables() WHERE table_name = 'nn_metadata'"
+        ).fetchone()[0]
+        if not (has_index and has_metadata):
+            return None
+        row = self.con.execute(
+            "SELECT value FROM nn_metadata WHERE key = 'fingerprint'"
+        ).fetchone()
+        return row[0] if row else None
+
+    def _store_fingerprint(self):
+        # Written only after the index exists, so an interrupted build is redone
+        if self.database == ":memory:":
+            return
+        self.con.execute(
+            "CREATE OR REPLACE TABLE nn_metadata (key VARCHAR PRIMARY KEY, value VARCHAR)"
+        )
+        self.con.execute(
+            "INSERT INTO nn_metadata VALUES ('fingerprint', ?)", [self.fingerprint]
+        )
+        self.con.execute("CHECKPOINT")
+
+    def _setup_table(self):
+        # Dropping the table also drops a stale HNSW index from an earlier run
+        self.con.execute("DROP TABLE IF EXISTS points")
+        self._create_vector_table("points", "id", self.points)
+
+    def _create_index(self):
         self.con.execute("CREATE INDEX idx_vec ON points USING HNSW(vec)")
 
-    def query(self, point: np.ndarray):
-        query_vec_str = f"ARRAY{[float(x) for x in point]}"
-        sql = f"""
-            SELECT id, array_distance(vec, {query_vec_str}::FLOAT[{self.dim}]) AS distance
+    def _knn_prepared(self, point: np.ndarray, k: int) -> list:
+        # Bound parameters keep the statement text constant; the planner still
+        # rewrites ORDER BY distance LIMIT k into an HNSW index scan
+        return self.con.execute(
+            f"""
+            SELECT id, array_distance(vec, ?::FLOAT[{self.dim}]) AS distance
             FROM points
             ORDER BY distance
-            LIMIT 1
-        """
-        idx, dist = self.con.execute(sql).fetchone()
+            LIMIT ?
+            """,
+            [[float(x) for x in point], int(k)],
+        ).fetchall()
+
+    def query(self, point: np.ndarray):
+        rows = self._knn_prepared(point, 1)
+        # An empty table has no neighbour; match the -1 / NaN padding of the other backends
+        if not rows:
+            return -1, float("nan")
+        idx, dist = rows[0]
         return int(idx), float(dist)
 
+    def query_batch(
+        self, queries: np.ndarray, strategy: str = "lateral"
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest neighbour for a batch of query points.
+
+        Returns:
+            (indices[M], distances[M]) arrays
+        """
+        indices, distances = self.query_knn(queries, k=1, strategy=strategy)
+        return indices[:, 0], distances[:, 0]
+
     def query_parallel(self, queries: np.ndarray):
-        return [self.query(q) for q in queries]
+        indices, distances = self.query_batch(queries)
+        return list(zip(indices.tolist(), distances.tolist()))
+
+    def query_knn(
+        self, queries: np.ndarray, k: int, strategy: str = "lateral"
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        k nearest neighbours for a batch of query points.
+
+        Args:
+            queries: (M, dim) numpy array
+            k: Number of neighbours per query
+            strategy: "lateral" loads the queries into a temporary table and
+                resolves them all in one set-based LATERAL join; "prepared"
+                runs one bound-parameter statement per query. Whether the
+                lateral join is served by the HNSW index (approximate) or a
+                parallel exact scan depends on the VSS version's optimizer,
+                while "prepared" always uses the HNSW index.
+
+        Returns:
+            (indices[M, k], distances[M, k]) arrays, nearest first, padded with
+            -1 / NaN when fewer than k points exist
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, self.dim)
+        indices, distances = _empty_knn(len(queries), k)
+        if len(queries) == 0:
+            return indices, distances
+        if strategy == "prepared":
+            for i, q in enumerate(queries):
+                for j, (idx, dist) in enumerate(self._knn_prepared(q, k)):
+                    indices[i, j] = idx
+                    distances[i, j] = dist
+            return indices, distances
+        if strategy != "lateral":
+            raise ValueError(f"Unknown strategy: {strategy!r}")
+
+        self._create_vector_table("nn_queries", "qid", queries, temp=True)
+        try:
+            columns = self.con.execute(
+                f"""
+                SELECT q.qid, nn.id, nn.distance
+                FROM nn_queries q, LATERAL (
+                    SELECT p.id, array_distance(p.vec, q.vec) AS distance
+                    FROM points p
+                    ORDER BY array_distance(p.vec, q.vec)
+                    LIMIT {int(k)}
+                ) nn
+                ORDER BY q.qid, nn.distance
+                """
+            ).fetchnumpy()
+        finally:
+            self.con.execute("DROP TABLE IF EXISTS nn_queries")
+        qid = columns["qid"].astype(np.int64)
+        offsets = np.zeros(len(queries) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(qid, minlength=len(queries)), out=offsets[1:])
+        rank = np.arange(len(qid)) - offsets[qid]
+        indices[qid, rank] = columns["id"]
+        distances[qid, rank] = columns["distance"]
+        return indices, distances
+
+    def query_radius(
+        self, queries: np.ndarray, radius: float
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        All points within a radius of each query point (set-based join, exact).
+
+        Returns:
+            CSR (offsets[M + 1], indices, distances), sorted by distance
+        """
+        if radius < 0:
+            raise ValueError("radius must be non-negative")
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, self.dim)
+        self._create_vector_table("nn_queries", "qid", queries, temp=True)
+        try:
+            columns = self.con.execute(
+                """
+                SELECT q.qid, p.id, array_distance(p.vec, q.vec) AS distance
+                FROM nn_queries q
+                JOIN points p ON array_distance(p.vec, q.vec) <= ?
+                ORDER BY q.qid, distance
+                """,
+                [float(radius)],
+            ).fetchnumpy()
+        finally:
+            self.con.execute("DROP TABLE IF EXISTS nn_queries")
+        offsets = np.zeros(len(queries) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(columns["qid"].astype(np.int64), minlength=len(queries)),
+            out=offsets[1:],
+        )
+        return (
+            offsets,
+            columns["id"].astype(np.int64),
+            columns["distance"].astype(np.float64),
+        )
@@ -0,0 +1,167 @@
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+Range = Tuple[float, float]
+
+DISTRIBUTIONS = ("uniform", "disk", "gaussian", "clustered", "power_law", "line")
+
+
+class PointGenerator:
+    """
+    Vectorized generator of 2D test point sets.
+
+    Every distribution is drawn with whole-array NumPy calls (no per-point
+    loops or rejection sampling). `chunks` streams a point set in fixed-size
+    pieces so datasets larger than memory can be written straight to disk.
+    """
+
+    def __init__(self, seed: Optional[int | np.random.SeedSequence] = None):
+        """
+        Args:
+            seed: Integer seed or SeedSequence; None draws fresh entropy.
+        """
+        self.seed_seq = (
+            seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        )
+        self.rng = np.random.default_rng(self.seed_seq)
+
+    def uniform(
+        self, num_points: int, x_range: Range = (0.0, 1.0), y_range: Range = (0.0, 1.0)
+    ) -> np.ndarray:
+        """
+        Points uniform in the rectangle x_range x y_range.
+        """
+        low = np.array([x_range[0], y_range[0]])
+        high = np.array([x_range[1], y_range[1]])
+        return self.rng.uniform(low, high, size=(num_points, 2))
+
+    def disk(
+        self, num_points: int, center: Tuple[float, float] = (0.0, 0.0), radius: float = 1.0
+    ) -> np.ndarray:
+        """
+        Points uniform in a disk, by inverse-CDF sampling of the radius (r = R sqrt(u)).
+        """
+        r = radius * np.sqrt(self.rng.random(num_points))
+        theta = self.rng.uniform(0.0, 2 * np.pi, num_points)
+        return np.column_stack((center[0] + r * np.cos(theta), center[1] + r * np.sin(theta)))
+
+    def gaussian(
+        self, num_points: int, mean: Tuple[float, float] = (0.0, 0.0), std: float = 1.0
+    ) -> np.ndarray:
+        """
+        Isotropic normal points around `mean`.
+        """
+        return self.rng.normal(mean, std, size=(num_points, 2))
+
+    def clustered(
+        self,
+        num_points: int,
+        centers: Optional[np.ndarray] = None,
+        num_clusters: int = 3,
+        spread: float = 0.07,
+        x_range: Range = (0.0, 1.0),
+        y_range: Range = (0.0, 1.0),
+    ) -> np.ndarray:
+        """
+        Gaussian blobs of standard deviation `spread` around cluster centres.
+
+        Args:
+            centers: (C, 2) cluster centres; drawn uniformly in the ranges when None.
+            num_clusters: Number of centres to draw when `centers` is None.
+        """
+        if centers is None:
+            centers = self.uniform(num_clusters, x_range, y_range)
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        labels = self.rng.integers(len(centers), size=num_points)
+        return centers[labels] + self.rng.normal(0.0, spread, size=(num_points, 2))
+
+    def power_law(
+        self,
+        num_points: int,
+        exponent: float = 3.0,
+        x_range: Range = (0.0, 1.0),
+        y_range: Range = (0.0, 1.0),
+    ) -> np.ndarray:
+        """
+        Points in the rectangle with density piling up towards its lower-left corner.
+
+        Each coordinate is low + (high - low) * u**exponent, so exponent 1 is
+        uniform and larger exponents are increasingly skewed.
+        """
+        low = np.array([x_range[0], y_range[0]])
+        high = np.array([x_range[1], y_range[1]])
+        return low + (high - low) * self.rng.random((num_points, 2)) ** exponent
+
+    def line(
+        self,
+        num_points: int,
+        start: Tuple[float, float] = (0.0, 0.0),
+        end: Tuple[float, float] = (1.0, 1.0),
+        width: float = 0.01,
+    ) -> np.ndarray:
+        """
+        Points concentrated along the segment start -> end, with normal noise of std `width`.
+        """
+        start = np.asarray(start, dtype=np.float64)
+        t = self.rng.random((num_points, 1))
+        return start + t * (np.asarray(end) - start) + self.rng.normal(
+            0.0, width, size=(num_points, 2)
+        )
+
+    def generate(self, distribution: str, num_points: int, **params) -> np.ndarray:
+        """
+        Draw `num_points` from the distribution named in DISTRIBUTIONS.
+
+        Raises:
+            ValueError: If the distribution is unknown.
+        """
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown distribution {distribution!r}; expected one of {DISTRIBUTIONS}"
+            )
+        return getattr(self, distribution)(num_points, **params)
+
+    def chunks(
+        self, distribution: str, num_points: int, chunk_size: int = 1_000_000, **params
+    ) -> Iterator[np.ndarray]:
+        """
+        Stream `num_points` points as (chunk_size, 2) arrays (the last may be shorter).
+
+        Each chunk comes from its own child seed, so the output is reproducible
+        for a given seed and chunk size. Shared parameters (cluster centres) are
+        drawn once, so every chunk samples the same distribution.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if distribution == "clustered" and params.get("centers") is None:
+            params["centers"] = self.uniform(
+                params.pop("num_clusters", 3),
+                params.pop("x_range", (0.0, 1.0)),
+                params.pop("y_range", (0.0, 1.0)),
+            )
+        for start in range(0, num_points, chunk_size):
+            child = PointGenerator(self.seed_seq.spawn(1)[0])
+            yield child.generate(distribution, min(chunk_size, num_points - start), **params)
+
+    def write_npy(
+        self,
+        path: str,
+        distribution: str,
+        num_points: int,
+        chunk_size: int = 1_000_000,
+        **params,
+    ) -> None:
+        """
+        Write `num_points` points to an (N, 2) float64 .npy file one chunk at a time.
+
+        Peak memory is one chunk, and the file can be memory-mapped later
+        (np.load(path, mmap_mode="r") or KDTree2D.load).
+        """
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(num_points, 2))
+        start = 0
+        for chunk in self.chunks(distribution, num_points, chunk_size, **params):
+            out[start : start + len(chunk)] = chunk
+            start += len(chunk)
+        out.flush()
+        del out
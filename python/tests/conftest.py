@@ -0,0 +1,10 @@
+import pytest
+
+from python.src.kdtree_backends import available_backends
+
+
+@pytest.fixture
+def needs_nanoflann():
+    """Skip the test when the kd_tree_cpp extension has not been built."""
+    if "nanoflann" not in available_backends():
+        pytest.skip("nanoflann backend unavailable")
@@ -0,0 +1,152 @@
+import copy
+
+import numpy as np
+import pytest
+
+from python.src import kdtree_backends
+from python.src.benchmark_suite import (
+    PeakRSS,
+    benchmark_scenario,
+    compare_results,
+    exact_mismatches,
+    load_results,
+    parse_backend_spec,
+    recall_at_k,
+    recall_qps_sweep,
+    run_suite,
+    save_results,
+)
+
+
+@pytest.fixture(scope="module")
+def report():
+    return run_suite(
+        ["sklearn", "grid"],
+        n_points=[200],
+        n_queries=[50],
+        ks=[1, 3],
+        distributions=["uniform", "clustered"],
+        repeats=2,
+        latency_queries=20,
+    )
+
+
+def test_scenario_reports_build_latency_and_throughput():
+    rng = np.random.default_rng(0)
+    result = benchmark_scenario(
+        "sklearn", rng.uniform(0, 100, (300, 2)), rng.uniform(0, 100, (40, 2)), k=2, repeats=3
+    )
+    assert result["build_s"]["repeats"] == 3
+    assert result["build_s"]["min"] <= result["build_s"]["median"] <= result["build_s"]["max"]
+    latency = result["latency_us"]
+    assert latency["samples"] == 40 and latency["p50"] <= latency["p95"] <= latency["p99"]
+    assert result["batch_qps"] > 0
+    memory = result["memory"]
+    assert memory["index_bytes"] > 0 and memory["bytes_per_point"] > 0
+    assert memory["build_peak_rss"] > 0 and memory["build_rss_increase"] >= 0
+
+
+def test_peak_rss_sees_transient_allocations():
+    with PeakRSS() as rss:
+        block = np.ones(2**25)  # 256 MiB, touched so it is resident
+        del block
+    if not rss.resettable:
+        pytest.skip("peak RSS cannot be reset on this platform")
+    assert rss.increase >= 2**27
+
+
+def test_suite_covers_the_matrix(report, tmp_path):
+    # Backends without the "threads" capability run once per scenario
+    assert len(report["results"]) == 2 * 2 * 2
+    assert {r["n_threads"] for r in report["results"]} == {None}
+    assert {"cpu_count", "platform", "python", "timestamp"} <= set(report["metadata"])
+    path = str(tmp_path / "bench.json")
+    save_results(report, path)
+    assert load_results(path)["results"] == report["results"]
+
+
+def test_compare_flags_only_regressions(report):
+    assert compare_results(report, report) == []
+    slower = copy.deepcopy(report)
+    slower["results"][0]["batch_s"]["median"] *= 2
+    faster = copy.deepcopy(report)
+    faster["results"][1]["build_s"]["median"] /= 2
+    regressions = compare_results(report, slower, tolerance=0.5)
+    assert [r["metric"] for r in regressions] == ["batch_s.median"]
+    assert regressions[0]["ratio"] == pytest.approx(2.0)
+    assert compare_results(report, faster) == []
+
+
+def test_exact_mismatches_flag_wrong_neighbours(monkeypatch):
+    rng = np.random.default_rng(3)
+    points, queries = rng.uniform(0, 100, (300, 2)), rng.uniform(0, 100, (40, 2))
+    assert exact_mismatches(["grid", "sklearn"], points, queries, k=3) == []
+
+    query_knn = kdtree_backends.GridNearestNeighbour.query_knn
+
+    def wrong_indices(self, queries, k, **kwargs):
+        indices, distances = query_knn(self, queries, k, **kwargs)
+        return (indices + 1) % len(points), distances
+
+    monkeypatch.setattr(kdtree_backends.GridNearestNeighbour, "query_knn", wrong_indices)
+    mismatches = exact_mismatches(["grid"], points, queries, k=3)
+    assert len(mismatches) == len(queries)
+    assert {m["type"] for m in mismatches} == {"index_mismatch"}
+
+    def wrong_distances(self, queries, k, **kwargs):
+        indices, distances = query_knn(self, queries, k, **kwargs)
+        return indices, distances * 1.01
+
+    monkeypatch.setattr(kdtree_backends.GridNearestNeighbour, "query_knn", wrong_distances)
+    mismatches = exact_mismatches(["grid"], points, queries, k=3)
+    assert {m["type"] for m in mismatches} == {"distance_mismatch"}
+    assert mismatches[0]["oracle_indices"] == mismatches[0]["indices"]
+
+
+def test_recall_at_k_counts_ties_and_ignores_padding():
+    exact = np.array([[1.0, 2.0], [1.0, 2.0]])
+    found = np.array([[1.0, 2.0], [2.0, np.nan]])
+    assert recall_at_k(found, exact) == pytest.approx(0.75)
+
+
+@pytest.mark.usefixtures("needs_nanoflann")
+def test_recall_sweep_over_eps():
+    rng = np.random.default_rng(1)
+    points, queries = rng.uniform(0, 100, (5000, 2)), rng.uniform(0, 100, (500, 2))
+    rows = recall_qps_sweep(
+        ["nanoflann", "grid", "nanoflann:curve=hilbert,leaf_size=16"], points, queries, k=5,
+        eps_values=[0.0, 10.0], leaf_sizes=[4, 32], repeats=1,
+    )
+    nanoflann = [r for r in rows if r["backend"] == "nanoflann"]
+    assert [(r["leaf_size"], r["eps"]) for r in nanoflann] == [(4, 0.0), (4, 10.0), (32, 0.0), (32, 10.0)]
+    assert all(r["recall"] == 1.0 for r in nanoflann if r["eps"] == 0.0)
+    assert min(r["recall"] for r in nanoflann if r["eps"] == 10.0) < 1.0
+    # Backends without the eps capability give a single exact point
+    grid = [r for r in rows if r["backend"] == "grid"]
+    assert len(grid) == 1 and grid[0]["eps"] is None and grid[0]["recall"] == 1.0
+    # A spec's options are passed to the build and its leaf_size fixes that axis
+    hilbert = [r for r in rows if r["backend"] == "nanoflann:curve=hilbert,leaf_size=16"]
+    assert [(r["leaf_size"], r["eps"]) for r in hilbert] == [(16, 0.0), (16, 10.0)]
+    assert hilbert[0]["recall"] == 1.0
+
+
+@pytest.mark.usefixtures("needs_nanoflann")
+def test_recall_sweep_passes_threads_only_to_threaded_backends():
+    rng = np.random.default_rng(2)
+    points, queries = rng.uniform(0, 100, (2000, 2)), rng.uniform(0, 100, (200, 2))
+    rows = recall_qps_sweep(
+        ["nanoflann", "grid", "sklearn"], points, queries, k=3,
+        eps_values=[0.0], n_threads=2, repeats=1,
+    )
+    assert [r["backend"] for r in rows] == ["nanoflann", "grid", "sklearn"]
+    assert all(r["recall"] == 1.0 for r in rows)
+
+
+def test_parse_backend_spec():
+    assert parse_backend_spec("grid") == ("grid", {})
+    assert parse_backend_spec("nanoflann:curve=hilbert,leaf_size=16,eps=0.5") == (
+        "nanoflann",
+        {"curve": "hilbert", "leaf_size": 16, "eps": 0.5},
+    )
+    with pytest.raises(ValueError):
+        parse_backend_spec("nanoflann:hilbert")
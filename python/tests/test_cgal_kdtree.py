@@ -0,0 +1,59 @@
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, "build/")
+cgal_kdtree_cpp = pytest.importorskip("cgal_kdtree_cpp")
+
+
+@pytest.fixture
+def points():
+    return np.random.default_rng(42).uniform(0, 100, size=(500, 2))
+
+
+def test_duplicate_points_keep_their_own_index():
+    points = np.array([[1.0, 1.0], [5.0, 5.0], [1.0, 1.0]])
+    tree = cgal_kdtree_cpp.CGALKDTree2D(points)
+    indices, distances = tree.query_knn(np.array([[1.0, 1.0]]), k=2)
+    assert sorted(indices[0]) == [0, 2]
+    np.testing.assert_allclose(distances, [[0.0, 0.0]])
+
+
+def test_list_and_array_constructors_agree(points):
+    from_list = cgal_kdtree_cpp.CGALKDTree2D([tuple(p) for p in points])
+    from_array = cgal_kdtree_cpp.CGALKDTree2D(points)
+    assert len(from_array) == len(points)
+    assert from_list.query(50.0, 50.0) == from_array.query(50.0, 50.0)
+
+
+def test_query_batch_and_knn_match_brute_force(points):
+    queries = np.random.default_rng(7).uniform(0, 100, size=(300, 2))
+    tree = cgal_kdtree_cpp.CGALKDTree2D(points)
+    d = np.linalg.norm(queries[:, None, :] - points[None, :, :], axis=2)
+    indices, distances = tree.query_batch(queries)
+    np.testing.assert_array_equal(indices, d.argmin(axis=1))
+    np.testing.assert_allclose(distances, d.min(axis=1))
+    indices, distances = tree.query_knn(queries, k=4, n_threads=2)
+    np.testing.assert_array_equal(indices, np.argsort(d, axis=1)[:, :4])
+
+
+def test_query_radius(points):
+    queries = np.random.default_rng(9).uniform(0, 100, size=(50, 2))
+    offsets, indices, distances = cgal_kdtree_cpp.CGALKDTree2D(points).query_radius(queries, 9.0)
+    d = np.linalg.norm(queries[:, None, :] - points[None, :, :], axis=2)
+    np.testing.assert_array_equal(np.diff(offsets), (d <= 9.0).sum(axis=1))
+    for i in range(len(queries)):
+        row = slice(offsets[i], offsets[i + 1])
+        assert sorted(indices[row]) == sorted(np.flatnonzero(d[i] <= 9.0))
+
+
+def test_query_knn_profiled_matches_query_knn(points):
+    queries = np.random.default_rng(11).uniform(0, 100, size=(100, 2))
+    tree = cgal_kdtree_cpp.CGALKDTree2D(points)
+    indices, distances = tree.query_knn(queries, k=4)
+    profiled = tree.query_knn_profiled(queries, k=4)
+    np.testing.assert_array_equal(profiled[0], indices)
+    np.testing.assert_allclose(profiled[1], distances)
+    assert (profiled[2] >= 2).all()
+    assert (profiled[3] >= 4).all() and (profiled[3] < len(points)).all()
@@ -1,17 +1,24 @@
 import sys
 
+import numpy as np
+import pytest
+
 sys.path.insert(0, "build/")
 import convex_hull_ext
 
 
+def as_set(hull):
+    return {tuple(pt) for pt in hull.tolist()}
+
+
 def test_triangle():
     # Simple triangle: hull should be the triangle itself (closed polygon)
     points = [[0, 0], [1, 0], [0, 1]]
     hull = convex_hull_ext.compute_convex_hull(points)
     # The hull should contain all triangle points, order may vary
-    assert len(hull) == 4  # 3 points + repeat of first for closed polygon
-    for pt in points:
-        assert pt in hull
+    assert hull.shape == (4, 2)  # 3 points + repeat of first for closed polygon
+    np.testing.assert_array_equal(hull[0], hull[-1])
+    assert as_set(hull) == {(0, 0), (1, 0), (0, 1)}
 
 
 def test_square_with_inner_point():
@@ -19,10 +26,7 @@ def test_square_with_inner_point():
     points = [[0, 0], [1, 0], [1, 1], [0, 1], [0.5, 0.5]]
     hull = convex_hull_ext.compute_convex_hull(points)
     assert len(hull) == 5  # 4 corners + repeat of first
-    corners = [[0, 0], [1, 0], [1, 1], [0, 1]]
-    for corner in corners:
-        assert corner in hull
-    assert [0.5, 0.5] not in hull  # inner point should not be in hull
+    assert as_set(hull) == {(0, 0), (1, 0), (1, 1), (0, 1)}  # inner point not in hull
 
 
 def test_colinear_points():
@@ -34,17 +38,84 @@ def test_colinear_points():
 
 def test_empty_input():
     # Empty input: hull should be empty
-    hull = convex_hull_ext.compute_convex_hull([])
-    assert hull == []
+    assert convex_hull_ext.compute_convex_hull([]).shape == (0, 2)
+    assert convex_hull_ext.compute_convex_hull(np.empty((0, 2)), return_indices=True).shape == (0,)
 
 
 def test_duplicate_points():
     # Duplicate points: hull should be correct
     points = [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0], [1, 1]]
     hull = convex_hull_ext.compute_convex_hull(points)
-    corners = [[0, 0], [1, 0], [1, 1], [0, 1]]
-    for corner in corners:
-        assert corner in hull
+    assert as_set(hull) == {(0, 0), (1, 0), (1, 1), (0, 1)}
+
+
+def test_open_hull_omits_closing_point():
+    points = [[0, 0], [1, 0], [1, 1], [0, 1], [0.5, 0.5]]
+    closed = convex_hull_ext.compute_convex_hull(points)
+    open_hull = convex_hull_ext.compute_convex_hull(points, closed=False)
+    np.testing.assert_array_equal(open_hull, closed[:-1])
+
+
+def test_indices_point_into_input():
+    points = np.random.default_rng(3).normal(size=(1000, 2))
+    indices = convex_hull_ext.compute_convex_hull(points, return_indices=True, closed=False)
+    assert indices.dtype == np.int64 and len(set(indices.tolist())) == len(indices)
+    hull = convex_hull_ext.compute_convex_hull(points, closed=False)
+    np.testing.assert_array_equal(points[indices], hull)
+    # Clockwise: every input point lies on or to the right of each hull edge
+    a, b = hull, np.roll(hull, -1, axis=0)
+    cross = (b[:, None, 0] - a[:, None, 0]) * (points[None, :, 1] - a[:, None, 1]) - (
+        b[:, None, 1] - a[:, None, 1]
+    ) * (points[None, :, 0] - a[:, None, 0])
+    assert (cross <= 1e-12).all()
+
+
+def test_non_contiguous_and_integer_input():
+    points = np.array([[0, 0, 9], [4, 0, 9], [0, 4, 9], [1, 1, 9]])[:, :2]
+    hull = convex_hull_ext.compute_convex_hull(points, closed=False)
+    assert as_set(hull) == {(0, 0), (4, 0), (0, 4)}
+
+
+def test_rejects_wrong_shape():
+    with pytest.raises(ValueError):
+        convex_hull_ext.compute_convex_hull(np.zeros((3, 3)))
+
+
+def test_grouped_hulls_match_per_group_hulls():
+    rng = np.random.default_rng(5)
+    sizes = [1, 2, 3, 50, 2000]
+    points = rng.normal(size=(sum(sizes), 2))
+    labels = rng.permutation(np.repeat([7, -3, 0, 12, 4], sizes))
+    groups, offsets, hulls = convex_hull_ext.compute_grouped_convex_hulls(
+        points, labels, return_indices=True, n_threads=4
+    )
+    np.testing.assert_array_equal(groups, [-3, 0, 4, 7, 12])
+    assert offsets[0] == 0 and offsets[-1] == len(hulls)
+    for g, label in enumerate(groups):
+        rows = np.flatnonzero(labels == label)
+        expected = rows[convex_hull_ext.compute_convex_hull(points[rows], return_indices=True)]
+        np.testing.assert_array_equal(hulls[offsets[g] : offsets[g + 1]], expected)
+
+
+def test_grouped_hulls_vertices_and_open():
+    points = np.array([[0, 0], [5, 5], [1, 0], [6, 5], [0, 1], [5, 6], [0.2, 0.2]])
+    labels = np.array([1, 2, 1, 2, 1, 2, 1])
+    groups, offsets, hulls = convex_hull_ext.compute_grouped_convex_hulls(
+        points, labels, closed=False
+    )
+    np.testing.assert_array_equal(offsets, [0, 3, 6])
+    assert as_set(hulls[:3]) == {(0, 0), (1, 0), (0, 1)}
+    assert as_set(hulls[3:]) == {(5, 5), (6, 5), (5, 6)}
+    single = convex_hull_ext.compute_grouped_convex_hulls(points, labels, n_threads=1)
+    np.testing.assert_array_equal(
+        single[2], convex_hull_ext.compute_grouped_convex_hulls(points, labels)[2]
+    )
 
 
-# You can add more tests for edge cases as needed
+def test_grouped_hulls_empty_and_mismatched_labels():
+    groups, offsets, hulls = convex_hull_ext.compute_grouped_convex_hulls(
+        np.empty((0, 2)), np.empty(0, dtype=np.int64)
+    )
+    assert len(groups) == 0 and offsets.tolist() == [0] and hulls.shape == (0, 2)
+    with pytest.raises(ValueError, match="one label per point"):
+        convex_hull_ext.compute_grouped_convex_hulls(np.zeros((3, 2)), [0, 1])
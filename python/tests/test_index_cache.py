@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from python.src.index_cache import LRUCache, points_key
+
+
+def test_get_or_create_reports_hits():
+    cache = LRUCache(2)
+    calls = []
+    value, hit = cache.get_or_create("a", lambda: calls.append("a") or 1)
+    assert (value, hit) == (1, False)
+    value, hit = cache.get_or_create("a", lambda: calls.append("a") or 2)
+    assert (value, hit) == (1, True)
+    assert calls == ["a"]
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.get_or_create("a", lambda: 1)
+    cache.get_or_create("b", lambda: 2)
+    cache.get_or_create("a", lambda: 1)  # "b" is now least recently used
+    cache.get_or_create("c", lambda: 3)
+    assert len(cache) == 2 and "a" in cache and "b" not in cache
+
+
+def test_explicit_eviction_and_clear():
+    cache = LRUCache(3)
+    cache.get_or_create("a", lambda: None)
+    assert cache.evict("a") and not cache.evict("a")
+    cache.get_or_create("b", lambda: 2)
+    cache.clear()
+    assert len(cache) == 0
+    with pytest.raises(ValueError):
+        LRUCache(0)
+
+
+def test_points_key_tracks_content():
+    points = np.random.default_rng(0).uniform(0, 1, size=(50, 2))
+    assert points_key(points) == points_key(points.copy())
+    assert points_key(points) == points_key(np.asfortranarray(points))
+    moved = points.copy()
+    moved[3, 1] += 1e-12
+    assert points_key(points) != points_key(moved)
+    assert points_key(points) != points_key(points.astype(np.float32))
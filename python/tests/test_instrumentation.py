@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+from loguru import logger
+
+from python.src import instrumentation
+from python.src.instrumentation import LATENCY_BUCKETS_S, Histogram, InstrumentedBackend
+from python.src.kdtree_backends import create_backend
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    instrumentation.reset()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+@pytest.fixture
+def points():
+    return np.random.default_rng(42).uniform(0, 100, size=(2000, 2))
+
+
+@pytest.fixture
+def queries():
+    return np.random.default_rng(7).uniform(0, 100, size=(50, 2))
+
+
+@pytest.fixture
+def events():
+    records = []
+    sink = logger.add(lambda message: records.append(message.record), level="TRACE")
+    yield records
+    logger.remove(sink)
+
+
+def test_disabled_backends_are_not_wrapped(points, queries):
+    backend = create_backend("sklearn", points)
+    assert not isinstance(backend, InstrumentedBackend)
+    backend.query_knn(queries, 2)
+    assert instrumentation.snapshot() == {"enabled": False, "backends": {}}
+
+
+def test_enabled_records_build_phases_and_calls(points, queries, events):
+    instrumentation.enable()
+    backend = create_backend("grid", points)
+    assert isinstance(backend, InstrumentedBackend)
+    backend.query(queries[0])
+    backend.query_knn(queries, 3)
+    backend.query_knn(queries[:10], 3)
+
+    grid = instrumentation.snapshot()["backends"]["grid"]
+    assert set(grid["build_phases_s"]) == {"bin", "total"}
+    knn = grid["calls"]["query_knn"]
+    assert knn["latency_s"]["count"] == 2
+    assert knn["batch_size"]["max"] == len(queries)
+    assert knn["batch_size"]["sum"] == len(queries) + 10
+    assert grid["calls"]["query"]["batch_size"]["count"] == 1
+    query_events = [r["extra"] for r in events if r["extra"].get("event") == "nn_query"]
+    assert [e["op"] for e in query_events] == ["query", "query_knn", "query_knn"]
+
+
+@pytest.mark.usefixtures("needs_nanoflann")
+def test_native_counters(points, queries):
+    expected = create_backend("nanoflann", points).query_knn(queries, 4)
+    instrumentation.enable(native_counters=True)
+    backend = create_backend("nanoflann", points)
+    indices, distances = backend.query_knn(queries, 4)
+    np.testing.assert_array_equal(indices, expected[0])
+    np.testing.assert_array_equal(distances, expected[1])
+    assert backend.query_batch(queries)[0].shape == (len(queries),)
+
+    native = instrumentation.snapshot()["backends"]["nanoflann"]["native"]
+    assert native["nodes_visited"]["count"] == 2 * len(queries)
+    # Every query examines at least the k points it returns
+    assert native["distance_computations"]["sum"] >= 4 * len(queries)
+
+
+@pytest.mark.usefixtures("needs_nanoflann")
+def test_wrapped_backend_forwards_query_options(points, queries):
+    expected = create_backend("nanoflann", points).query(queries[0], eps=0.5)
+    instrumentation.enable()
+    backend = create_backend("nanoflann", points)
+    assert isinstance(backend, InstrumentedBackend)
+    assert backend.query(queries[0], eps=0.5) == expected
+    assert backend.query_knn(queries, 2, eps=0.5)[0].shape == (len(queries), 2)
+    calls = instrumentation.snapshot()["backends"]["nanoflann"]["calls"]
+    assert calls["query"]["batch_size"]["count"] == 1
+
+
+def test_slow_calls_are_logged_as_warnings(points, queries, events):
+    instrumentation.enable(slow_call_s=0.0)
+    create_backend("sklearn", points).query_batch(queries)
+    slow = [r for r in events if r["level"].name == "WARNING"]
+    assert len(slow) == 1
+    assert slow[0]["extra"]["batch_size"] == len(queries)
+
+
+def test_disable_stops_recording_on_existing_wrappers(points, queries):
+    instrumentation.enable()
+    backend = create_backend("sklearn", points)
+    instrumentation.disable()
+    backend.query_batch(queries)
+    sklearn = instrumentation.snapshot()["backends"]["sklearn"]
+    assert "total" in sklearn["build_phases_s"] and sklearn["calls"] == {}
+
+
+def test_histogram_quantiles():
+    hist = Histogram(LATENCY_BUCKETS_S)
+    hist.observe(np.full(99, 3e-6))
+    hist.observe(1e3)  # beyond the last edge
+    assert hist.count == 100
+    assert hist.quantile(0.5) == pytest.approx(4e-6)
+    assert hist.quantile(1.0) == 1e3
+    snap = hist.snapshot()
+    assert snap["max"] == 1e3 and snap["buckets"]["inf"] == 1
@@ -0,0 +1,427 @@
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, "build/")
+import kd_tree_cpp
+
+
+@pytest.fixture
+def points():
+    return np.random.default_rng(42).uniform(0, 100, size=(500, 2))
+
+
+def test_array_and_list_paths_agree(points):
+    list_cloud = kd_tree_cpp.PointCloud([kd_tree_cpp.Point(x, y) for x, y in points])
+    list_tree = kd_tree_cpp.KDTree2D(list_cloud)
+    array_tree = kd_tree_cpp.KDTree2D(points)
+    for qx, qy in [(0.0, 0.0), (50.0, 50.0), (99.0, 1.0)]:
+        assert list_tree.query(qx, qy) == array_tree.query(qx, qy)
+
+
+def test_point_cloud_borrows_array(points):
+    cloud = kd_tree_cpp.PointCloud(points)
+    assert len(cloud) == len(points)
+    assert np.shares_memory(cloud.points, points)
+    assert not cloud.points.flags.writeable
+
+
+def test_non_contiguous_input_is_converted(points):
+    cloud = kd_tree_cpp.PointCloud(np.asfortranarray(points))
+    np.testing.assert_array_equal(cloud.points, points)
+
+
+def test_tree_keeps_points_alive():
+    tree = kd_tree_cpp.KDTree2D(kd_tree_cpp.PointCloud(np.array([[0.0, 0.0], [1.0, 1.0]])))
+    idx, dist = tree.query(1.1, 1.1)
+    assert idx == 1
+    assert dist == pytest.approx(np.hypot(0.1, 0.1))
+
+
+def test_rejects_wrong_shape():
+    with pytest.raises(ValueError):
+        kd_tree_cpp.PointCloud(np.zeros((4, 3)))
+
+
+def brute_force_nn(points, queries):
+    d = np.linalg.norm(queries[:, None, :] - points[None, :, :], axis=2)
+    return d.argmin(axis=1), d.min(axis=1)
+
+
+@pytest.mark.parametrize("n_threads", [0, 1, 3])
+def test_query_batch_matches_brute_force(points, n_threads):
+    queries = np.random.default_rng(7).uniform(0, 100, size=(3000, 2))
+    tree = kd_tree_cpp.KDTree2D(points)
+    indices, distances = tree.query_batch(queries, n_threads=n_threads)
+    expected_idx, expected_dist = brute_force_nn(points, queries)
+    assert indices.shape == (3000,) and indices.dtype == np.int64
+    np.testing.assert_array_equal(indices, expected_idx)
+    np.testing.assert_allclose(distances, expected_dist)
+
+
+def test_query_batch_agrees_with_single_query(points):
+    tree = kd_tree_cpp.KDTree2D(points)
+    queries = np.array([[10.0, 20.0], [75.5, 3.25]])
+    indices, distances = tree.query_batch(queries)
+    for (qx, qy), idx, dist in zip(queries, indices, distances):
+        assert tree.query(qx, qy) == (idx, dist)
+
+
+def test_query_batch_empty_inputs(points):
+    indices, distances = kd_tree_cpp.KDTree2D(points).query_batch(np.empty((0, 2)))
+    assert indices.shape == (0,) and distances.shape == (0,)
+    indices, distances = kd_tree_cpp.KDTree2D(np.empty((0, 2))).query_batch(np.zeros((2, 2)))
+    np.testing.assert_array_equal(indices, [-1, -1])
+    assert np.isnan(distances).all()
+
+
+def test_query_knn_matches_brute_force(points):
+    queries = np.random.default_rng(3).uniform(0, 100, size=(200, 2))
+    indices, distances = kd_tree_cpp.KDTree2D(points).query_knn(queries, k=5)
+    d = np.linalg.norm(queries[:, None, :] - points[None, :, :], axis=2)
+    assert indices.shape == distances.shape == (200, 5)
+    np.testing.assert_array_equal(indices, np.argsort(d, axis=1)[:, :5])
+    np.testing.assert_allclose(distances, np.sort(d, axis=1)[:, :5])
+
+
+def test_query_knn_pads_when_k_exceeds_points():
+    tree = kd_tree_cpp.KDTree2D(np.array([[0.0, 0.0], [3.0, 4.0]]))
+    indices, distances = tree.query_knn(np.zeros((1, 2)), k=4)
+    np.testing.assert_array_equal(indices, [[0, 1, -1, -1]])
+    np.testing.assert_allclose(distances[:, :2], [[0.0, 5.0]])
+    assert np.isnan(distances[:, 2:]).all()
+    with pytest.raises(ValueError):
+        tree.query_knn(np.zeros((1, 2)), k=0)
+
+
+@pytest.mark.parametrize("n_threads", [1, 4])
+def test_query_radius_csr_matches_brute_force(points, n_threads):
+    queries = np.random.default_rng(5).uniform(0, 100, size=(2500, 2))
+    offsets, indices, distances = kd_tree_cpp.KDTree2D(points).query_radius(
+        queries, radius=8.0, n_threads=n_threads
+    )
+    d = np.linalg.norm(queries[:, None, :] - points[None, :, :], axis=2)
+    assert offsets.shape == (2501,) and offsets[0] == 0
+    assert offsets[-1] == len(indices) == len(distances)
+    for i in range(0, 2500, 97):
+        row = slice(offsets[i], offsets[i + 1])
+        expected = np.flatnonzero(d[i] <= 8.0)
+        assert sorted(indices[row]) == sorted(expected)
+        assert np.all(np.diff(distances[row]) >= 0)
+
+
+def test_save_load_round_trip(points, tmp_path):
+    path = str(tmp_path / "tree.kdtree")
+    tree = kd_tree_cpp.KDTree2D(points)
+    tree.save(path)
+    loaded = kd_tree_cpp.KDTree2D.load(path)
+    assert len(loaded) == len(points)
+    np.testing.assert_array_equal(loaded.cloud.points, points)
+    queries = np.random.default_rng(9).uniform(0, 100, size=(300, 2))
+    for expected, actual in zip(tree.query_knn(queries, k=4), loaded.query_knn(queries, k=4)):
+        np.testing.assert_array_equal(actual, expected)
+
+
+def test_load_memory_maps_points(points, tmp_path):
+    path = str(tmp_path / "tree.kdtree")
+    kd_tree_cpp.KDTree2D(points).save(path)
+    stored = kd_tree_cpp.KDTree2D.load(path).cloud.points
+    assert not stored.flags.writeable
+    # Writes through another mapping of the file are visible, so nothing was copied
+    on_disk = np.load(path + ".npy", mmap_mode="r+")
+    on_disk[0] = [-1.0, -2.0]
+    on_disk.flush()
+    np.testing.assert_array_equal(stored[0], [-1.0, -2.0])
+
+
+def test_load_rejects_mismatched_points(points, tmp_path):
+    path = str(tmp_path / "tree.kdtree")
+    kd_tree_cpp.KDTree2D(points).save(path)
+    np.save(path + ".npy", points[:10])
+    with pytest.raises(ValueError):
+        kd_tree_cpp.KDTree2D.load(path)
+    with pytest.raises(FileNotFoundError):
+        kd_tree_cpp.KDTree2D.load(str(tmp_path / "missing.kdtree"))
+
+
+def test_save_load_empty_tree(tmp_path):
+    path = str(tmp_path / "empty.kdtree")
+    kd_tree_cpp.KDTree2D(np.empty((0, 2))).save(path)
+    indices, _ = kd_tree_cpp.KDTree2D.load(path).query_batch(np.zeros((1, 2)))
+    np.testing.assert_array_equal(indices, [-1])
+
+
+def test_query_knn_profiled_matches_query_knn(points):
+    tree = kd_tree_cpp.KDTree2D(points)
+    queries = np.random.default_rng(5).uniform(-20, 120, size=(200, 2))
+    expected = tree.query_knn(queries, k=4)
+    indices, distances, nodes, computed = tree.query_knn_profiled(queries, k=4, n_threads=2)
+    np.testing.assert_array_equal(indices, expected[0])
+    np.testing.assert_array_equal(distances, expected[1])
+    assert nodes.shape == computed.shape == (len(queries),)
+    assert (nodes >= 1).all() and (computed >= 4).all() and (computed < len(points)).all()
+
+
+def test_leaf_size_and_eps(points, tmp_path):
+    queries = np.random.default_rng(6).uniform(0, 100, size=(300, 2))
+    exact = kd_tree_cpp.KDTree2D(points).query_knn(queries, k=5)
+    coarse = kd_tree_cpp.KDTree2D(points, leaf_size=64)
+    assert coarse.leaf_size == 64
+    # Leaf size changes the tree, not exact answers
+    np.testing.assert_array_equal(coarse.query_knn(queries, k=5)[1], exact[1])
+    _, approx = coarse.query_knn(queries, k=5, eps=1.0)
+    assert (approx <= 2.0 * exact[1] + 1e-12).all()
+    # The profiled search prunes like the plain one for eps > 0 too
+    profiled = coarse.query_knn_profiled(queries, k=5, eps=1.0)
+    np.testing.assert_array_equal(profiled[1], approx)
+    assert profiled[2].sum() <= coarse.query_knn_profiled(queries, k=5)[2].sum()
+    path = str(tmp_path / "coarse.kdtree")
+    coarse.save(path)
+    assert kd_tree_cpp.KDTree2D.load(path).leaf_size == 64
+    with pytest.raises(ValueError):
+        kd_tree_cpp.KDTree2D(points, leaf_size=0)
+    with pytest.raises(ValueError):
+        coarse.query_knn(queries, k=5, eps=-1.0)
+
+
+def test_memory_usage_counts_points_and_index(points):
+    tree = kd_tree_cpp.KDTree2D(points)
+    index_bytes = tree.index_memory_usage()
+    # At least one node per 10-point leaf plus a 4-byte permutation entry per point
+    assert index_bytes > len(points) * 4 + len(points) // 10 * 16
+    assert tree.memory_usage() == points.nbytes + index_bytes
+    assert kd_tree_cpp.KDTree2D(np.empty((0, 2))).memory_usage() == 0
+
+
+def test_dynamic_memory_usage_includes_forest(points):
+    tree = kd_tree_cpp.DynamicKDTree2D(points)
+    assert tree.index_memory_usage() > len(points) * 8
+    assert tree.memory_usage() > points.nbytes + tree.index_memory_usage()
+
+
+def test_dynamic_tree_tracks_inserts_and_removals(points):
+    rng = np.random.default_rng(11)
+    tree = kd_tree_cpp.DynamicKDTree2D(points)
+    np.testing.assert_array_equal(tree.ids, np.arange(len(points)))
+    live = dict(enumerate(points))
+    for _ in range(5):
+        batch = rng.uniform(0, 100, size=(150, 2))
+        live.update(zip(tree.add_points(batch).tolist(), batch))
+        gone = rng.choice(list(live), size=200, replace=False)
+        assert tree.remove(np.append(gone, 10**9)) == 200
+        for i in gone:
+            del live[i]
+    # Removals outnumbered the live points at some point, forcing a compaction
+    assert len(tree) == len(live) < len(points)
+    ids = np.array(list(live))
+    stored = np.array(list(live.values()))
+    queries = rng.uniform(0, 100, size=(100, 2))
+    d = np.linalg.norm(queries[:, None, :] - stored[None, :, :], axis=2)
+    found, distances = tree.query_knn(queries, k=3)
+    np.testing.assert_array_equal(found, ids[np.argsort(d, axis=1)[:, :3]])
+    np.testing.assert_allclose(distances, np.sort(d, axis=1)[:, :3])
+    offsets, found, _ = tree.query_radius(queries, radius=6.0)
+    np.testing.assert_array_equal(np.diff(offsets), (d <= 6.0).sum(axis=1))
+
+
+def test_dynamic_tree_explicit_ids():
+    tree = kd_tree_cpp.DynamicKDTree2D()
+    assert tree.query(0.0, 0.0)[0] == -1
+    np.testing.assert_array_equal(
+        tree.add_points(np.array([[0.0, 0.0], [5.0, 5.0]]), ids=[40, 7]), [40, 7]
+    )
+    assert tree.query(4.0, 4.0)[0] == 7
+    assert tree.add_points(np.array([[9.0, 9.0]]))[0] == 41
+    with pytest.raises(ValueError):
+        tree.add_points(np.zeros((1, 2)), ids=[7])
+    with pytest.raises(ValueError):
+        tree.add_points(np.zeros((2, 2)), ids=[1, 1])
+    assert len(tree) == 3
+
+
+def test_dynamic_tree_leaf_size(points):
+    queries = np.random.default_rng(12).uniform(0, 100, size=(100, 2))
+    default = kd_tree_cpp.DynamicKDTree2D(points)
+    coarse = kd_tree_cpp.DynamicKDTree2D(points, leaf_size=64)
+    assert default.leaf_size == 10 and coarse.leaf_size == 64
+    assert coarse.index_memory_usage() < default.index_memory_usage()
+    np.testing.assert_array_equal(coarse.query_batch(queries)[1], default.query_batch(queries)[1])
+    assert coarse.query(x=50.0, y=50.0) == default.query(50.0, 50.0)
+    with pytest.raises(ValueError):
+        kd_tree_cpp.DynamicKDTree2D(leaf_size=0)
+
+
+def test_float32_tree_halves_point_storage(points, tmp_path):
+    points32 = points.astype(np.float32)
+    tree = kd_tree_cpp.KDTree2DFloat32(points32)
+    assert tree.dtype == np.float32
+    assert np.shares_memory(tree.cloud.points, points32)
+    assert tree.memory_usage() == points32.nbytes + tree.index_memory_usage()
+    queries = np.random.default_rng(8).uniform(0, 100, size=(300, 2))
+    expected = brute_force_nn(points32.astype(np.float64), queries.astype(np.float32).astype(np.float64))
+    indices, distances = tree.query_batch(queries)
+    assert distances.dtype == np.float64
+    np.testing.assert_allclose(distances, expected[1], rtol=1e-12)
+    np.testing.assert_array_equal(indices, expected[0])
+    path = str(tmp_path / "tree32.kdtree")
+    tree.save(path)
+    loaded = kd_tree_cpp.KDTree2DFloat32.load(path)
+    np.testing.assert_array_equal(loaded.query_knn(queries, k=3)[0], tree.query_knn(queries, k=3)[0])
+    # A float32 index is not loaded as float64, nor the reverse
+    with pytest.raises(ValueError):
+        kd_tree_cpp.KDTree2D.load(path)
+
+
+@pytest.mark.parametrize("curve", ["morton", "hilbert"])
+def test_curve_ordered_tree_matches_plain_tree(curve, tmp_path):
+    rng = np.random.default_rng(9)
+    points = rng.uniform(0, 100, size=(20000, 2))
+    # Above the batch size at which query_knn visits queries in curve order
+    queries = rng.uniform(0, 100, size=(5000, 2))
+    plain = kd_tree_cpp.KDTree2D(points)
+    tree = kd_tree_cpp.KDTree2D(points, curve=curve)
+    assert plain.curve == "none" and plain.order is None
+    assert tree.curve == curve
+    assert np.array_equal(np.sort(tree.order), np.arange(len(points)))
+    # The tree stores its own reordered copy of the points
+    assert not np.shares_memory(tree.cloud.points, points)
+    np.testing.assert_array_equal(tree.cloud.points, points[tree.order])
+    for result, expected in zip(tree.query_knn(queries, k=4), plain.query_knn(queries, k=4)):
+        np.testing.assert_array_equal(result, expected)
+    np.testing.assert_array_equal(tree.query_batch(queries[:100])[0], plain.query_batch(queries[:100])[0])
+    assert tree.query(*queries[0]) == plain.query(*queries[0])
+    csr = tree.query_radius(queries[:50], 2.0)
+    expected_csr = plain.query_radius(queries[:50], 2.0)
+    np.testing.assert_array_equal(csr[0], expected_csr[0])
+    np.testing.assert_array_equal(csr[1], expected_csr[1])
+    path = str(tmp_path / f"{curve}.kdtree")
+    tree.save(path)
+    loaded = kd_tree_cpp.KDTree2D.load(path)
+    assert loaded.curve == curve
+    np.testing.assert_array_equal(loaded.order, tree.order)
+    np.testing.assert_array_equal(loaded.query_knn(queries, k=4)[0], plain.query_knn(queries, k=4)[0])
+
+
+@pytest.mark.parametrize("curve", ["morton", "hilbert"])
+def test_curve_order_tolerates_nan_coordinates(curve):
+    rng = np.random.default_rng(10)
+    points = rng.uniform(0, 100, size=(1000, 2))
+    points[::100, 0] = np.nan
+    tree = kd_tree_cpp.KDTree2D(points, curve=curve)
+    np.testing.assert_array_equal(np.sort(tree.order), np.arange(len(points)))
+    # A batch large enough to be sorted along the curve, with NaN queries mixed in
+    queries = rng.uniform(0, 100, size=(5000, 2))
+    queries[::500, 1] = np.nan
+    indices, _ = tree.query_knn(queries, k=2)
+    assert indices.shape == (len(queries), 2)
+
+
+def test_load_rejects_corrupt_curve_order(points, tmp_path):
+    path = tmp_path / "hilbert.kdtree"
+    kd_tree_cpp.KDTree2D(points, curve="hilbert").save(str(path))
+    data = bytearray(path.read_bytes())
+    # The order follows the magic, point count and curve; repeat its first entry
+    start = 8 + 8 + 4
+    data[start + 4 : start + 8] = data[start : start + 4]
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="permutation"):
+        kd_tree_cpp.KDTree2D.load(str(path))
+
+
+def test_rejects_unknown_curve(points):
+    with pytest.raises(ValueError):
+        kd_tree_cpp.KDTree2D(points, curve="peano")
+
+
+@pytest.mark.parametrize("n_threads", [1, 4])
+def test_all_nearest_neighbours_matches_brute_force(n_threads):
+    points = np.random.default_rng(11).uniform(0, 100, size=(3000, 2))
+    # Duplicates are neighbours of each other, never of themselves
+    points[100:200] = points[:100]
+    points[200:205] = points[0]
+    d = np.linalg.norm(points[:, None, :] - points[None, :, :], axis=2)
+    np.fill_diagonal(d, np.inf)
+    rows = np.arange(len(points))[:, None]
+    for curve in ["none", "hilbert"]:
+        tree = kd_tree_cpp.KDTree2D(points, leaf_size=4, curve=curve)
+        indices, distances = tree.all_nearest_neighbours(6, n_threads=n_threads)
+        assert indices.shape == distances.shape == (3000, 6)
+        assert (indices != rows).all()
+        np.testing.assert_array_equal(distances, np.sort(d, axis=1)[:, :6])
+        np.testing.assert_array_equal(d[rows, indices], distances)
+    assert (distances[:100, 0] == 0).all() and (distances[200:205, :5] == 0).all()
+    np.testing.assert_array_equal(
+        kd_tree_cpp.all_nearest_neighbours(points, 6, n_threads=n_threads)[1], distances
+    )
+
+
+def test_all_nearest_neighbours_pads_and_follows_dtype():
+    points = np.array([[0.0, 0.0], [3.0, 4.0], [0.0, 0.0]])
+    indices, distances = kd_tree_cpp.all_nearest_neighbours(points, 3)
+    np.testing.assert_array_equal(indices, [[2, 1, -1], [0, 2, -1], [0, 1, -1]])
+    np.testing.assert_allclose(distances[:, :2], [[0.0, 5.0], [5.0, 5.0], [0.0, 5.0]])
+    assert np.isnan(distances[:, 2]).all()
+    assert kd_tree_cpp.all_nearest_neighbours(np.zeros((0, 2)), 2)[0].shape == (0, 2)
+    tree32 = kd_tree_cpp.KDTree2DFloat32(points.astype(np.float32))
+    np.testing.assert_array_equal(tree32.all_nearest_neighbours(1)[1], distances[:, :1])
+    with pytest.raises(ValueError):
+        kd_tree_cpp.all_nearest_neighbours(points, 0)
+
+
+def test_all_nearest_neighbours_accepts_array_likes():
+    pairs = [[0.0, 0.0], [3.0, 4.0], [0, 1]]
+    indices, distances = kd_tree_cpp.all_nearest_neighbours(pairs, 1)
+    expected = kd_tree_cpp.all_nearest_neighbours(np.array(pairs, dtype=np.float64), 1)
+    np.testing.assert_array_equal(indices, expected[0])
+    np.testing.assert_array_equal(distances, expected[1])
+    with pytest.raises(ValueError):
+        kd_tree_cpp.all_nearest_neighbours([[0.0, 1.0], [2.0]], 1)
+
+
+def naive_greedy_tour(points, start):
+    unvisited = np.ones(len(points), dtype=bool)
+    order = [start]
+    unvisited[start] = False
+    for _ in range(len(points) - 1):
+        d = np.linalg.norm(points - points[order[-1]], axis=1)
+        d[~unvisited] = np.inf
+        order.append(int(np.argmin(d)))
+        unvisited[order[-1]] = False
+    return np.array(order)
+
+
+def path_length(points, order):
+    return np.linalg.norm(np.diff(points[order], axis=0), axis=1).sum()
+
+
+def test_greedy_tour_matches_naive_loop():
+    points = np.random.default_rng(12).uniform(0, 100, size=(1500, 2))
+    order, length = kd_tree_cpp.greedy_tour(points, 17)
+    np.testing.assert_array_equal(order, naive_greedy_tour(points, 17))
+    assert length == pytest.approx(path_length(points, order))
+
+
+def test_greedy_tour_two_opt_shortens_path():
+    points = np.random.default_rng(13).uniform(0, 100, size=(3000, 2))
+    _, greedy_length = kd_tree_cpp.greedy_tour(points, 5)
+    order, length = kd_tree_cpp.greedy_tour(points, 5, two_opt_seconds=5.0)
+    assert order[0] == 5
+    np.testing.assert_array_equal(np.sort(order), np.arange(len(points)))
+    assert length == pytest.approx(path_length(points, order))
+    assert length < 0.95 * greedy_length
+    # An exhausted budget still returns a valid path
+    order, length = kd_tree_cpp.greedy_tour(points, 5, two_opt_seconds=1e-9)
+    np.testing.assert_array_equal(np.sort(order), np.arange(len(points)))
+    assert length <= greedy_length
+
+
+def test_greedy_tour_edge_cases():
+    assert kd_tree_cpp.greedy_tour(np.zeros((0, 2)))[0].shape == (0,)
+    order, length = kd_tree_cpp.greedy_tour(np.zeros((5, 2)), 3, two_opt_seconds=1.0)
+    assert order[0] == 3 and sorted(order) == list(range(5)) and length == 0.0
+    with pytest.raises(ValueError):
+        kd_tree_cpp.greedy_tour(np.zeros((5, 2)), 5)
+    for seconds in (np.inf, np.nan, -1.0):
+        with pytest.raises(ValueError):
+            kd_tree_cpp.greedy_tour(np.zeros((5, 2)), 0, two_opt_seconds=seconds)
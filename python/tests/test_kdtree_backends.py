@@ -0,0 +1,268 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from python.src.kdtree_backends import (
+    DuckDBNearestNeighbour,
+    GridNearestNeighbour,
+    NNBackend,
+    PythonKDTree,
+    available_backends,
+    backend_names,
+    create_backend,
+    get_backend,
+)
+
+
+@pytest.fixture
+def points():
+    return np.random.default_rng(42).uniform(0, 100, size=(300, 2))
+
+
+@pytest.fixture
+def queries():
+    return np.random.default_rng(7).uniform(0, 100, size=(40, 2))
+
+
+def brute_force(points, queries):
+    return np.linalg.norm(queries[:, None, :] - points[None, :, :], axis=2)
+
+
+def make_duckdb_at(points, database):
+    try:
+        return DuckDBNearestNeighbour(points, database=database)
+    except Exception as e:  # the vss extension may be unavailable offline
+        pytest.skip(f"DuckDB VSS backend unavailable: {e}")
+
+
+def make_duckdb(points):
+    return make_duckdb_at(points, ":memory:")
+
+
+def test_python_query_batch_is_columnar(points, queries):
+    indices, distances = PythonKDTree(points).query_batch(queries)
+    d = brute_force(points, queries)
+    np.testing.assert_array_equal(indices, d.argmin(axis=1))
+    np.testing.assert_allclose(distances, d.min(axis=1))
+
+
+def test_python_query_knn(points, queries):
+    indices, distances = PythonKDTree(points).query_knn(queries, k=8)
+    d = brute_force(points, queries)
+    assert indices.shape == (40, 8) and indices.dtype == np.int64
+    np.testing.assert_array_equal(indices, np.argsort(d, axis=1)[:, :8])
+    np.testing.assert_allclose(distances, np.sort(d, axis=1)[:, :8])
+
+
+def test_python_query_knn_pads(points):
+    indices, distances = PythonKDTree(points[:3]).query_knn(points[:1], k=5)
+    assert (indices[0, 3:] == -1).all() and np.isnan(distances[0, 3:]).all()
+
+
+def test_python_query_radius(points, queries):
+    offsets, indices, distances = PythonKDTree(points).query_radius(queries, 10.0)
+    d = brute_force(points, queries)
+    assert offsets.shape == (41,)
+    for i in range(len(queries)):
+        row = slice(offsets[i], offsets[i + 1])
+        assert sorted(indices[row]) == sorted(np.flatnonzero(d[i] <= 10.0))
+        assert np.all(np.diff(distances[row]) >= 0)
+
+
+def test_grid_query_knn_matches_brute_force(points):
+    # Include queries well outside the bounding box and exact point hits
+    queries = np.vstack(
+        [np.random.default_rng(7).uniform(-50, 150, size=(60, 2)), points[:5]]
+    )
+    grid = GridNearestNeighbour(points)
+    assert not grid.skewed
+    d = brute_force(points, queries)
+    for k in (1, 5):
+        indices, distances = grid.query_knn(queries, k=k)
+        np.testing.assert_allclose(distances, np.sort(d, axis=1)[:, :k])
+        np.testing.assert_allclose(np.take_along_axis(d, indices, axis=1), distances)
+    indices, distances = grid.query_batch(queries)
+    np.testing.assert_allclose(distances, d.min(axis=1))
+    np.testing.assert_array_equal(indices[-5:], np.arange(5))
+
+
+def test_grid_query_knn_pads_and_handles_degenerate_extent(points):
+    indices, distances = GridNearestNeighbour(points[:3]).query_knn(points[:1], k=5)
+    assert (indices[0, 3:] == -1).all() and np.isnan(distances[0, 3:]).all()
+    line = np.column_stack([np.linspace(0, 1, 50), np.zeros(50)])
+    index, distance = GridNearestNeighbour(line).query(np.array([0.5, 2.0]))
+    assert distance == pytest.approx(np.linalg.norm(line - [0.5, 2.0], axis=1).min())
+
+
+def test_grid_falls_back_on_skewed_points(points, queries):
+    clustered = np.vstack(
+        [np.random.default_rng(1).normal(50, 0.01, size=(900, 2)), points[:100]]
+    )
+    grid = GridNearestNeighbour(clustered)
+    assert grid.skewed and isinstance(grid.fallback, PythonKDTree)
+    indices, distances = grid.query_batch(queries)
+    np.testing.assert_allclose(distances, brute_force(clustered, queries).min(axis=1))
+
+
+def test_duckdb_query_knn_and_radius(points, queries):
+    nn = make_duckdb(points)
+    indices, distances = nn.query_knn(queries, k=3)
+    assert indices.shape == distances.shape == (40, 3)
+    assert np.all(np.diff(distances, axis=1) >= 0)
+    offsets, indices, distances = nn.query_radius(queries, 10.0)
+    d = brute_force(points, queries)
+    np.testing.assert_array_equal(np.diff(offsets), (d <= 10.0).sum(axis=1))
+
+
+def test_duckdb_bulk_load_preserves_ids_and_reports_timings(points):
+    nn = make_duckdb(points)
+    rows = nn.con.execute("SELECT id, vec FROM points ORDER BY id").fetchall()
+    assert [r[0] for r in rows] == list(range(len(points)))
+    np.testing.assert_allclose(np.array([r[1] for r in rows]), points, rtol=1e-6)
+    assert set(nn.timings) == {"load", "index"}
+    assert nn.con.execute(
+        "SELECT count(*) FROM duckdb_indexes() WHERE index_name = 'idx_vec'"
+    ).fetchone() == (1,)
+
+
+def test_duckdb_lateral_and_prepared_strategies_agree(points, queries):
+    nn = make_duckdb(points)
+    lateral_idx, lateral_dist = nn.query_knn(queries, k=2, strategy="lateral")
+    prepared_idx, prepared_dist = nn.query_knn(queries, k=2, strategy="prepared")
+    np.testing.assert_allclose(lateral_dist, prepared_dist, rtol=1e-5)
+    indices, distances = nn.query_batch(queries)
+    np.testing.assert_array_equal(indices, lateral_idx[:, 0])
+    assert nn.query(queries[0]) == (indices[0], pytest.approx(distances[0]))
+    with pytest.raises(ValueError):
+        nn.query_knn(queries, k=1, strategy="bogus")
+
+
+def test_duckdb_empty_table_returns_sentinels(queries):
+    nn = make_duckdb(np.empty((0, 2)))
+    idx, dist = nn.query(queries[0])
+    assert idx == -1 and np.isnan(dist)
+    indices, distances = nn.query_knn(queries, k=2)
+    assert (indices == -1).all() and np.isnan(distances).all()
+
+
+def test_duckdb_persistent_index_is_reused(points, queries, tmp_path):
+    database = str(tmp_path / "nn.duckdb")
+    first = make_duckdb_at(points, database)
+    assert not first.reused
+    expected = first.query_knn(queries, k=2)
+    first.close()
+
+    second = DuckDBNearestNeighbour(points, database=database)
+    assert second.reused and second.timings == {"load": 0.0, "index": 0.0}
+    np.testing.assert_array_equal(second.query_knn(queries, k=2)[0], expected[0])
+    second.close()
+
+    moved = points.copy()
+    moved[0] += 1.0
+    third = DuckDBNearestNeighbour(moved, database=database)
+    assert not third.reused
+    assert third.con.execute("SELECT count(*) FROM points").fetchone() == (len(points),)
+    third.close()
+
+
+def test_registry_lists_all_backends():
+    assert {"nanoflann", "nanoflann-dynamic", "cgal", "sklearn", "grid", "duckdb"} <= set(
+        backend_names()
+    )
+    assert set(available_backends()) <= set(backend_names())
+    assert get_backend("sklearn") is PythonKDTree
+    with pytest.raises(ValueError):
+        get_backend("bogus")
+
+
+@pytest.mark.parametrize(
+    "name", ["nanoflann", "nanoflann-dynamic", "cgal", "sklearn", "grid", "duckdb"]
+)
+def test_backends_implement_protocol(name, points, queries):
+    if name not in available_backends():
+        pytest.skip(f"{name} backend unavailable")
+    backend = make_duckdb(points) if name == "duckdb" else create_backend(name, points)
+    assert isinstance(backend, NNBackend)
+    d = brute_force(points, queries)
+    indices, distances = backend.query_batch(queries)
+    np.testing.assert_allclose(distances, d.min(axis=1), rtol=1e-5)
+    assert backend.query(queries[0])[0] == indices[0]
+    assert backend.query_knn(queries, k=2)[0].shape == (len(queries), 2)
+    assert backend.memory_usage() >= points.nbytes // 2
+
+
+@pytest.mark.usefixtures("needs_nanoflann")
+def test_nanoflann_backend_save_load(points, queries, tmp_path):
+    path = tmp_path / "points.kdtree"
+    built = create_backend("nanoflann", points)
+    built.save(path)
+    loaded = get_backend("nanoflann").load(path)
+    np.testing.assert_array_equal(loaded.query_batch(queries)[0], built.query_batch(queries)[0])
+    assert loaded.memory_usage() == built.memory_usage() > points.nbytes
+
+
+@pytest.mark.usefixtures("needs_nanoflann")
+def test_nanoflann_backend_eps_is_approximate(points, queries):
+    exact = create_backend("nanoflann", points, leaf_size=32)
+    approx = create_backend("nanoflann", points, leaf_size=32, eps=1.0)
+    assert "exact" in exact.capabilities
+    assert "approximate" in approx.capabilities and "exact" not in approx.capabilities
+    np.testing.assert_array_equal(
+        approx.query_knn(queries, 3, eps=0.0)[1], exact.query_knn(queries, 3)[1]
+    )
+    assert (approx.query_knn(queries, 3)[1] <= 2.0 * exact.query_knn(queries, 3)[1] + 1e-12).all()
+
+
+@pytest.mark.usefixtures("needs_nanoflann")
+def test_nanoflann_backend_follows_float32_input(points, queries, tmp_path):
+    backend64 = create_backend("nanoflann", points)
+    backend32 = create_backend("nanoflann", points.astype(np.float32))
+    assert backend64.dtype == np.float64 and backend32.dtype == np.float32
+    assert backend32.memory_usage() < backend64.memory_usage()
+    np.testing.assert_allclose(
+        backend32.query_batch(queries)[1], backend64.query_batch(queries)[1], rtol=1e-5
+    )
+    path = tmp_path / "points32.kdtree"
+    backend32.save(path)
+    assert get_backend("nanoflann").load(path).dtype == np.float32
+
+
+@pytest.mark.usefixtures("needs_nanoflann")
+def test_nanoflann_backend_curve_order(points, queries, tmp_path):
+    plain = create_backend("nanoflann", points)
+    ordered = create_backend("nanoflann", points.astype(np.float32), curve="hilbert")
+    assert ordered.curve == "hilbert" and ordered.dtype == np.float32
+    np.testing.assert_array_equal(
+        ordered.query_knn(queries, 3)[0],
+        create_backend("nanoflann", points.astype(np.float32)).query_knn(queries, 3)[0],
+    )
+    path = tmp_path / "hilbert.kdtree"
+    ordered.save(path)
+    loaded = get_backend("nanoflann").load(path)
+    assert loaded.curve == "hilbert"
+    np.testing.assert_array_equal(loaded.query_batch(queries)[0], ordered.query_batch(queries)[0])
+    assert plain.curve == "none"
+
+
+@pytest.mark.usefixtures("needs_nanoflann")
+def test_nanoflann_backend_all_nearest_neighbours(points):
+    backend = create_backend("nanoflann", points, eps=1.0)
+    assert "all_knn" in backend.capabilities
+    indices, distances = backend.all_nearest_neighbours(2)
+    # Exact regardless of eps: the first neighbour other than the point itself
+    expected = create_backend("nanoflann", points).query_knn(points, 3)
+    np.testing.assert_array_equal(distances, expected[1][:, 1:])
+    assert (indices != np.arange(len(points))[:, None]).all()
+
+
+def test_backend_libraries_are_imported_lazily():
+    code = (
+        "import sys; import python.src.kdtree_backends as b; b.available_backends(); "
+        "print(sorted({'sklearn', 'duckdb', 'kd_tree_cpp'} & set(sys.modules)))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert out.strip() == "[]"
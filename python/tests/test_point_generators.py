@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from python.src.point_generators import DISTRIBUTIONS, PointGenerator
+
+
+@pytest.mark.parametrize("distribution", DISTRIBUTIONS)
+def test_distributions_shape_and_reproducibility(distribution):
+    first = PointGenerator(3).generate(distribution, 1000)
+    assert first.shape == (1000, 2) and first.dtype == np.float64
+    np.testing.assert_array_equal(first, PointGenerator(3).generate(distribution, 1000))
+    assert PointGenerator(3).generate(distribution, 0).shape == (0, 2)
+
+
+def test_uniform_and_disk_stay_in_bounds():
+    points = PointGenerator(0).uniform(10_000, (-5.0, 5.0), (10.0, 20.0))
+    assert points[:, 0].min() >= -5 and points[:, 0].max() < 5
+    assert points[:, 1].min() >= 10 and points[:, 1].max() < 20
+    disk = PointGenerator(0).disk(10_000, center=(1.0, 2.0), radius=3.0)
+    r = np.hypot(disk[:, 0] - 1.0, disk[:, 1] - 2.0)
+    assert r.max() <= 3.0
+    # Uniform in area: about a quarter of the points fall inside half the radius
+    assert (r <= 1.5).mean() == pytest.approx(0.25, abs=0.02)
+
+
+def test_skewed_distributions_concentrate():
+    power = PointGenerator(0).power_law(10_000, exponent=3.0)
+    assert (power < 0.1).all(axis=1).mean() > 0.1
+    line = PointGenerator(0).line(10_000, start=(0, 0), end=(1, 1), width=0.01)
+    assert np.abs(line[:, 0] - line[:, 1]).max() < 0.1
+    clustered = PointGenerator(0).clustered(10_000, centers=[[0, 0], [10, 10]], spread=0.1)
+    assert np.minimum(np.hypot(*clustered.T), np.hypot(*(clustered - 10).T)).max() < 1.0
+
+
+def test_chunks_stream_the_requested_count():
+    chunks = list(PointGenerator(1).chunks("clustered", 2500, chunk_size=1000))
+    assert [len(c) for c in chunks] == [1000, 1000, 500]
+    again = np.concatenate(list(PointGenerator(1).chunks("clustered", 2500, chunk_size=1000)))
+    np.testing.assert_array_equal(np.concatenate(chunks), again)
+    with pytest.raises(ValueError):
+        next(PointGenerator(1).chunks("uniform", 10, chunk_size=0))
+
+
+def test_write_npy_round_trip(tmp_path):
+    path = str(tmp_path / "points.npy")
+    PointGenerator(2).write_npy(path, "uniform", 2500, chunk_size=1000)
+    stored = np.load(path, mmap_mode="r")
+    assert stored.shape == (2500, 2)
+    expected = np.concatenate(list(PointGenerator(2).chunks("uniform", 2500, chunk_size=1000)))
+    np.testing.assert_array_equal(stored, expected)
+
+
+def test_unknown_distribution():
+    with pytest.raises(ValueError):
+        PointGenerator(0).generate("triangle", 10)